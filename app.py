@@ -13,61 +13,536 @@ Notes:
 - Designed for large CSV: runs in 2 passes.
   1) Fit categorical encoders + count rows after filtering
   2) Transform and write to .npy via numpy.open_memmap (no full dataset in RAM)
+- --single-pass reads the CSV once: codes are assigned as values appear and rows are
+  appended to .npy files whose headers get the final shape on close.
+- The fitted encoder is saved as fit_state.npz; --fit-state PATH reuses it for a
+  transform-only pass (no fitting, unseen values -> code 0).
+- --incremental processes only the rows appended to the CSV since the previous
+  --incremental run into the same outdir (state in incremental.json).
+- --shard-rows N writes shards/ of N rows each plus manifest.json instead of x/y_data.npy.
+- --column-store writes one typed array per feature (int16/int32 codes, int64 epoch
+  seconds, uint8 bools, float32 numerics) plus schema.json instead of x_data.npy.
+- --high-card topk|hash bounds the encoder of the near-free-text columns (desired
+  position, last employer, last position): top-K values from a heavy-hitters sketch
+  with the rest as "__OTHER__", or hashed buckets with no fit at all.
+- --token-features N hashes the words of those columns into N sparse features written as
+  CSR (tokens_indptr/indices/data.npy, tokens.json) row-aligned with x_data.npy.
+- --memory-budget SIZE picks rows per chunk from the measured footprint of each chunk
+  (bytes per row as read times the pipeline's copy overhead) instead of --chunksize.
+- --checkpoint-every N commits pass 2 progress every N chunks (checkpoint.json);
+  --resume continues an interrupted run from there, with identical output.
+- --parsed-cache DIR keeps the parsed columns (after the parse handlers, before X/y
+  selection) per input file and handler version; later runs over the same file read
+  them instead of the CSV. Pass 2 of a two-pass run already reads them.
+- --input takes several files or globs (hh_*.csv.gz) and reads .gz/.bz2/.xz files with
+  on-the-fly decompression; the files form one output in the order given (globs sorted).
+  With --workers, each worker reads and parses whole files.
+- --report writes run_report.json/.csv: time, rows, allocations and null rates per stage
+  and chunk (reader, every handler, encoder, writer).
 """
 from __future__ import annotations
 
 import argparse
 import logging
+from contextlib import nullcontext
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Callable
 
 from src.encoding.encoders import FitState
-from src.io.readers import iter_csv_chunks
-from src.io.writers import NpyWriter
-from src.pipeline.builder import build_pipeline
+from src.encoding.strategies import STRATEGY_KINDS, ColumnStrategy
+from src.io.budget import ChunkSizer, parse_size
+from src.io.checkpoint import Checkpoint, PrefixDigest
+from src.io.columnstore import ColumnStoreWriter, plan_columns
+from src.io.incremental import IncrementalState
+from src.io.index import find_header_end, last_record_end, load_or_build_index
+from src.io.prefetch import PrefetchStats, prefetch as _prefetch
+from src.io.readers import iter_csv_chunks, iter_files_chunks
+from src.io.sources import compression_of, expand_inputs
+from src.io.stats import STATS_NAME, RunningStats
+from src.io.writers import CsrWriter, GrowableNpyWriter, NpyWriter, ShardedWriter, remap_codes
+from src.pipeline.builder import HIGH_CARDINALITY_COLUMNS, build_pipeline, compact_dtypes, high_cardinality_encoding
+from src.pipeline.cache import ParseCache
+from src.pipeline.handlers import SelectXYHandler
+from src.pipeline.instrument import Instrumentation
+from src.pipeline.parallel import parallel_fit, parallel_fit_files, parallel_transform, parallel_transform_files
+from src.pipeline.pipeline import Pipeline
+from src.pipeline.stage_cache import ParsedStageCache
 
+log = logging.getLogger("app")
 
-def parse_args() -> argparse.Namespace:
+# options and combinations that parse_args() checks against each other
+_IN_USE: dict[str, Callable[[argparse.Namespace, list[Path]], bool]] = {
+    "--workers": lambda a, inputs: a.workers > 1,
+    "--single-pass": lambda a, inputs: a.single_pass,
+    "--sorted-codes": lambda a, inputs: a.sorted_codes,
+    "--single-pass --sorted-codes": lambda a, inputs: a.single_pass and a.sorted_codes,
+    "--fit-state": lambda a, inputs: a.fit_state is not None,
+    "--incremental": lambda a, inputs: a.incremental,
+    "--checkpoint-every/--resume": lambda a, inputs: a.checkpoint_every > 0,
+    "--checkpoint-every": lambda a, inputs: a.checkpoint_every > 0,
+    "--resume": lambda a, inputs: a.resume,
+    "--shard-rows": lambda a, inputs: a.shard_rows > 0,
+    "--column-store": lambda a, inputs: a.column_store,
+    "--high-card": lambda a, inputs: a.high_card != "exact",
+    "--high-card topk": lambda a, inputs: a.high_card == "topk",
+    "--token-features": lambda a, inputs: a.token_features > 0,
+    "--memory-budget": lambda a, inputs: a.memory_budget is not None,
+    "--parsed-cache": lambda a, inputs: a.parsed_cache is not None,
+    "several inputs": lambda a, inputs: len(inputs) > 1,
+    "compressed inputs": lambda a, inputs: any(compression_of(path) for path in inputs),
+    "--workers over several inputs": lambda a, inputs: a.workers > 1 and len(inputs) > 1,
+}
+
+# (option, what it cannot run with); an option in use with any of the others is an error
+_INCOMPATIBLE: list[tuple[str, tuple[str, ...]]] = [
+    ("--workers", ("--single-pass", "--token-features")),
+    ("--fit-state", ("--single-pass", "--sorted-codes", "--workers", "--high-card")),
+    ("--incremental", ("--fit-state", "--sorted-codes", "--workers", "several inputs", "compressed inputs")),
+    ("--shard-rows", ("--workers", "--incremental", "--single-pass --sorted-codes")),
+    ("--column-store", ("--workers", "--incremental", "--shard-rows")),
+    ("--high-card topk", ("--single-pass", "--incremental")),
+    ("--memory-budget", ("--workers over several inputs",)),
+    # checkpoints cover the default two-pass x_data/y_data.npy run over one plain file only
+    (
+        "--checkpoint-every/--resume",
+        (
+            "--single-pass", "--fit-state", "--incremental", "--workers", "--shard-rows", "--column-store",
+            "--token-features", "--memory-budget", "several inputs", "compressed inputs",
+        ),
+    ),
+    (
+        "--parsed-cache",
+        ("--workers", "--incremental", "--checkpoint-every/--resume", "--memory-budget", "several inputs"),
+    ),
+]
+
+# (option, what it needs); an option in use without all of them is an error
+_REQUIRES: list[tuple[str, tuple[str, ...]]] = [
+    # the interval is not stored in checkpoint.json: the resumed run states it again
+    ("--resume", ("--checkpoint-every",)),
+]
+
+
+@dataclass
+class RunState:
+    """What main() resolves once from the CLI values, plus what the run accumulates.
+
+    The argparse Namespace keeps the CLI values only."""
+
+    inputs: list[Path]
+    usecols: list[str]
+    dtypes: dict[str, str] | None = None
+    sizer: ChunkSizer | None = None
+    instrumentation: Instrumentation | None = None
+    stage_cache: ParsedStageCache | None = None
+    # set by _chunks(): the current pass reads parse stage outputs from the stage cache
+    parsed_input: bool = False
+    stats: RunningStats | None = None
+    encoder_memory: dict | None = None
+
+
+def parse_args() -> tuple[argparse.Namespace, list[Path], ColumnStrategy]:
+    """CLI values, the expanded --input paths and the --high-card strategy."""
     p = argparse.ArgumentParser(description="HH CSV preprocessing -> x_data.npy, y_data.npy")
-    p.add_argument("--input", "-i", required=True, help="Path to hh.csv")
+    p.add_argument(
+        "--input",
+        "-i",
+        required=True,
+        nargs="+",
+        help="Path to hh.csv; several paths or globs (quoted) are read in order into one output. "
+        ".gz/.bz2/.xz files are decompressed while reading",
+    )
     p.add_argument("--outdir", "-o", default="data/processed", help="Directory to write outputs")
     p.add_argument("--chunksize", "-c", type=int, default=50_000, help="Rows per chunk")
+    p.add_argument(
+        "--memory-budget",
+        type=parse_size,
+        default=None,
+        help="Adapt rows per chunk so one chunk takes about this much memory in the pipeline, e.g. 512M",
+    )
+    p.add_argument("--min-chunksize", type=int, default=1_000, help="With --memory-budget: fewest rows per chunk")
+    p.add_argument(
+        "--max-chunksize", type=int, default=1_000_000, help="With --memory-budget: most rows per chunk"
+    )
     p.add_argument("--encoding", default=None, help="Force CSV encoding (optional)")
     p.add_argument("--delimiter", default=None, help="Force delimiter (optional)")
     p.add_argument("--target", default="salary_rub", help="Target column after parsing (default: salary_rub)")
     p.add_argument("--drop-missing-target", action="store_true", help="Drop rows where target is missing")
+    p.add_argument(
+        "--vectorized",
+        action="store_true",
+        help="Parse columns with vectorized pandas/numpy ops instead of per-row Python calls",
+    )
+    p.add_argument(
+        "--parse-cache-size",
+        type=int,
+        default=200_000,
+        help="Max distinct values kept in the cross-chunk parse cache (0 disables it)",
+    )
+    p.add_argument(
+        "--date-cache-size",
+        type=int,
+        default=200_000,
+        help="Max distinct resume update dates kept parsed across chunks (0 disables it; "
+        "independent of --parse-cache-size)",
+    )
+    p.add_argument(
+        "--copy-free",
+        action="store_true",
+        help="Let handlers add columns to the chunk in place instead of copying it at every step",
+    )
+    p.add_argument(
+        "--single-pass",
+        action="store_true",
+        help="Read and parse the CSV once: assign codes on the fly and append to growable .npy files",
+    )
+    p.add_argument(
+        "--sorted-codes",
+        action="store_true",
+        help="Assign categorical codes in sorted value order instead of first-seen order",
+    )
+    p.add_argument(
+        "--compact-dtypes",
+        action="store_true",
+        help="Read low-cardinality columns as category (and free text as string[pyarrow] if available)",
+    )
+    p.add_argument(
+        "--prefetch",
+        type=int,
+        default=0,
+        help="Parse up to K CSV chunks ahead on a background thread (0 = off)",
+    )
+    p.add_argument(
+        "--workers",
+        "-j",
+        type=int,
+        default=1,
+        help="Parse chunks in this many processes (output is identical to a serial run)",
+    )
+    p.add_argument(
+        "--fit-state",
+        default=None,
+        help="Encode with a saved fit_state.npz in one transform-only pass instead of fitting",
+    )
+    p.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Append only rows added to the CSV since the last --incremental run into outdir",
+    )
+    p.add_argument(
+        "--shard-rows",
+        type=int,
+        default=0,
+        help="Write fixed-size shards of this many rows plus manifest.json instead of x_data/y_data.npy",
+    )
+    p.add_argument(
+        "--shard-compress",
+        action="store_true",
+        help="With --shard-rows, write each shard as one compressed .npz",
+    )
+    p.add_argument(
+        "--column-store",
+        action="store_true",
+        help="Write per-column typed arrays (columns/*.npy, y.npy, schema.json) instead of one float32 matrix",
+    )
+    p.add_argument(
+        "--high-card",
+        choices=STRATEGY_KINDS,
+        default="exact",
+        help="Encoding of the high-cardinality text columns: exact codes, top-K + __OTHER__, or hashing",
+    )
+    p.add_argument("--top-k", type=int, default=10_000, help="With --high-card topk: values kept per column")
+    p.add_argument("--min-count", type=int, default=1, help="With --high-card topk: minimum count of a kept value")
+    p.add_argument(
+        "--sketch-size",
+        type=int,
+        default=0,
+        help="With --high-card topk: heavy-hitters counters per column during the fit (0 = 4 * top-k)",
+    )
+    p.add_argument("--hash-buckets", type=int, default=1 << 18, help="With --high-card hash: number of buckets")
+    p.add_argument(
+        "--token-features",
+        type=int,
+        default=0,
+        help="Hash title/employer words into this many sparse features, written as CSR tokens_*.npy (0 = off)",
+    )
+    p.add_argument(
+        "--no-stats",
+        action="store_true",
+        help="Do not accumulate column statistics of the outputs into stats.json",
+    )
+    p.add_argument(
+        "--checkpoint-every",
+        type=int,
+        default=0,
+        help="Two-pass runs: checkpoint pass 2 every N chunks into checkpoint.json (0 = off)",
+    )
+    p.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted checkpointed run in outdir from its last checkpoint "
+        "(give the same --checkpoint-every N)",
+    )
+    p.add_argument(
+        "--parsed-cache",
+        default=None,
+        metavar="DIR",
+        help="Cache the parsed columns of the input under DIR and reuse them while the file "
+        "and the parse handlers are unchanged (skips reading and parsing the CSV)",
+    )
+    p.add_argument(
+        "--report",
+        action="store_true",
+        help="Record per-stage/per-chunk timings, rows and null rates into run_report.json/.csv",
+    )
+    p.add_argument(
+        "--report-alloc",
+        action="store_true",
+        help="With --report, also trace bytes allocated per stage (tracemalloc; slow)",
+    )
     p.add_argument("--loglevel", default="INFO", help="Logging level")
-    return p.parse_args()
+    args = p.parse_args()
+    try:
+        inputs = expand_inputs(args.input)
+    except FileNotFoundError as e:
+        p.error(str(e))
+    if args.checkpoint_every < 0:
+        p.error("--checkpoint-every must be >= 0")
+    if args.memory_budget and not 1 <= args.min_chunksize <= args.max_chunksize:
+        p.error("--min-chunksize must be >= 1 and <= --max-chunksize")
+    for option, others in _INCOMPATIBLE:
+        used = [other for other in others if _IN_USE[other](args, inputs)]
+        if _IN_USE[option](args, inputs) and used:
+            p.error(f"{option} cannot be combined with {', '.join(used)}")
+    for option, needed in _REQUIRES:
+        missing = [other for other in needed if not _IN_USE[other](args, inputs)]
+        if _IN_USE[option](args, inputs) and missing:
+            p.error(f"{option} requires {', '.join(missing)}")
+    try:
+        strategy = ColumnStrategy(
+            kind=args.high_card, k=args.top_k, min_count=args.min_count,
+            sketch_size=args.sketch_size, buckets=args.hash_buckets,
+        )
+    except ValueError as e:
+        p.error(str(e))
+    return args, inputs, strategy
 
 
-def main() -> int:
-    args = parse_args()
-    logging.basicConfig(
-        level=getattr(logging, args.loglevel.upper(), logging.INFO),
-        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+def _chunks(
+    args: argparse.Namespace,
+    run: RunState,
+    input_path: Path,
+    stats: PrefetchStats | None = None,
+    byte_range: tuple[int, int] | None = None,
+    phase: str = "run",
+    replay: bool = False,
+):
+    """Chunks of the input. replay: repeat the chunk sizes of the previous pass (pass 2).
+
+    With --parsed-cache these are parse stage outputs when the cache is ready
+    (run.parsed_input is then set for process_chunk), else CSV chunks the cache records."""
+    cache = run.stage_cache
+    run.parsed_input = cache is not None and byte_range is None and cache.ready
+    if run.parsed_input:
+        chunks = cache.chunks()
+        if args.prefetch > 0:
+            chunks = _prefetch(chunks, depth=args.prefetch, stats=stats)
+        if run.instrumentation is None:
+            return chunks
+        run.instrumentation.set_phase(phase)
+        return run.instrumentation.reader(chunks)
+    sizer = run.sizer.replay() if replay and run.sizer is not None else run.sizer
+    if len(run.inputs) > 1 and byte_range is None:
+        chunks = iter_files_chunks(
+            run.inputs,
+            chunksize=args.chunksize,
+            encoding=args.encoding,
+            delimiter=args.delimiter,
+            prefetch=args.prefetch,
+            prefetch_stats=stats,
+            usecols=run.usecols,
+            dtype=run.dtypes,
+            sizer=sizer,
+        )
+    else:
+        chunks = iter_csv_chunks(
+            input_path=input_path,
+            chunksize=args.chunksize,
+            encoding=args.encoding,
+            delimiter=args.delimiter,
+            prefetch=args.prefetch,
+            prefetch_stats=stats,
+            usecols=run.usecols,
+            dtype=run.dtypes,
+            byte_range=byte_range,
+            sizer=sizer,
+        )
+    if cache is not None and byte_range is None:
+        chunks = cache.record(chunks)
+    if run.instrumentation is None:
+        return chunks
+    run.instrumentation.set_phase(phase)
+    return run.instrumentation.reader(chunks)
+
+
+def _stage(run: RunState, name: str, rows: int):
+    return run.instrumentation.stage(name, rows) if run.instrumentation is not None else nullcontext()
+
+
+def _log_prefetch(label: str, args: argparse.Namespace, stats: PrefetchStats) -> None:
+    if args.prefetch > 0:
+        log.info("%s reader prefetch: %s", label, stats.as_dict())
+
+
+def _open_writer(
+    args: argparse.Namespace,
+    run: RunState,
+    outdir: Path,
+    feature_names: list[str],
+    fit: FitState,
+    X,
+    fixed_codes: bool,
+    n_rows: int | None = None,
+):
+    """Writer for the requested output layout, opened on the first encoded chunk `X`.
+
+    n_rows: known row count (pass 2), for the preallocated x_data.npy/y_data.npy pair.
+    Also starts the run's column statistics.
+    """
+    run.stats = _new_stats(args, fit, feature_names)
+    if args.column_store:
+        return ColumnStoreWriter(outdir=outdir, columns=plan_columns(fit, X, feature_names, fixed_codes=fixed_codes))
+    if args.shard_rows:
+        return ShardedWriter(
+            outdir=outdir, feature_names=feature_names, shard_rows=args.shard_rows, compress=args.shard_compress
+        )
+    if n_rows is not None:
+        return NpyWriter(outdir=outdir, n_rows=n_rows, feature_names=feature_names)
+    return GrowableNpyWriter(outdir=outdir, feature_names=feature_names)
+
+
+def _open_token_writer(args: argparse.Namespace, outdir: Path, resume: bool = False) -> CsrWriter | None:
+    if not args.token_features:
+        return None
+    return CsrWriter(outdir=outdir, n_features=args.token_features, columns=list(HIGH_CARDINALITY_COLUMNS), resume=resume)
+
+
+def _write(
+    run: RunState,
+    writer,
+    fit: FitState,
+    ctx,
+    feature_names: list[str],
+    offset: int,
+    tokens: CsrWriter | None = None,
+) -> int:
+    """Encode one chunk in the writer's layout and hand it over; returns rows written.
+
+    tokens: also append the chunk's sparse token features (ctx.tokens)."""
+    if tokens is not None:
+        with _stage(run, "write_tokens", ctx.tokens.n_rows):
+            tokens.append(ctx.tokens.indptr, ctx.tokens.indices, ctx.tokens.data)
+    if isinstance(writer, ColumnStoreWriter):
+        with _stage(run, "transform_chunk", len(ctx.X)):
+            cols, y_arr = fit.transform_columns(ctx.X, ctx.y, kinds=writer.kinds())
+        with _stage(run, "write", len(y_arr)):
+            writer.append(cols, y_arr)
+        if run.stats is not None:
+            with _stage(run, "stats", len(y_arr)):
+                run.stats.update(cols, y_arr)
+        return len(y_arr)
+
+    with _stage(run, "transform_chunk", len(ctx.X)):
+        X_arr, y_arr = fit.transform_chunk(ctx.X, ctx.y, feature_names=feature_names)
+    with _stage(run, "write", len(X_arr)):
+        if isinstance(writer, NpyWriter):
+            writer.write(offset=offset, X_arr=X_arr, y_arr=y_arr)
+        else:
+            writer.append(X_arr, y_arr)
+    if run.stats is not None:
+        with _stage(run, "stats", len(X_arr)):
+            run.stats.update_matrix(X_arr, y_arr)
+    return len(X_arr)
+
+
+def _close_writer(writer, fit: FitState, tokens: CsrWriter | None = None) -> None:
+    if isinstance(writer, ColumnStoreWriter):
+        writer.close(fit)
+    else:
+        writer.close()
+    if tokens is not None:
+        tokens.close()
+        log.info("Token features: %s rows x %s, nnz=%s in %s", tokens.n_rows, tokens.n_features, tokens.nnz, tokens.meta_path)
+
+
+def _new_stats(args: argparse.Namespace, fit: FitState, feature_names: list[str]) -> RunningStats | None:
+    if args.no_stats:
+        return None
+    return RunningStats(feature_names=feature_names, categorical=[c for c in feature_names if c in fit.cat_cols])
+
+
+def _resume_stats(
+    args: argparse.Namespace, outdir: Path, fit: FitState, feature_names: list[str], rows: int
+) -> RunningStats | None:
+    """Statistics of the first `rows` rows already in outdir: stats.json if it covers exactly
+    those, else one scan of x_data.npy/y_data.npy."""
+    if args.no_stats:
+        return None
+    path = outdir / STATS_NAME
+    try:
+        stats = RunningStats.load(path)
+        if stats.n_rows == rows and stats.feature_names == feature_names:
+            return stats
+        log.info("%s covers %s rows, not %s; recomputing", path, stats.n_rows, rows)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        log.info("No usable %s (%s); recomputing from the outputs", path, e)
+    fresh = _new_stats(args, fit, feature_names)
+    return RunningStats.of_npy(
+        outdir / "x_data.npy", outdir / "y_data.npy", feature_names, fresh.categorical, stop=rows
     )
-    log = logging.getLogger("app")
 
-    input_path = Path(args.input).expanduser().resolve()
-    outdir = Path(args.outdir).expanduser().resolve()
-    outdir.mkdir(parents=True, exist_ok=True)
 
-    pipeline = build_pipeline(target=args.target, drop_missing_target=args.drop_missing_target)
+def _log_encoder_memory(run: RunState, fit: FitState) -> None:
+    """Log what the categorical encoders hold and keep it for the run report."""
+    stats = fit.memory_stats()
+    run.encoder_memory = stats
+    for col, st in stats.items():
+        log.debug("Encoder %s: %s", col, st)
+    bounded = {col: st for col, st in stats.items() if st["strategy"] != "exact"}
+    log.info(
+        "Encoder memory: ~%.1f MiB in %s categorical columns (%s bounded)",
+        sum(st["bytes"] for st in stats.values()) / 2**20, len(stats), len(bounded),
+    )
+    for col, st in bounded.items():
+        log.info(
+            "  %s: %s, codes=%s, sketch counters=%s (count error <= %s), ~%.1f KiB",
+            col, st["strategy"], st["codes"], st["sketch_counters"], st["sketch_error"], st["bytes"] / 1024,
+        )
+
+
+def _save_fit(fit: FitState, outdir: Path) -> None:
+    path = outdir / "fit_state.npz"
+    fit.save(path)
+    log.info("Fit state saved to: %s", path)
 
-    # -------- pass 1: fit encoders + count rows --------
-    fit = FitState()
+
+def _fit_pass(
+    args: argparse.Namespace, run: RunState, pipeline: Pipeline, input_path: Path, outdir: Path
+) -> tuple[FitState, list[str], int, int]:
+    """Pass 1: fit the encoders and count rows; saves fit_state.npz.
+
+    Returns (fit, feature_names, rows read, rows kept)."""
+    fit = pipeline.new_fit_state()
 
     total_in = 0
     total_kept = 0
     feature_names: list[str] | None = None
 
-    for chunk in iter_csv_chunks(
-        input_path=input_path,
-        chunksize=args.chunksize,
-        encoding=args.encoding,
-        delimiter=args.delimiter,
-    ):
+    stats = PrefetchStats()
+    for chunk in _chunks(args, run, input_path, stats, phase="pass1"):
         total_in += len(chunk)
-        ctx = pipeline.process_chunk(chunk)
+        ctx = pipeline.process_chunk(chunk, fit_only=True, parsed=run.parsed_input)
 
         if ctx.X is None or ctx.y is None:
             continue
@@ -77,7 +552,8 @@ def main() -> int:
             fit.init_columns(feature_names)
 
         # Fit categorical mappings incrementally
-        fit.fit_chunk(ctx.X)
+        with _stage(run, "fit_chunk", len(ctx.X)):
+            fit.fit_chunk(ctx.X)
 
         total_kept += len(ctx.X)
 
@@ -85,29 +561,477 @@ def main() -> int:
         raise RuntimeError("No data produced by pipeline. Check input/filters/target parsing.")
 
     log.info("Pass1 done. Read rows=%s, kept rows=%s, n_features=%s", total_in, total_kept, len(feature_names))
+    _log_prefetch("Pass1", args, stats)
+    _log_encoder_memory(run, fit)
+    fit.finalize()
+    if args.sorted_codes:
+        fit.sort_codes()
+    _save_fit(fit, outdir)
+    return fit, feature_names, total_in, total_kept
 
-    # -------- pass 2: transform + write to npy memmaps --------
-    writer = NpyWriter(outdir=outdir, n_rows=total_kept, feature_names=feature_names)
 
+def run_two_pass(args: argparse.Namespace, run: RunState, pipeline: Pipeline, input_path: Path, outdir: Path) -> int:
+    # -------- pass 1: fit encoders + count rows --------
+    fit, feature_names, _, total_kept = _fit_pass(args, run, pipeline, input_path, outdir)
+
+    # -------- pass 2: transform + write to npy memmaps --------
+    writer = None
+    tokens = _open_token_writer(args, outdir)
     offset = 0
-    for chunk in iter_csv_chunks(
-        input_path=input_path,
-        chunksize=args.chunksize,
-        encoding=args.encoding,
-        delimiter=args.delimiter,
-    ):
-        ctx = pipeline.process_chunk(chunk)
+    stats = PrefetchStats()
+    pipeline.chunk_sizer = None  # pass 2 repeats the chunk sizes of pass 1
+    for chunk in _chunks(args, run, input_path, stats, phase="pass2", replay=True):
+        ctx = pipeline.process_chunk(chunk, parsed=run.parsed_input)
         if ctx.X is None or ctx.y is None:
             continue
 
-        X_arr, y_arr = fit.transform_chunk(ctx.X, ctx.y, feature_names=feature_names)
-        writer.write(offset=offset, X_arr=X_arr, y_arr=y_arr)
-        offset += X_arr.shape[0]
+        if writer is None:
+            writer = _open_writer(args, run, outdir, feature_names, fit, ctx.X, fixed_codes=True, n_rows=total_kept)
+        offset += _write(run, writer, fit, ctx, feature_names, offset, tokens)
+
+    if writer is None:
+        raise RuntimeError("Pass 2 produced no rows although pass 1 did")
+    _close_writer(writer, fit, tokens)
+    _log_prefetch("Pass2", args, stats)
+    return offset
 
+
+def _checkpoint_options(args: argparse.Namespace) -> dict:
+    """Settings that shape the output; a resumed run must match the checkpointed one."""
+    keys = (
+        "target", "drop_missing_target", "chunksize", "sorted_codes",
+        "high_card", "top_k", "min_count", "sketch_size", "hash_buckets",
+    )
+    return {k: getattr(args, k) for k in keys}
+
+
+def _resume_checkpoint(args: argparse.Namespace, path: Path, input_path: Path, outdir: Path):
+    """(checkpoint, prefix digest at its offset) if the run in outdir can be resumed, else None."""
+    needed = [path, outdir / "fit_state.npz", outdir / "x_data.npy", outdir / "y_data.npy"]
+    if not all(p.exists() for p in needed):
+        log.warning("No checkpoint to resume in %s; starting from scratch", outdir)
+        return None
+    try:
+        ckpt = Checkpoint.load(path)
+    except (OSError, ValueError, TypeError) as e:
+        log.warning("Ignoring unreadable %s (%s); starting from scratch", path, e)
+        return None
+    digest = PrefixDigest(input_path)
+    problem = ckpt.problem(input_path, _checkpoint_options(args), digest)
+    if problem is not None:
+        log.warning("Cannot resume from %s: %s; starting from scratch", path, problem)
+        return None
+    return ckpt, digest
+
+
+def run_checkpointed(args: argparse.Namespace, run: RunState, pipeline: Pipeline, input_path: Path, outdir: Path) -> int:
+    # two passes; pass 2 reads the input one index entry (--chunksize records) at a time and
+    # commits a checkpoint every --checkpoint-every entries: memmaps flushed, then checkpoint.json
+    ckpt_path = outdir / "checkpoint.json"
+    resumed = _resume_checkpoint(args, ckpt_path, input_path, outdir) if args.resume else None
+    if resumed is not None and resumed[0].complete:
+        log.info("%s: run already complete (%s rows)", ckpt_path, resumed[0].rows_written)
+        return resumed[0].rows_written
+
+    idx = load_or_build_index(input_path, rows_per_entry=args.chunksize)
+    if resumed is None:
+        fit, feature_names, _, total_kept = _fit_pass(args, run, pipeline, input_path, outdir)
+        writer = NpyWriter(outdir=outdir, n_rows=total_kept, feature_names=feature_names)
+        run.stats = _new_stats(args, fit, feature_names)
+        digest = PrefixDigest(input_path)
+        ckpt = Checkpoint(
+            input_path=str(input_path),
+            input_size=idx.size,
+            header_end=idx.header_end,
+            rows_per_entry=idx.rows_per_entry,
+            entry=0,
+            offset=idx.offsets[0],
+            prefix_sha1=digest.advance(idx.offsets[0]),
+            rows_read=0,
+            rows_written=0,
+            n_rows=total_kept,
+            feature_names=feature_names,
+            options=_checkpoint_options(args),
+        )
+        ckpt.save(ckpt_path)
+    else:
+        ckpt, digest = resumed
+        if idx.offsets[ckpt.entry] != ckpt.offset:
+            raise RuntimeError(f"{ckpt_path}: entry {ckpt.entry} starts at {idx.offsets[ckpt.entry]}, not {ckpt.offset}")
+        fit = FitState.load(outdir / "fit_state.npz")
+        feature_names = ckpt.feature_names
+        writer = NpyWriter(outdir=outdir, n_rows=ckpt.n_rows, feature_names=feature_names, resume=True)
+        run.stats = _resume_stats(args, outdir, fit, feature_names, ckpt.rows_written)
+        log.info(
+            "Resuming pass 2 at entry %s/%s (byte %s, %s of %s rows written)",
+            ckpt.entry, idx.n_entries, ckpt.offset, ckpt.rows_written, ckpt.n_rows,
+        )
+
+    stats = PrefetchStats()
+    pending = 0
+    for entry in range(ckpt.entry, idx.n_entries):
+        for chunk in _chunks(args, run, input_path, stats, byte_range=idx.byte_range(entry, entry + 1), phase="pass2"):
+            ckpt.rows_read += len(chunk)
+            ctx = pipeline.process_chunk(chunk, parsed=run.parsed_input)
+            if ctx.X is None or ctx.y is None:
+                continue
+            ckpt.rows_written += _write(run, writer, fit, ctx, feature_names, ckpt.rows_written)
+        pending += 1
+        if pending >= args.checkpoint_every or entry + 1 == idx.n_entries:
+            with _stage(run, "checkpoint", 0):
+                writer.flush()
+                if run.stats is not None:
+                    run.stats.save(outdir / STATS_NAME)
+                ckpt.entry, ckpt.offset = entry + 1, idx.offsets[entry + 1]
+                ckpt.prefix_sha1 = digest.advance(ckpt.offset)
+                ckpt.save(ckpt_path)
+            log.debug("Checkpoint: entry %s, %s rows written", ckpt.entry, ckpt.rows_written)
+            pending = 0
+
+    if ckpt.rows_written != ckpt.n_rows:
+        raise RuntimeError(f"Pass 2 wrote {ckpt.rows_written} rows, pass 1 counted {ckpt.n_rows}")
     writer.close()
+    ckpt.complete = True
+    ckpt.save(ckpt_path)
+    _log_prefetch("Pass2", args, stats)
+    return ckpt.rows_written
+
+
+def run_parallel_files(args: argparse.Namespace, run: RunState, pipeline_kwargs: dict, outdir: Path) -> int:
+    # same two passes, with whole input files fanned out to --workers processes
+    read_options = dict(
+        chunksize=args.chunksize, encoding=args.encoding, delimiter=args.delimiter,
+        usecols=run.usecols, dtype=run.dtypes, prefetch=args.prefetch,
+    )
+    fit, feature_names, kept_per_file, total_in = parallel_fit_files(
+        run.inputs, workers=args.workers, pipeline_kwargs=pipeline_kwargs, read_options=read_options
+    )
+    total_kept = sum(map(sum, kept_per_file))
+    log.info(
+        "Pass1 done. Files=%s, read rows=%s, kept rows=%s, n_features=%s",
+        len(run.inputs), total_in, total_kept, len(feature_names),
+    )
+    _log_encoder_memory(run, fit)
+    fit.finalize()
+    if args.sorted_codes:
+        fit.sort_codes()
+    _save_fit(fit, outdir)
+
+    writer = NpyWriter(outdir=outdir, n_rows=total_kept, feature_names=feature_names)
+    run.stats = _new_stats(args, fit, feature_names)
+    written = parallel_transform_files(
+        run.inputs,
+        workers=args.workers,
+        pipeline_kwargs=pipeline_kwargs,
+        read_options=read_options,
+        fit=fit,
+        feature_names=feature_names,
+        kept_per_file=kept_per_file,
+        x_path=writer.x_path,
+        y_path=writer.y_path,
+        stats=run.stats,
+    )
+    writer.close()
+    return written
+
+
+def run_parallel(args: argparse.Namespace, run: RunState, pipeline_kwargs: dict, input_path: Path, outdir: Path) -> int:
+    # same two passes, with chunks fanned out to --workers processes
+    stats = PrefetchStats()
+    fit, feature_names, kept_per_chunk, total_in = parallel_fit(
+        _chunks(args, run, input_path, stats, phase="pass1"), workers=args.workers, pipeline_kwargs=pipeline_kwargs
+    )
+    total_kept = sum(kept_per_chunk)
+    log.info("Pass1 done. Read rows=%s, kept rows=%s, n_features=%s", total_in, total_kept, len(feature_names))
+    _log_prefetch("Pass1", args, stats)
+    _log_encoder_memory(run, fit)
+    fit.finalize()
+    if args.sorted_codes:
+        fit.sort_codes()
+    _save_fit(fit, outdir)
+
+    writer = NpyWriter(outdir=outdir, n_rows=total_kept, feature_names=feature_names)
+    run.stats = _new_stats(args, fit, feature_names)
+    stats = PrefetchStats()
+    written = parallel_transform(
+        _chunks(args, run, input_path, stats, phase="pass2", replay=True),
+        workers=args.workers,
+        pipeline_kwargs=pipeline_kwargs,
+        fit=fit,
+        feature_names=feature_names,
+        kept_per_chunk=kept_per_chunk,
+        x_path=writer.x_path,
+        y_path=writer.y_path,
+        stats=run.stats,
+    )
+    writer.close()
+    _log_prefetch("Pass2", args, stats)
+    return written
+
+
+def run_single_pass(args: argparse.Namespace, run: RunState, pipeline: Pipeline, input_path: Path, outdir: Path) -> int:
+    # codes are assigned as values first appear; rows are appended to growable .npy files
+    fit = pipeline.new_fit_state()
+    writer = None
+    tokens = _open_token_writer(args, outdir)
+    feature_names: list[str] | None = None
+
+    total_in = 0
+    stats = PrefetchStats()
+    for chunk in _chunks(args, run, input_path, stats, phase="single"):
+        total_in += len(chunk)
+        ctx = pipeline.process_chunk(chunk, parsed=run.parsed_input)
+        if ctx.X is None or ctx.y is None:
+            continue
+
+        if feature_names is None:
+            feature_names = list(ctx.X.columns)
+            fit.init_columns(feature_names)
+
+        with _stage(run, "fit_chunk", len(ctx.X)):
+            fit.partial_fit(ctx.X)
+        if writer is None:
+            writer = _open_writer(args, run, outdir, feature_names, fit, ctx.X, fixed_codes=False)
+        _write(run, writer, fit, ctx, feature_names, writer.n_rows, tokens)
+
+    if writer is None or feature_names is None:
+        raise RuntimeError("No data produced by pipeline. Check input/filters/target parsing.")
+    _close_writer(writer, fit, tokens)
+    log.info("Single pass done. Read rows=%s, kept rows=%s, n_features=%s", total_in, writer.n_rows, len(feature_names))
+    _log_prefetch("Single pass", args, stats)
+    _log_encoder_memory(run, fit)
+
+    if args.sorted_codes:
+        luts = fit.sort_codes()
+        if isinstance(writer, ColumnStoreWriter):
+            writer.remap_codes(luts)
+        else:
+            remap_codes(writer.x_path, {feature_names.index(col): lut for col, lut in luts.items()})
+        if run.stats is not None:
+            run.stats.remap_codes(luts)
+        log.info("Remapped categorical codes to sorted order for %s columns", len(luts))
+    _save_fit(fit, outdir)
+    return writer.n_rows
+
+
+def run_transform_only(args: argparse.Namespace, run: RunState, pipeline: Pipeline, input_path: Path, outdir: Path) -> int:
+    # encode with a previously saved FitState: one read, no fitting
+    fit = FitState.load(Path(args.fit_state).expanduser())
+    feature_names = fit.feature_names
+    log.info("Loaded fit state %s (%s features)", args.fit_state, len(feature_names))
+    writer = None
+    tokens = _open_token_writer(args, outdir)
+
+    total_in = 0
+    stats = PrefetchStats()
+    for chunk in _chunks(args, run, input_path, stats, phase="transform"):
+        total_in += len(chunk)
+        ctx = pipeline.process_chunk(chunk, parsed=run.parsed_input)
+        if ctx.X is None or ctx.y is None:
+            continue
+        if writer is None:
+            writer = _open_writer(args, run, outdir, feature_names, fit, ctx.X, fixed_codes=True)
+        _write(run, writer, fit, ctx, feature_names, writer.n_rows, tokens)
+
+    if writer is None:
+        raise RuntimeError("No data produced by pipeline. Check input/filters/target parsing.")
+    _close_writer(writer, fit, tokens)
+    log.info("Transform-only pass done. Read rows=%s, kept rows=%s", total_in, writer.n_rows)
+    _log_prefetch("Transform", args, stats)
+    return writer.n_rows
+
+
+def _resume_state(outdir: Path, input_path: Path, tokens: bool = False) -> IncrementalState | None:
+    """The saved incremental state, if the outputs and the input still line up with it."""
+    state_path = outdir / "incremental.json"
+    needed = [state_path, outdir / "fit_state.npz", outdir / "x_data.npy", outdir / "y_data.npy"]
+    if tokens:
+        needed.append(outdir / "tokens.json")
+    if not all(p.exists() for p in needed):
+        return None
+    try:
+        state = IncrementalState.load(state_path)
+    except (OSError, ValueError, TypeError) as e:
+        log.warning("Ignoring unreadable %s: %s", state_path, e)
+        return None
+    if not state.matches(input_path):
+        log.warning("%s changed before offset %s (not append-only); rebuilding", input_path, state.offset)
+        return None
+    return state
+
+
+def run_incremental(args: argparse.Namespace, run: RunState, pipeline: Pipeline, input_path: Path, outdir: Path) -> int:
+    # single pass over [previous offset, last complete record); codes of old values never change
+    state = _resume_state(outdir, input_path, tokens=args.token_features > 0)
+    writer: GrowableNpyWriter | None = None
+    tokens: CsrWriter | None = None
+    if state is not None:
+        fit = FitState.load(outdir / "fit_state.npz")
+        if fit.strategies != pipeline.encoding:
+            log.warning("Keeping the encoding strategies saved in fit_state.npz, not --high-card")
+        writer = GrowableNpyWriter(outdir=outdir, feature_names=fit.feature_names, resume=True)
+        try:
+            tokens = _open_token_writer(args, outdir, resume=True)
+        except (OSError, ValueError, KeyError) as e:
+            log.warning("Cannot extend the token features (%s); rebuilding", e)
+            state = None
+        if state is not None and writer.n_rows != state.rows_written:
+            log.warning("Outputs hold %s rows, state expects %s; rebuilding", writer.n_rows, state.rows_written)
+            state = None
+        if state is not None and tokens is not None and tokens.n_rows != writer.n_rows:
+            log.warning("Token features hold %s rows, outputs %s; rebuilding", tokens.n_rows, writer.n_rows)
+            state = None
+        if state is None:
+            for w in (writer, tokens):
+                if w is not None:
+                    w.close()
+            writer, tokens = None, None
+        else:
+            run.stats = _resume_stats(args, outdir, fit, fit.feature_names, writer.n_rows)
+    if state is None:
+        fit = pipeline.new_fit_state()
+        tokens = _open_token_writer(args, outdir)
+        header_end = find_header_end(input_path)
+        start, rows_read = header_end, 0
+    else:
+        header_end, start, rows_read = state.header_end, state.offset, state.rows_read
+
+    stop = last_record_end(input_path, start)
+    log.info("Incremental: bytes [%s, %s) of %s are new", start, stop, input_path)
+
+    stats = PrefetchStats()
+    if stop > start:
+        for chunk in _chunks(args, run, input_path, stats, byte_range=(start, stop), phase="incremental"):
+            rows_read += len(chunk)
+            ctx = pipeline.process_chunk(chunk, parsed=run.parsed_input)
+            if ctx.X is None or ctx.y is None:
+                continue
+            if writer is None:
+                fit.init_columns(list(ctx.X.columns))
+                writer = GrowableNpyWriter(outdir=outdir, feature_names=fit.feature_names)
+            with _stage(run, "fit_transform_chunk", len(ctx.X)):
+                X_arr, y_arr = fit.fit_transform_chunk(ctx.X, ctx.y, feature_names=fit.feature_names)
+            if run.stats is None and not args.no_stats:
+                # first chunk of a fresh run: the fit above settled which columns are categorical
+                run.stats = _new_stats(args, fit, fit.feature_names)
+            with _stage(run, "write", len(X_arr)):
+                writer.append(X_arr, y_arr)
+            if run.stats is not None:
+                with _stage(run, "stats", len(X_arr)):
+                    run.stats.update_matrix(X_arr, y_arr)
+            if tokens is not None:
+                with _stage(run, "write_tokens", ctx.tokens.n_rows):
+                    tokens.append(ctx.tokens.indptr, ctx.tokens.indices, ctx.tokens.data)
+
+    if writer is None:
+        raise RuntimeError("No data produced by pipeline. Check input/filters/target parsing.")
+    _close_writer(writer, fit, tokens)
+    _log_prefetch("Incremental", args, stats)
+    _log_encoder_memory(run, fit)
+    _save_fit(fit, outdir)
+    IncrementalState.capture(input_path, header_end, stop, rows_read, writer.n_rows).save(outdir / "incremental.json")
+    new_rows = rows_read - (state.rows_read if state is not None else 0)
+    log.info("Incremental pass done. Read rows=%s (total %s), rows now=%s", new_rows, rows_read, writer.n_rows)
+    return writer.n_rows
+
+
+def main() -> int:
+    args, inputs, strategy = parse_args()
+    logging.basicConfig(
+        level=getattr(logging, args.loglevel.upper(), logging.INFO),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+
+    # single-file modes read the first (only) input
+    input_path = inputs[0]
+    if len(inputs) > 1:
+        log.info("Inputs: %s files (%s)", len(inputs), ", ".join(path.name for path in inputs))
+    outdir = Path(args.outdir).expanduser().resolve()
+    outdir.mkdir(parents=True, exist_ok=True)
+
+    parse_cache = ParseCache(maxsize=args.parse_cache_size) if args.parse_cache_size > 0 else None
+    pipeline_kwargs = dict(
+        target=args.target,
+        drop_missing_target=args.drop_missing_target,
+        vectorized=args.vectorized,
+        parse_cache=parse_cache,
+        copy_free=args.copy_free,
+        encoding=high_cardinality_encoding(strategy),
+        token_features=args.token_features,
+        date_cache_size=args.date_cache_size,
+    )
+    pipeline = build_pipeline(**pipeline_kwargs)
+    # read only the columns the handlers use
+    usecols = pipeline.required_columns()
+    run = RunState(
+        inputs=inputs,
+        usecols=usecols,
+        dtypes=compact_dtypes(usecols) if args.compact_dtypes else None,
+        instrumentation=Instrumentation(trace_alloc=args.report_alloc) if args.report else None,
+    )
+    if args.memory_budget:
+        run.sizer = ChunkSizer(
+            budget=args.memory_budget, rows=args.chunksize, min_rows=args.min_chunksize,
+            max_rows=args.max_chunksize, read_ahead=args.prefetch,
+        )
+        # with --workers the chain runs in the workers: the default overhead factor is used
+        pipeline.chunk_sizer = run.sizer
+    # handlers run in the worker processes with --workers; only reading is recorded then
+    pipeline.instrumentation = run.instrumentation
+    if args.parsed_cache:
+        read_options = {"encoding": args.encoding, "delimiter": args.delimiter, "dtypes": run.dtypes}
+        run.stage_cache = ParsedStageCache(
+            Path(args.parsed_cache).expanduser(), input_path, pipeline, read_options
+        )
+        log.info("Parsed cache: %s (%s)", run.stage_cache.dir, "hit" if run.stage_cache.ready else "miss")
+
+    if args.incremental:
+        n_rows = run_incremental(args, run, pipeline, input_path, outdir)
+    elif args.fit_state:
+        n_rows = run_transform_only(args, run, pipeline, input_path, outdir)
+    elif args.workers > 1 and len(run.inputs) > 1:
+        n_rows = run_parallel_files(args, run, pipeline_kwargs, outdir)
+    elif args.workers > 1:
+        n_rows = run_parallel(args, run, pipeline_kwargs, input_path, outdir)
+    elif args.single_pass:
+        n_rows = run_single_pass(args, run, pipeline, input_path, outdir)
+    elif args.checkpoint_every:
+        n_rows = run_checkpointed(args, run, pipeline, input_path, outdir)
+    else:
+        n_rows = run_two_pass(args, run, pipeline, input_path, outdir)
 
-    log.info("Done. Wrote rows=%s into %s", offset, outdir)
-    log.info("Files: %s, %s", (outdir / "x_data.npy"), (outdir / "y_data.npy"))
+    if run.stats is not None:
+        run.stats.complete = True
+        run.stats.save(outdir / STATS_NAME)
+        log.info("Column statistics of %s rows saved to: %s", run.stats.n_rows, outdir / STATS_NAME)
+    if parse_cache is not None:
+        log.info("Parse cache: %s", parse_cache.stats())
+    if run.sizer is not None:
+        log.info("Chunk sizes under a %.0f MiB budget: %s", args.memory_budget / 2**20, run.sizer.summary())
+    # with --workers the dates are parsed in the worker processes
+    date_stats = None
+    if args.workers <= 1:
+        date_stats = next(h.dates.stats() for h in pipeline.handlers() if isinstance(h, SelectXYHandler))
+        log.info("Date parsing: %s", date_stats)
+    if run.instrumentation is not None:
+        extra = {"input": [str(path) for path in run.inputs] if len(run.inputs) > 1 else str(input_path), "rows_written": n_rows, "chunksize": args.chunksize}
+        if parse_cache is not None:
+            extra["parse_cache"] = parse_cache.stats()
+        if run.sizer is not None:
+            extra["chunk_sizes"] = run.sizer.summary()
+        if date_stats is not None:
+            extra["date_parsing"] = date_stats
+        if run.encoder_memory is not None:
+            extra["encoder_memory"] = run.encoder_memory
+        json_path, _ = run.instrumentation.write_report(outdir, extra=extra)
+        top = max(run.instrumentation.summary(), key=lambda g: g["seconds"], default=None)
+        if top is not None:
+            log.info("Run report: %s (slowest stage: %s/%s, %.0f%% of time)", json_path, top["phase"], top["stage"], top["share"] * 100)
+    log.info("Done. Wrote rows=%s into %s", n_rows, outdir)
+    if args.shard_rows:
+        log.info("Shards: %s, manifest: %s", outdir / "shards", outdir / "manifest.json")
+    else:
+        log.info("Files: %s, %s", (outdir / "x_data.npy"), (outdir / "y_data.npy"))
     log.info("Feature names saved to: %s", (outdir / "feature_names.txt"))
     return 0
 
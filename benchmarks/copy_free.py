@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Compare the default (copying) handler chain with copy-free mode.
+
+Usage:
+    python -m benchmarks.copy_free --input hh.csv --chunksize 50000 --chunks 5
+
+For each mode reports per-chunk latency and peak traced memory (tracemalloc,
+which sees numpy/pandas buffers as well as Python string objects).
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+
+from src.io.readers import iter_csv_chunks
+from src.pipeline.builder import build_pipeline
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Benchmark copy-free vs copying handler chain")
+    p.add_argument("--input", "-i", required=True, help="Path to hh.csv")
+    p.add_argument("--chunksize", "-c", type=int, default=50_000, help="Rows per chunk")
+    p.add_argument("--chunks", type=int, default=5, help="Number of chunks to run")
+    return p.parse_args()
+
+
+def run_mode(chunks: list[pd.DataFrame], copy_free: bool) -> tuple[list[float], list[int]]:
+    pipeline = build_pipeline(copy_free=copy_free)
+    pipeline.process_chunk(chunks[0].copy())  # warm-up (imports, regex compilation)
+
+    # timing and memory are measured in separate passes: tracemalloc slows allocations a lot
+    latencies: list[float] = []
+    for chunk in chunks:
+        owned = chunk.copy()  # copy-free mode consumes its input
+        gc.collect()
+        t0 = time.perf_counter()
+        pipeline.process_chunk(owned)
+        latencies.append(time.perf_counter() - t0)
+        del owned
+
+    peaks: list[int] = []
+    for chunk in chunks:
+        owned = chunk.copy()
+        tracemalloc.start()
+        base, _ = tracemalloc.get_traced_memory()
+        pipeline.process_chunk(owned)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peaks.append(peak - base)
+        del owned
+    return latencies, peaks
+
+
+def main() -> int:
+    args = parse_args()
+    chunks: list[pd.DataFrame] = []
+    for chunk in iter_csv_chunks(Path(args.input), chunksize=args.chunksize):
+        chunks.append(chunk)
+        if len(chunks) >= args.chunks:
+            break
+
+    print(f"chunks={len(chunks)} rows/chunk<={args.chunksize}")
+    results = {}
+    for copy_free in (False, True):
+        latencies, peaks = run_mode(chunks, copy_free=copy_free)
+        results[copy_free] = (statistics.median(latencies), max(peaks))
+        name = "copy-free" if copy_free else "copying"
+        print(
+            f"{name:>10}: median latency {statistics.median(latencies) * 1000:8.1f} ms/chunk, "
+            f"peak alloc {max(peaks) / 2**20:8.1f} MiB"
+        )
+
+    (lat0, peak0), (lat1, peak1) = results[False], results[True]
+    print(f"latency x{lat0 / lat1:.2f}, peak memory -{(1 - peak1 / peak0) * 100:.0f}%")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
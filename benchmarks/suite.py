@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Throughput and peak RSS of every pipeline stage, plus the full app.py run.
+
+Usage:
+    python -m benchmarks.suite --rows 1000000                  # synthetic input (benchmarks.synth)
+    python -m benchmarks.suite --input hh.csv --chunks 10 --vectorized --json after.json
+    python -m benchmarks.suite --rows 1000000 --baseline before.json
+
+Stages: CSV read, each handler of the chain on its own, FitState.fit_chunk,
+FitState.transform_chunk, NpyWriter.write, and app.py end to end (in a subprocess,
+with any --app-arg flags). Peak RSS is sampled from /proc/self/statm while a stage
+runs; "+MiB" is the growth over the RSS the stage started with. With --baseline,
+stages whose rows/s dropped by more than --tolerance are flagged.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.encoding.encoders import FitState
+from src.io.readers import iter_csv_chunks
+from src.io.writers import NpyWriter
+from src.pipeline.base import PipelineContext
+from src.pipeline.builder import build_pipeline
+from src.pipeline.cache import ParseCache
+
+from .synth import write_csv
+
+APP = Path(__file__).resolve().parent.parent / "app.py"
+_PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _rss() -> int:
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * _PAGE
+    except OSError:  # not Linux: fall back to the lifetime peak
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class _PeakRss:
+    """Samples this process' RSS on a thread while the block runs."""
+
+    def __init__(self, interval: float = 0.005) -> None:
+        self.interval = interval
+        self.start = self.peak = 0
+        self._stop = threading.Event()
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _rss())
+
+    def __enter__(self) -> "_PeakRss":
+        self.start = self.peak = _rss()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss())
+
+
+@dataclass
+class StageResult:
+    name: str
+    rows: int = 0
+    seconds: float = 0.0
+    peak_rss: int = 0
+    rss_growth: int = 0
+
+    @property
+    def rows_per_s(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def add(self, rows: int, seconds: float, mon: _PeakRss) -> None:
+        self.rows += rows
+        self.seconds += seconds
+        self.peak_rss = max(self.peak_rss, mon.peak)
+        self.rss_growth = max(self.rss_growth, mon.peak - mon.start)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {**asdict(self), "rows_per_s": self.rows_per_s}
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Benchmark every pipeline stage and the full app.py run")
+    src = p.add_mutually_exclusive_group(required=True)
+    src.add_argument("--input", "-i", help="Path to hh.csv")
+    src.add_argument("--rows", "-n", type=int, help="Generate this many synthetic rows instead")
+    p.add_argument("--seed", type=int, default=0, help="Seed for the synthetic input")
+    p.add_argument("--chunksize", "-c", type=int, default=50_000, help="Rows per chunk")
+    p.add_argument("--chunks", type=int, default=10, help="Chunks used for the in-process stages (0 = all)")
+    p.add_argument("--vectorized", action="store_true", help="Benchmark the vectorized parsers")
+    p.add_argument("--parse-cache-size", type=int, default=200_000, help="0 disables the parse cache")
+    p.add_argument("--app-arg", action="append", default=[], help="Extra flag for the app.py run (repeatable)")
+    p.add_argument("--skip-app", action="store_true", help="Do not run app.py end to end")
+    p.add_argument("--json", help="Write results to this JSON file")
+    p.add_argument("--baseline", help="Compare with a JSON file from an earlier --json run")
+    p.add_argument("--tolerance", type=float, default=0.10, help="Allowed rows/s drop vs the baseline")
+    return p.parse_args()
+
+
+def bench_in_process(args: argparse.Namespace, input_path: Path, workdir: Path) -> list[StageResult]:
+    cache = ParseCache(maxsize=args.parse_cache_size) if args.parse_cache_size > 0 else None
+    pipeline = build_pipeline(vectorized=args.vectorized, parse_cache=cache)
+    handlers = pipeline.handlers()
+    results: dict[str, StageResult] = defaultdict(lambda: StageResult(name=""))
+
+    def stage(name: str) -> StageResult:
+        res = results[name]
+        res.name = name
+        return res
+
+    # read
+    chunks: list[pd.DataFrame] = []
+    reader = iter_csv_chunks(input_path, chunksize=args.chunksize, usecols=pipeline.required_columns())
+    while not args.chunks or len(chunks) < args.chunks:
+        with _PeakRss() as mon:
+            t0 = time.perf_counter()
+            chunk = next(reader, None)
+            elapsed = time.perf_counter() - t0
+        if chunk is None:
+            break
+        stage("read_csv").add(len(chunk), elapsed, mon)
+        chunks.append(chunk)
+    reader.close()
+
+    # handlers, each run on its own: the chain link is cut while it runs
+    outputs: list[PipelineContext] = []
+    pipeline.process_chunk(chunks[0].copy())  # warm-up (imports, regex compilation)
+    for chunk in chunks:
+        ctx = PipelineContext(raw=chunk, df=chunk.copy())
+        for h in handlers:
+            nxt = getattr(h, "_next", None)
+            h._next = None
+            try:
+                n = len(ctx.df)
+                with _PeakRss() as mon:
+                    t0 = time.perf_counter()
+                    ctx = h.handle(ctx)
+                    elapsed = time.perf_counter() - t0
+            finally:
+                h._next = nxt
+            stage(type(h).__name__).add(n, elapsed, mon)
+        if ctx.X is not None and ctx.y is not None:
+            outputs.append(ctx)
+    if not outputs:
+        raise RuntimeError("No data produced by pipeline. Check input/filters/target parsing.")
+
+    feature_names = list(outputs[0].X.columns)
+    fit = FitState()
+    fit.init_columns(feature_names)
+    for ctx in outputs:
+        with _PeakRss() as mon:
+            t0 = time.perf_counter()
+            fit.fit_chunk(ctx.X)
+            elapsed = time.perf_counter() - t0
+        stage("FitState.fit_chunk").add(len(ctx.X), elapsed, mon)
+
+    encoded: list[tuple[np.ndarray, np.ndarray]] = []
+    for ctx in outputs:
+        with _PeakRss() as mon:
+            t0 = time.perf_counter()
+            encoded.append(fit.transform_chunk(ctx.X, ctx.y, feature_names=feature_names))
+            elapsed = time.perf_counter() - t0
+        stage("FitState.transform_chunk").add(len(ctx.X), elapsed, mon)
+
+    writer = NpyWriter(outdir=workdir / "npy", n_rows=sum(len(x) for x, _ in encoded), feature_names=feature_names)
+    offset = 0
+    for X_arr, y_arr in encoded:
+        with _PeakRss() as mon:
+            t0 = time.perf_counter()
+            writer.write(offset=offset, X_arr=X_arr, y_arr=y_arr)
+            elapsed = time.perf_counter() - t0
+        stage("NpyWriter.write").add(len(X_arr), elapsed, mon)
+        offset += len(X_arr)
+    with _PeakRss() as mon:
+        t0 = time.perf_counter()
+        writer.close()
+        elapsed = time.perf_counter() - t0
+    stage("NpyWriter.write").add(0, elapsed, mon)
+    return list(results.values())
+
+
+def bench_app(args: argparse.Namespace, input_path: Path, workdir: Path) -> StageResult:
+    """Full run in a child process; its peak RSS comes from the kernel's accounting."""
+    import resource
+
+    outdir = workdir / "app"
+    cmd = [
+        sys.executable, str(APP),
+        "--input", str(input_path),
+        "--outdir", str(outdir),
+        "--chunksize", str(args.chunksize),
+        "--parse-cache-size", str(args.parse_cache_size),
+        "--loglevel", "WARNING",
+    ]
+    if args.vectorized:
+        cmd.append("--vectorized")
+    cmd += args.app_arg
+    t0 = time.perf_counter()
+    subprocess.run(cmd, check=True)
+    elapsed = time.perf_counter() - t0
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024  # only child so far
+    rows = int(np.load(outdir / "y_data.npy", mmap_mode="r").shape[0])
+    return StageResult(name="app.py", rows=rows, seconds=elapsed, peak_rss=peak, rss_growth=peak)
+
+
+def report(results: list[StageResult], baseline: Optional[dict[str, Any]], tolerance: float) -> int:
+    regressions = 0
+    mib = 2**20
+    print(f"{'stage':<30} {'rows':>10} {'seconds':>9} {'rows/s':>12} {'peak RSS':>10} {'+MiB':>8}")
+    for r in results:
+        line = (
+            f"{r.name:<30} {r.rows:>10} {r.seconds:>9.3f} {r.rows_per_s:>12,.0f} "
+            f"{r.peak_rss / mib:>9.1f}M {r.rss_growth / mib:>8.1f}"
+        )
+        old = (baseline or {}).get(r.name)
+        if old and old.get("rows_per_s"):
+            change = r.rows_per_s / old["rows_per_s"] - 1
+            line += f"  {change * 100:+6.1f}%"
+            if change < -tolerance:
+                line += "  REGRESSION"
+                regressions += 1
+        print(line)
+    return regressions
+
+
+def main() -> int:
+    args = parse_args()
+    baseline = None
+    if args.baseline:
+        baseline = {r["name"]: r for r in json.loads(Path(args.baseline).read_text(encoding="utf-8"))["stages"]}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        if args.input:
+            input_path = Path(args.input).expanduser().resolve()
+        else:
+            input_path = workdir / "hh_synth.csv"
+            t0 = time.perf_counter()
+            write_csv(input_path, rows=args.rows, seed=args.seed)
+            print(f"generated {args.rows} synthetic rows in {time.perf_counter() - t0:.1f} s")
+
+        # the app.py child runs first so RUSAGE_CHILDREN reflects it alone
+        app = None if args.skip_app else bench_app(args, input_path, workdir)
+        results = bench_in_process(args, input_path, workdir)
+        if app is not None:
+            results.append(app)
+
+    regressions = report(results, baseline, args.tolerance)
+    if args.json:
+        payload = {
+            "input": str(args.input or f"synthetic:{args.rows}:{args.seed}"),
+            "chunksize": args.chunksize,
+            "vectorized": args.vectorized,
+            "stages": [r.as_dict() for r in results],
+        }
+        Path(args.json).write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
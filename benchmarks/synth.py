@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Deterministic synthetic HH resume CSV, shaped like the real export.
+
+Usage:
+    python -m benchmarks.synth --rows 10000000 --out hh_synth.csv --seed 0 --workers 4
+
+Every column the handlers parse gets the value variants seen in real dumps:
+salary ranges / "от" / "до" / foreign currencies / "по договоренности", gender with
+or without age and birthday, city with relocation and business-trip flags, experience
+strings, education, resume update timestamps and car ownership. Free-text columns
+(position, employer) have a long Zipf tail, like the real data.
+
+Rows are produced in blocks, each from its own RNG seeded with (seed, block number),
+so the output depends only on --seed and --rows (not --workers or timing) and
+memory stays flat at any size.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = [
+    "",
+    "Пол, возраст",
+    "ЗП",
+    "Ищет работу на должность:",
+    "Город",
+    "Занятость",
+    "График",
+    "Опыт (двойное нажатие для полной версии)",
+    "Последенее/нынешнее место работы",
+    "Последеняя/нынешняя должность",
+    "Образование и ВУЗ",
+    "Обновление резюме",
+    "Авто",
+]
+
+CITIES = [
+    "Москва", "Санкт-Петербург", "Новосибирск", "Екатеринбург", "Казань", "Нижний Новгород",
+    "Челябинск", "Самара", "Омск", "Ростов-на-Дону", "Уфа", "Красноярск", "Воронеж", "Пермь",
+    "Волгоград", "Краснодар", "Саратов", "Тюмень", "Тольятти", "Ижевск",
+]
+POSITIONS = [
+    "Программист", "Менеджер по продажам", "Водитель", "Бухгалтер", "Инженер", "Продавец-консультант",
+    "Администратор", "Юрист", "Аналитик", "Системный администратор", "Кладовщик", "Оператор call-центра",
+    "Менеджер проекта", "Дизайнер", "Маркетолог", "Специалист по кадрам", "Курьер", "Экономист",
+]
+EMPLOYERS = [
+    "Сбербанк", "Яндекс", "Газпром", "РЖД", "Магнит", "Пятёрочка", "Ростелеком", "МТС", "ВТБ",
+    "Лукойл", "X5 Retail Group", "Мегафон", "Билайн", "Альфа-Банк", "Тинькофф", "ИП",
+]
+EMPLOYMENT = ["полная занятость", "частичная занятость", "проектная работа", "стажировка", "волонтерство"]
+SCHEDULE = ["полный день", "гибкий график", "сменный график", "удаленная работа", "вахтовый метод"]
+MONTHS_GEN = [
+    "января", "февраля", "марта", "апреля", "мая", "июня",
+    "июля", "августа", "сентября", "октября", "ноября", "декабря",
+]
+MONTHS_NOM = [
+    "Январь", "Февраль", "Март", "Апрель", "Май", "Июнь",
+    "Июль", "Август", "Сентябрь", "Октябрь", "Ноябрь", "Декабрь",
+]
+UNIVERSITIES = ["МГУ", "СПбГУ", "МФТИ", "НГУ", "КФУ", "УрФУ", "МГТУ им. Н.Э. Баумана", "ВШЭ", "РЭУ им. Г.В. Плеханова"]
+EDUCATION = [
+    ("Высшее образование", True), ("Неоконченное высшее образование", True),
+    ("Среднее специальное образование", True), ("Среднее образование", False),
+]
+CARS = ["Имеется собственный автомобиль", "Не указано", "Нет"]
+
+
+def _plural(n: int, one: str, few: str, many: str) -> str:
+    if n % 10 == 1 and n % 100 != 11:
+        return one
+    if 2 <= n % 10 <= 4 and not 12 <= n % 100 <= 14:
+        return few
+    return many
+
+
+def _money(n: int, nbsp: bool) -> str:
+    # thousands grouped with a space, sometimes a non-breaking one
+    sep = "\u00a0" if nbsp else " "
+    return f"{n:,}".replace(",", sep)
+
+
+def _zipf_pick(rng: np.random.Generator, pool: list[str], n: int, tail: str) -> list[str]:
+    """Mostly the common `pool` values, plus a long tail of generated ones ("<tail> N")."""
+    ranks = rng.zipf(1.3, size=n)
+    return [pool[r - 1] if r <= len(pool) else f"{tail} {r}" for r in ranks.tolist()]
+
+
+def _gender_age(rng: np.random.Generator, n: int) -> list[str]:
+    male = rng.random(n) < 0.55
+    age = rng.integers(18, 66, size=n)
+    kind = rng.choice(3, size=n, p=[0.1, 0.5, 0.4])  # gender only / + age / + age + birthday
+    day = rng.integers(1, 29, size=n)
+    month = rng.integers(0, 12, size=n)
+    out = []
+    for m, a, k, d, mo in zip(male.tolist(), age.tolist(), kind.tolist(), day.tolist(), month.tolist()):
+        g = "Мужчина" if m else "Женщина"
+        if k == 0:
+            out.append(g)
+            continue
+        s = f"{g} , {a} {_plural(a, 'год', 'года', 'лет')}"
+        if k == 2:
+            s += f" , {'родился' if m else 'родилась'} {d} {MONTHS_GEN[mo]} {2019 - a}"
+        out.append(s)
+    return out
+
+
+def _salary(rng: np.random.Generator, n: int) -> list[object]:
+    kind = rng.choice(8, size=n, p=[0.3, 0.15, 0.12, 0.12, 0.04, 0.02, 0.05, 0.2])
+    lo = (rng.lognormal(10.6, 0.5, size=n) // 1000 * 1000).astype(np.int64) + 5000
+    hi = lo + rng.integers(1, 40, size=n) * 1000
+    nbsp = rng.random(n) < 0.3
+    out: list[object] = []
+    for k, a, b, sp in zip(kind.tolist(), lo.tolist(), hi.tolist(), nbsp.tolist()):
+        if k == 0:
+            out.append(f"{_money(a, sp)} руб.")
+        elif k == 1:
+            out.append(f"{_money(a, sp)} - {_money(b, sp)} руб.")
+        elif k == 2:
+            out.append(f"от {_money(a, sp)} руб.")
+        elif k == 3:
+            out.append(f"до {_money(b, sp)} руб.")
+        elif k == 4:
+            out.append(f"{_money(a // 70 // 100 * 100 + 500, sp)} USD")
+        elif k == 5:
+            out.append(f"{_money(a // 80 // 100 * 100 + 500, sp)} EUR")
+        elif k == 6:
+            out.append("по договоренности")
+        else:
+            out.append(None)
+    return out
+
+
+def _city(rng: np.random.Generator, n: int) -> list[str]:
+    city = rng.integers(0, len(CITIES), size=n)
+    reloc = rng.choice(3, size=n, p=[0.3, 0.4, 0.3])  # none / готов / не готов
+    trips = rng.choice(4, size=n, p=[0.3, 0.3, 0.2, 0.2])  # none / готов / не готов / редким
+    out = []
+    for c, r, t in zip(city.tolist(), reloc.tolist(), trips.tolist()):
+        parts = [CITIES[c]]
+        if r == 1:
+            parts.append("готов к переезду")
+        elif r == 2:
+            parts.append("не готов к переезду")
+        if t == 1:
+            parts.append("готов к командировкам")
+        elif t == 2:
+            parts.append("не готов к командировкам")
+        elif t == 3:
+            parts.append("готов к редким командировкам")
+        out.append(" , ".join(parts))
+    return out
+
+
+def _experience(rng: np.random.Generator, n: int) -> list[object]:
+    years = rng.integers(0, 35, size=n)
+    months = rng.integers(0, 12, size=n)
+    start_month = rng.integers(0, 12, size=n)
+    has = rng.random(n) < 0.85
+    out: list[object] = []
+    for h, y, m, sm in zip(has.tolist(), years.tolist(), months.tolist(), start_month.tolist()):
+        if not h:
+            out.append(None)
+            continue
+        s = "Опыт работы"
+        if y:
+            s += f" {y} {_plural(y, 'год', 'года', 'лет')}"
+        if m or not y:
+            s += f" {m} {_plural(m, 'месяц', 'месяца', 'месяцев')}"
+        s += f"  {MONTHS_NOM[sm]} {2019 - min(y, 30)} — по настоящее время"
+        out.append(s)
+    return out
+
+
+def _education(rng: np.random.Generator, n: int) -> list[object]:
+    kind = rng.choice(len(EDUCATION) + 2, size=n, p=[0.45, 0.08, 0.2, 0.12, 0.1, 0.05])
+    year = rng.integers(1975, 2019, size=n)
+    uni = rng.integers(0, len(UNIVERSITIES), size=n)
+    out: list[object] = []
+    for k, y, u in zip(kind.tolist(), year.tolist(), uni.tolist()):
+        if k == len(EDUCATION):
+            out.append("Не указано")
+        elif k > len(EDUCATION):
+            out.append(None)
+        else:
+            name, with_school = EDUCATION[k]
+            out.append(f"{name} {y} {UNIVERSITIES[u]}" if with_school else name)
+    return out
+
+
+def _joined(rng: np.random.Generator, pool: list[str], n: int) -> list[str]:
+    # one to three distinct values, comma-joined ("частичная занятость, полная занятость")
+    masks = rng.integers(1, 1 << len(pool), size=n)
+    masks = np.where(rng.random(n) < 0.7, 1 << rng.integers(0, 2, size=n), masks)
+    return [", ".join(v for i, v in enumerate(pool) if mk >> i & 1) for mk in masks.tolist()]
+
+
+def _updated(rng: np.random.Generator, n: int) -> list[str]:
+    # "dd.mm.yyyy HH:MM"; f-strings over the components beat DatetimeIndex.strftime ~3x
+    ts = pd.DatetimeIndex(pd.Timestamp("2018-01-01") + pd.to_timedelta(rng.integers(0, 500 * 1440, size=n), unit="min"))
+    parts = (ts.day, ts.month, ts.year, ts.hour, ts.minute)
+    return [f"{d:02d}.{m:02d}.{y} {h:02d}:{mi:02d}" for d, m, y, h, mi in zip(*(p.tolist() for p in parts))]
+
+
+def generate_block(seed: int, block: int, start: int, n: int) -> pd.DataFrame:
+    """Rows [start, start + n) of the synthetic dataset."""
+    rng = np.random.default_rng([seed, block])
+    return pd.DataFrame(
+        {
+            "": np.arange(start, start + n),
+            "Пол, возраст": _gender_age(rng, n),
+            "ЗП": _salary(rng, n),
+            "Ищет работу на должность:": _zipf_pick(rng, POSITIONS, n, "Специалист"),
+            "Город": _city(rng, n),
+            "Занятость": _joined(rng, EMPLOYMENT, n),
+            "График": _joined(rng, SCHEDULE, n),
+            "Опыт (двойное нажатие для полной версии)": _experience(rng, n),
+            "Последенее/нынешнее место работы": _zipf_pick(rng, EMPLOYERS, n, "ООО Компания"),
+            "Последеняя/нынешняя должность": _zipf_pick(rng, POSITIONS, n, "Сотрудник"),
+            "Образование и ВУЗ": _education(rng, n),
+            "Обновление резюме": _updated(rng, n),
+            "Авто": [CARS[i] if i < len(CARS) else None for i in rng.integers(0, len(CARS) + 1, size=n).tolist()],
+        },
+        columns=COLUMNS,
+    )
+
+
+def iter_blocks(rows: int, seed: int = 0, block_rows: int = 100_000) -> Iterator[pd.DataFrame]:
+    for block, start in enumerate(range(0, rows, block_rows)):
+        yield generate_block(seed, block, start, min(block_rows, rows - start))
+
+
+def _block_csv(seed: int, block: int, start: int, n: int) -> str:
+    return generate_block(seed, block, start, n).to_csv(index=False, header=block == 0, lineterminator="\r\n")
+
+
+def write_csv(path: Path, rows: int, seed: int = 0, block_rows: int = 100_000, workers: int = 1) -> None:
+    """Write `rows` synthetic rows to `path` (utf-8, comma-separated, header included).
+
+    With workers > 1 blocks are generated and formatted in a process pool and written
+    in block order, with at most 2 * workers blocks in flight.
+    """
+    blocks = [(seed, b, start, min(block_rows, rows - start)) for b, start in enumerate(range(0, rows, block_rows))]
+    with open(path, "w", encoding="utf-8", newline="") as fh:
+        if workers <= 1:
+            for args in blocks:
+                fh.write(_block_csv(*args))
+            return
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending: deque[Future] = deque()
+            for args in blocks:
+                pending.append(pool.submit(_block_csv, *args))
+                if len(pending) >= 2 * workers:
+                    fh.write(pending.popleft().result())
+            while pending:
+                fh.write(pending.popleft().result())
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Generate a synthetic hh.csv")
+    p.add_argument("--rows", "-n", type=int, default=1_000_000, help="Number of resumes")
+    p.add_argument("--out", "-o", required=True, help="Output CSV path")
+    p.add_argument("--seed", type=int, default=0, help="RNG seed (same seed + rows -> same file)")
+    p.add_argument("--block-rows", type=int, default=100_000, help="Rows generated per block")
+    p.add_argument("--workers", "-j", type=int, default=1, help="Generate blocks in this many processes")
+    return p.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    t0 = time.perf_counter()
+    write_csv(Path(args.out), rows=args.rows, seed=args.seed, block_rows=args.block_rows, workers=args.workers)
+    elapsed = time.perf_counter() - t0
+    print(f"{args.rows} rows -> {args.out} in {elapsed:.1f} s ({args.rows / elapsed:,.0f} rows/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Scaling of app.py over --workers, with a byte-identity check against the serial run.
+
+Usage:
+    python -m benchmarks.workers --input hh.csv --chunksize 50000 --workers 1 2 4 8
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+APP = Path(__file__).resolve().parent.parent / "app.py"
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Benchmark app.py scaling over --workers")
+    p.add_argument("--input", "-i", required=True, help="Path to hh.csv")
+    p.add_argument("--chunksize", "-c", type=int, default=50_000, help="Rows per chunk")
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="Worker counts to run")
+    return p.parse_args()
+
+
+def _digest(outdir: Path) -> str:
+    h = hashlib.sha256()
+    for name in ("x_data.npy", "y_data.npy", "feature_names.txt"):
+        h.update((outdir / name).read_bytes())
+    return h.hexdigest()
+
+
+def main() -> int:
+    args = parse_args()
+    baseline: tuple[float, str] | None = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.workers:
+            outdir = Path(tmp) / f"w{n}"
+            cmd = [
+                sys.executable, str(APP),
+                "--input", args.input,
+                "--outdir", str(outdir),
+                "--chunksize", str(args.chunksize),
+                "--workers", str(n),
+                "--loglevel", "WARNING",
+            ]
+            t0 = time.perf_counter()
+            subprocess.run(cmd, check=True)
+            elapsed = time.perf_counter() - t0
+            digest = _digest(outdir)
+            if baseline is None:
+                baseline = (elapsed, digest)
+            same = "identical" if digest == baseline[1] else "DIFFERENT"
+            print(f"workers={n:>2}: {elapsed:8.2f} s  speedup x{baseline[0] / elapsed:5.2f}  output {same}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,11 +1,23 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, field
+import json
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
 from typing import Any
 
 import numpy as np
 import pandas as pd
 
+from .strategies import OTHER, OTHER_CODE, ColumnStrategy, HeavyHitters, approx_nbytes, hash_codes
+
+_STATE_VERSION = 1
+
+# datetime64 ticks per second, by unit (pandas >= 2 parses to s/ms/us, not always ns)
+_TICKS_PER_S = {"s": 1, "ms": 1_000, "us": 1_000_000, "ns": 1_000_000_000}
+
+
+_EXACT = ColumnStrategy()
+
 
 def _norm_cat(x: Any) -> str:
     if pd.isna(x):
@@ -14,33 +26,271 @@ def _norm_cat(x: Any) -> str:
     return s if s else "__NA__"
 
 
+def _norm_cat_vec(values: pd.Series) -> np.ndarray:
+    """_norm_cat over a whole series, as an object array."""
+    na = values.isna().to_numpy()
+    s = np.array(values.astype(str).astype(object).str.strip(), dtype=object)
+    s[na | (s == "")] = "__NA__"
+    return s
+
+
+def _factorize_norm(ser: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """(codes, normalized distinct values): _norm_cat runs once per distinct value."""
+    codes, uniques = pd.factorize(ser, use_na_sentinel=False)
+    return codes, _norm_cat_vec(pd.Series(uniques, dtype=object))
+
+
+def _is_numeric_like(ser: pd.Series) -> bool:
+    return (
+        pd.api.types.is_numeric_dtype(ser)
+        or pd.api.types.is_bool_dtype(ser)
+        or pd.api.types.is_datetime64_any_dtype(ser)
+    )
+
+
 @dataclass
 class FitState:
     """Holds fitted categorical mappings to allow consistent encoding across chunks."""
 
     # columns that are treated as categorical (mapped to int codes)
     cat_cols: set[str] = field(default_factory=set)
-    # mapping per column: value -> code
+    # mapping per column: value -> code (insertion order == code order)
     maps: dict[str, dict[str, int]] = field(default_factory=dict)
+    feature_names: list[str] = field(default_factory=list)
+    # per-column encoding strategy; columns not listed are "exact"
+    strategies: dict[str, ColumnStrategy] = field(default_factory=dict)
+    # pass-1 heavy-hitters sketches of "topk" columns, turned into maps by finalize()
+    sketches: dict[str, HeavyHitters] = field(default_factory=dict, repr=False)
+    # False in per-chunk states of parallel workers: they keep exact chunk counts, so
+    # merging them in chunk order prunes exactly like a serial fit does
+    prune_sketches: bool = True
+    # frozen lookup index per column (position == code), rebuilt after maps change
+    _indexes: dict[str, pd.Index] = field(default_factory=dict, repr=False, compare=False)
 
     def init_columns(self, feature_names: list[str]) -> None:
         # Anything non-numeric will be considered categorical; we decide during fit_chunk too.
         self.cat_cols = set(feature_names)
+        self.feature_names = list(feature_names)
+
+    def _index(self, col: str) -> pd.Index:
+        idx = self._indexes.get(col)
+        if idx is None:
+            idx = pd.Index(list(self.maps.get(col, {"__NA__": 0})), dtype=object)
+            self._indexes[col] = idx
+        return idx
 
     def fit_chunk(self, X: pd.DataFrame) -> None:
         for col in X.columns:
             ser = X[col]
             # numeric columns: leave as numeric (remove from cat_cols)
-            if pd.api.types.is_numeric_dtype(ser) or pd.api.types.is_bool_dtype(ser) or pd.api.types.is_datetime64_any_dtype(ser):
+            if _is_numeric_like(ser):
                 self.cat_cols.discard(col)
                 continue
 
             # categorical
-            self.maps.setdefault(col, {"__NA__": 0})
-            m = self.maps[col]
-            for v in ser.map(_norm_cat).unique():
-                if v not in m:
-                    m[v] = len(m)
+            self._add_values(col, ser)
+
+    def strategy(self, col: str) -> ColumnStrategy:
+        return self.strategies.get(col) or _EXACT
+
+    def _add_values(self, col: str, ser: pd.Series) -> None:
+        strategy = self.strategy(col)
+        if strategy.kind == "hash":
+            return
+        if strategy.kind == "topk":
+            if col in self.maps:
+                raise RuntimeError(f"{col}: top-K codes are already final; cannot fit more values")
+            codes, norm = _factorize_norm(ser)
+            counts = np.bincount(codes, minlength=len(norm))
+            keep = norm != "__NA__"
+            sketch = self.sketches.setdefault(col, HeavyHitters(capacity=strategy.capacity))
+            sketch.update(norm[keep], counts[keep], prune=self.prune_sketches)
+            return
+        # new values get the next free code, in order of first appearance
+        self.maps.setdefault(col, {"__NA__": 0})
+        m = self.maps[col]
+        codes, norm = _factorize_norm(ser)
+        _, first_row = np.unique(codes, return_index=True)
+        n_before = len(m)
+        for k in np.argsort(first_row, kind="stable"):
+            v = norm[k]
+            if v not in m:
+                m[v] = len(m)
+        if len(m) != n_before:
+            self._indexes.pop(col, None)
+
+    def merge(self, other: "FitState", columns: list[str]) -> None:
+        """Fold in a FitState fitted on later chunks (init_columns(columns) + fit_chunk).
+
+        Merging per-chunk states in chunk order gives the same codes as fitting serially.
+        """
+        self.cat_cols -= set(columns) - other.cat_cols
+        for col, sketch in other.sketches.items():
+            mine = self.sketches.get(col)
+            if mine is None:
+                mine = self.sketches[col] = HeavyHitters(capacity=sketch.capacity)
+            mine.merge(sketch)
+        for col, m in other.maps.items():
+            mine = self.maps.setdefault(col, {"__NA__": 0})
+            for v in m:  # insertion order == code order == first appearance
+                if v not in mine:
+                    mine[v] = len(mine)
+            self._indexes.pop(col, None)
+
+    def finalize(self) -> None:
+        """End of the fit pass: "topk" columns get their codes from the sketches
+        ("__NA__" 0, "__OTHER__" 1, then by descending count) and the sketches are dropped."""
+        for col, sketch in self.sketches.items():
+            strategy = self.strategy(col)
+            values = sketch.top(strategy.k, strategy.min_count)
+            self.maps[col] = {"__NA__": 0, OTHER: OTHER_CODE, **{v: i + 2 for i, v in enumerate(values)}}
+            self._indexes.pop(col, None)
+        self.sketches.clear()
+
+    def n_codes(self, col: str) -> int:
+        """Size of the code space of a categorical column (max code + 1)."""
+        strategy = self.strategy(col)
+        if strategy.kind == "hash":
+            return strategy.buckets + 1
+        return len(self.maps.get(col, {"__NA__": 0}))
+
+    def memory_stats(self) -> dict[str, dict[str, Any]]:
+        """Per categorical column: strategy, codes, sketch counters and approximate bytes held."""
+        stats: dict[str, dict[str, Any]] = {}
+        for col in self.feature_names or sorted(self.cat_cols):
+            if col not in self.cat_cols:
+                continue
+            sketch = self.sketches.get(col)
+            m = self.maps.get(col, {})
+            strategy = self.strategy(col)
+            stats[col] = {
+                "strategy": strategy.kind,
+                # before finalize(), the codes finalize() would assign
+                "codes": self.n_codes(col) if sketch is None else len(sketch.top(strategy.k, strategy.min_count)) + 2,
+                "sketch_counters": len(sketch.counts) if sketch is not None else 0,
+                "sketch_error": sketch.error if sketch is not None else 0,
+                "bytes": approx_nbytes(m) + (sketch.nbytes() if sketch is not None else 0),
+            }
+        return stats
+
+    def fit_transform_chunk(
+        self, X: pd.DataFrame, y: pd.Series, feature_names: list[str]
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Single-pass encoding: extend the mappings with this chunk's values, then encode it.
+
+        Codes come out the same as with fit_chunk over all chunks followed by
+        transform_chunk, except that a column already encoded as categorical stays
+        categorical if a later chunk looks numeric: earlier rows are already written.
+        "topk" columns need a fit pass and are not supported here; "hash" columns are.
+        """
+        self.partial_fit(X)
+        return self.transform_chunk(X, y, feature_names=feature_names)
+
+    def partial_fit(self, X: pd.DataFrame) -> None:
+        """The fitting half of fit_transform_chunk."""
+        topk = [c for c, st in self.strategies.items() if st.kind == "topk" and c in X.columns]
+        if topk:
+            raise ValueError(f"top-K encoding needs a fit pass; not supported for single-pass fitting: {topk}")
+        for col in X.columns:
+            ser = X[col]
+            if col in self.maps or (col in self.cat_cols and not _is_numeric_like(ser)):
+                self._add_values(col, ser)
+            else:
+                self.cat_cols.discard(col)
+
+    def sort_codes(self) -> dict[str, np.ndarray]:
+        """Reassign codes in sorted value order ("__NA__" stays 0, "__OTHER__" 1).
+
+        Returns per-column lookup tables old_code -> new_code, for remapping
+        arrays that were already encoded with the old codes.
+        """
+        luts: dict[str, np.ndarray] = {}
+        for col, m in self.maps.items():
+            reserved = ["__NA__"] + ([OTHER] if self.strategy(col).kind == "topk" else [])
+            values = sorted(v for v in m if v not in reserved)
+            new = {v: i for i, v in enumerate(reserved + values)}
+            lut = np.empty(len(m), dtype=np.int64)
+            for v, old_code in m.items():
+                lut[old_code] = new[v]
+            self.maps[col] = new
+            luts[col] = lut
+        self._indexes.clear()
+        return luts
+
+    def save(self, path: Path) -> None:
+        """Write the state as one .npz: JSON metadata plus, per categorical column,
+        its values in code order as a UTF-8 byte buffer with int64 offsets."""
+        arrays: dict[str, np.ndarray] = {}
+        map_cols = list(self.maps)
+        for i, col in enumerate(map_cols):
+            encoded = [v.encode("utf-8") for v in self.maps[col]]
+            lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+            arrays[f"offsets_{i}"] = np.concatenate([[0], np.cumsum(lengths)])
+            arrays[f"values_{i}"] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        meta = {
+            "version": _STATE_VERSION,
+            "feature_names": self.feature_names,
+            "cat_cols": sorted(self.cat_cols),
+            "map_cols": map_cols,
+            "strategies": {col: asdict(st) for col, st in self.strategies.items()},
+        }
+        arrays["meta"] = np.frombuffer(json.dumps(meta, ensure_ascii=False).encode("utf-8"), dtype=np.uint8)
+        tmp = Path(path).with_name(Path(path).name + ".tmp")
+        with open(tmp, "wb") as fh:
+            np.savez_compressed(fh, **arrays)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "FitState":
+        with np.load(path) as data:
+            meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+            if meta.get("version") != _STATE_VERSION:
+                raise ValueError(f"{path}: unsupported FitState version {meta.get('version')}")
+            maps: dict[str, dict[str, int]] = {}
+            for i, col in enumerate(meta["map_cols"]):
+                offsets = data[f"offsets_{i}"]
+                buf = data[f"values_{i}"].tobytes()
+                values = [buf[a:b].decode("utf-8") for a, b in zip(offsets[:-1], offsets[1:])]
+                maps[col] = {v: code for code, v in enumerate(values)}
+        strategies = {col: ColumnStrategy(**st) for col, st in meta.get("strategies", {}).items()}
+        return cls(cat_cols=set(meta["cat_cols"]), maps=maps, feature_names=meta["feature_names"], strategies=strategies)
+
+    def column_kind(self, col: str, ser: pd.Series) -> str:
+        """How `col` is encoded: "category" (int codes), "datetime" (epoch seconds),
+        "bool" (0/1) or "float"."""
+        if col in self.cat_cols:
+            return "category"
+        if pd.api.types.is_datetime64_any_dtype(ser):
+            return "datetime"
+        if pd.api.types.is_bool_dtype(ser):
+            return "bool"
+        return "float"
+
+    def encode_column(self, col: str, ser: pd.Series, kind: str) -> np.ndarray:
+        """One column in its natural dtype: int64 codes / int64 seconds / uint8 / float32."""
+        if kind == "category":
+            # look up each distinct value once; unseen values -> 0 ("__NA__"), or
+            # "__OTHER__" for top-K columns
+            codes, norm = _factorize_norm(ser)
+            strategy = self.strategy(col)
+            if strategy.kind == "hash":
+                return hash_codes(norm, strategy.buckets)[codes]
+            if col in self.sketches:
+                raise RuntimeError(f"{col}: call finalize() after fitting before encoding")
+            lookup = self._index(col).get_indexer(pd.Index(norm, dtype=object)).astype(np.int64)
+            lookup[lookup < 0] = OTHER_CODE if strategy.kind == "topk" else 0
+            return lookup[codes]
+        if kind == "datetime":
+            # seconds since epoch, NaT -> -1
+            dt = ser if pd.api.types.is_datetime64_any_dtype(ser) else pd.to_datetime(ser, errors="coerce")
+            # astype("int64") gives ticks of dt's unit since epoch; NaT becomes the min int64
+            sec = dt.astype("int64") // _TICKS_PER_S[dt.dt.unit]
+            return sec.where(dt.notna(), -1).to_numpy(dtype=np.int64)
+        if kind == "bool":
+            if pd.api.types.is_bool_dtype(ser):
+                return ser.fillna(False).astype("int8").to_numpy(dtype=np.uint8)
+            return pd.to_numeric(ser, errors="coerce").fillna(0).to_numpy(dtype=np.uint8)
+        return pd.to_numeric(ser, errors="coerce").fillna(np.nan).to_numpy(dtype=np.float32)
 
     def transform_chunk(self, X: pd.DataFrame, y: pd.Series, feature_names: list[str]) -> tuple[np.ndarray, np.ndarray]:
         """Return (X_arr, y_arr) as float32 arrays."""
@@ -50,24 +300,19 @@ class FitState:
 
         for j, col in enumerate(feature_names):
             ser = X[col] if col in X.columns else pd.Series([pd.NA] * len(X))
+            out[:, j] = self.encode_column(col, ser, self.column_kind(col, ser))
 
-            if col in self.cat_cols:
-                mapping = self.maps.get(col, {"__NA__": 0})
-                codes = ser.map(_norm_cat).map(lambda v: mapping.get(v, 0)).astype("int32").to_numpy()
-                out[:, j] = codes.astype(np.float32)
-            else:
-                if pd.api.types.is_datetime64_any_dtype(ser):
-                    # seconds since epoch, NaT -> -1
-                    dt = pd.to_datetime(ser, errors="coerce")
-                    # dt.astype("int64") gives ns since epoch; NaT becomes the min int64
-                    ns = dt.astype("int64")
-                    sec = (ns // 1_000_000_000).astype("int64")
-                    sec = sec.where(dt.notna(), -1)
-                    out[:, j] = sec.to_numpy(dtype=np.float32)
-                elif pd.api.types.is_bool_dtype(ser):
-                    out[:, j] = ser.fillna(False).astype("int8").to_numpy(dtype=np.float32)
-                else:
-                    out[:, j] = pd.to_numeric(ser, errors="coerce").fillna(np.nan).to_numpy(dtype=np.float32)
+        y_arr = pd.to_numeric(y, errors="coerce").to_numpy(dtype=np.float32)
+        return out, y_arr
+
+    def transform_columns(
+        self, X: pd.DataFrame, y: pd.Series, kinds: dict[str, str]
+    ) -> tuple[dict[str, np.ndarray], np.ndarray]:
+        """Like transform_chunk, but one array per column in its natural dtype.
 
+        `kinds` fixes each column's encoding (see column_kind) for the whole run.
+        """
+        X = X.reindex(columns=list(kinds))
+        out = {col: self.encode_column(col, X[col], kind) for col, kind in kinds.items()}
         y_arr = pd.to_numeric(y, errors="coerce").to_numpy(dtype=np.float32)
         return out, y_arr
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import sys
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+# reserved codes of bounded columns: 0 is "__NA__" as everywhere, 1 collects the rest
+OTHER = "__OTHER__"
+OTHER_CODE = 1
+STRATEGY_KINDS = ("exact", "topk", "hash")
+
+
+@dataclass(frozen=True)
+class ColumnStrategy:
+    """How one categorical column is encoded.
+
+    exact: every distinct value gets its own code (the default, unbounded).
+    topk:  the `k` most frequent values seen at least `min_count` times get codes
+           2.., everything else is "__OTHER__" (1). Pass 1 keeps only a heavy-hitters
+           sketch of `sketch_size` counters (default 4 * k) per column.
+    hash:  code = 1 + hash(value) % `buckets`; no fit and no stored mapping.
+    """
+
+    kind: str = "exact"
+    k: int = 10_000
+    min_count: int = 1
+    sketch_size: int = 0
+    buckets: int = 1 << 18
+
+    def __post_init__(self) -> None:
+        if self.kind not in STRATEGY_KINDS:
+            raise ValueError(f"unknown encoding strategy {self.kind!r}, expected one of {STRATEGY_KINDS}")
+        if self.k < 1 or self.min_count < 1 or self.buckets < 1 or self.sketch_size < 0:
+            raise ValueError(f"invalid strategy parameters: {self}")
+
+    @property
+    def capacity(self) -> int:
+        return max(self.sketch_size or 4 * self.k, self.k)
+
+
+def hash_codes(norm: np.ndarray, buckets: int) -> np.ndarray:
+    """Codes 1..buckets for normalized values ("__NA__" -> 0).
+
+    pandas' hash_array uses a fixed key, so codes are stable across runs and processes
+    (unlike the builtin hash()).
+    """
+    h = pd.util.hash_array(np.asarray(norm, dtype=object), categorize=False)
+    codes = (h % np.uint64(buckets)).astype(np.int64) + 1
+    codes[norm == "__NA__"] = 0
+    return codes
+
+
+@dataclass
+class HeavyHitters:
+    """Misra-Gries summary with at most `capacity` counters.
+
+    Every value occurring more than n / (capacity + 1) times out of n is kept, and each
+    kept count is under the true count by at most `error` (the total decrement so far).
+    Summaries merge (Agarwal et al.): add the counters, then prune. update() merges the
+    exact counts of one batch, so feeding chunks in order or merging per-chunk summaries
+    in the same order gives the same result.
+    """
+
+    capacity: int
+    counts: dict[str, int] = field(default_factory=dict)
+    error: int = 0
+    total: int = 0
+
+    def update(self, values: np.ndarray, counts: np.ndarray, prune: bool = True) -> None:
+        c = self.counts
+        for v, n in zip(values.tolist(), counts.tolist()):
+            c[v] = c.get(v, 0) + n
+            self.total += n
+        if prune:
+            self.prune()
+
+    def merge(self, other: "HeavyHitters") -> None:
+        c = self.counts
+        for v, n in other.counts.items():
+            c[v] = c.get(v, 0) + n
+        self.total += other.total
+        self.error += other.error
+        self.prune()
+
+    def prune(self) -> None:
+        if len(self.counts) <= self.capacity:
+            return
+        counts = np.fromiter(self.counts.values(), dtype=np.int64, count=len(self.counts))
+        # subtract the (capacity + 1)-th largest count: at most `capacity` stay positive
+        cut = int(np.partition(counts, -(self.capacity + 1))[-(self.capacity + 1)])
+        self.counts = {v: n - cut for v, n in self.counts.items() if n > cut}
+        self.error += cut
+
+    def top(self, k: int, min_count: int = 1) -> list[str]:
+        """Up to k values by estimated count (ties by value), each seen >= min_count times."""
+        ranked = sorted(self.counts.items(), key=lambda vn: (-vn[1], vn[0]))
+        return [v for v, n in ranked[:k] if n >= min_count]
+
+    def nbytes(self) -> int:
+        return approx_nbytes(self.counts)
+
+
+def approx_nbytes(m: dict[str, Any]) -> int:
+    """Rough footprint of a str -> int dict: the table plus its key and value objects."""
+    return sys.getsizeof(m) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in m.items())
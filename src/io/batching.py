@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+
+Batch = tuple[np.ndarray, np.ndarray]
+
+
+def rebatch(chunks: Iterable[Batch], batch_size: int, drop_last: bool = False) -> Iterator[Batch]:
+    """(X, y) batches of `batch_size` rows, in order, from (X, y) chunks of any size.
+
+    Rows left over from a chunk are carried into the next one; the final short batch
+    is yielded unless `drop_last`.
+    """
+    X_left: Optional[np.ndarray] = None
+    y_left: Optional[np.ndarray] = None
+    for X, y in chunks:
+        if X_left is not None:
+            X, y = np.concatenate([X_left, X]), np.concatenate([y_left, y])
+        n_full = len(X) - len(X) % batch_size
+        for start in range(0, n_full, batch_size):
+            yield X[start : start + batch_size], y[start : start + batch_size]
+        X_left, y_left = (X[n_full:], y[n_full:]) if n_full < len(X) else (None, None)
+    if X_left is not None and not drop_last:
+        yield X_left, y_left
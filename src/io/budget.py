@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+import pandas as pd
+
+log = logging.getLogger("io.budget")
+
+_SIZE_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([kmgt]?)i?b?\s*$", re.IGNORECASE)
+_UNITS = {"": 1, "k": 2**10, "m": 2**20, "g": 2**30, "t": 2**40}
+
+
+def parse_size(text: str) -> int:
+    """Bytes from "4G", "512M", "1.5g", "800MiB" or a plain number."""
+    m = _SIZE_RE.match(text)
+    if m is None:
+        raise ValueError(f"not a size: {text!r} (expected e.g. 512M or 4G)")
+    return int(float(m.group(1)) * _UNITS[m.group(2).lower()])
+
+
+def frame_nbytes(df: pd.DataFrame, sample: int = 2_000) -> int:
+    """Approximate deep size of `df`. Object/string columns are measured on an evenly
+    spaced sample of rows and scaled up; everything else exactly."""
+    n = len(df)
+    if n == 0:
+        return 0
+    total = int(df.index.memory_usage(deep=False))
+    step = max(1, n // sample)
+    picked = df.iloc[::step] if step > 1 else df
+    for col in df.columns:
+        ser = df[col]
+        if ser.dtype == object or isinstance(ser.dtype, pd.StringDtype):
+            total += int(picked[col].memory_usage(deep=True, index=False) * n / max(len(picked), 1))
+        else:
+            total += int(ser.memory_usage(deep=True, index=False))
+    return total
+
+
+@dataclass
+class ChunkSizer:
+    """Rows per chunk chosen so a chunk's footprint stays within `budget` bytes.
+
+    The reader asks next_rows() before every chunk and reports the chunk to observe():
+    bytes per row as read. The pipeline reports its peak footprint for the same chunk to
+    observe_pipeline() (raw copy, handler copies, X), which gives the overhead factor
+    over the read size. The next size is budget / (bytes per row * (overhead +
+    read_ahead)), clamped to [min_rows, max_rows]; it shrinks at once but at most
+    doubles per chunk.
+
+    The first chunk is a probe of `probe_rows` rows (within [min_rows, rows]), so a wide
+    input is measured before a full-size chunk is read; the size planned from it is
+    taken as is, without the doubling limit. `rows` is only the fallback before then.
+
+    read_ahead: chunks read ahead of the pipeline (--prefetch) and held as read besides
+    the one being processed. The reader then runs on its own thread: next_rows() and
+    observe() are called there and observe_pipeline() on the consumer thread, so up to
+    `read_ahead` chunks already read keep the size planned before the latest pipeline
+    measurement (a shrink takes effect that many chunks late).
+
+    Sizes actually read are kept in `sizes`; replay() gives a sizer that repeats them,
+    so a second pass sees the same chunk boundaries.
+    """
+
+    budget: int
+    rows: int = 50_000
+    min_rows: int = 1_000
+    max_rows: int = 1_000_000
+    overhead: float = 3.0
+    probe_rows: int = 1_000
+    read_ahead: int = 0
+    sizes: list[int] = field(default_factory=list)
+    _bytes_per_row: Optional[float] = field(default=None, repr=False)
+    _measured: bool = field(default=False, repr=False)
+    _planned: bool = field(default=False, repr=False)
+    _replay: Optional[list[int]] = field(default=None, repr=False)
+
+    def __post_init__(self) -> None:
+        if self.min_rows < 1 or self.max_rows < self.min_rows:
+            raise ValueError(f"bad chunk size bounds [{self.min_rows}, {self.max_rows}]")
+        self.rows = min(max(self.rows, self.min_rows), self.max_rows)
+
+    def next_rows(self) -> int:
+        if self._replay is not None:
+            i = len(self.sizes)
+            return self._replay[i] if i < len(self._replay) else self.rows
+        if not self._planned:
+            return min(max(self.probe_rows, self.min_rows), self.rows)
+        return self.rows
+
+    def observe(self, chunk: pd.DataFrame) -> None:
+        """A chunk was read: remember its size and re-plan from its bytes per row."""
+        self.sizes.append(len(chunk))
+        if self._replay is not None or len(chunk) == 0:
+            return
+        self._bytes_per_row = frame_nbytes(chunk) / len(chunk)
+        self._plan()
+
+    def observe_pipeline(self, rows_in: int, read_bytes: int, peak_bytes: int) -> None:
+        """The pipeline held `peak_bytes` at once for a chunk that took `read_bytes` as read."""
+        if self._replay is not None or rows_in == 0 or read_bytes <= 0:
+            return
+        # keep the worst ratio seen: heavy sections are what the budget protects against
+        self.overhead = max(self.overhead if self._measured else 0.0, peak_bytes / read_bytes)
+        self._measured = True
+        self._plan()
+
+    def _plan(self) -> None:
+        if not self._bytes_per_row:
+            return
+        target = int(self.budget / (self._bytes_per_row * (self.overhead + self.read_ahead)))
+        # the plan made from the probe is taken as is; later ones grow at most twofold
+        cap = 2 * self.rows if self._planned else self.max_rows
+        target = min(max(target, self.min_rows), self.max_rows, cap)
+        if not self._planned or abs(target - self.rows) >= 0.1 * self.rows:
+            current = self.rows if self._planned else self.sizes[-1]
+            log.info(
+                "Chunk %s: %s -> %s rows (~%.0f B/row read, x%.1f in the pipeline, %s read ahead, budget %.0f MiB)",
+                len(self.sizes), current, target, self._bytes_per_row, self.overhead, self.read_ahead,
+                self.budget / 2**20,
+            )
+            self.rows = target
+        self._planned = True
+
+    def replay(self) -> "ChunkSizer":
+        return ChunkSizer(
+            budget=self.budget, rows=self.rows, min_rows=self.min_rows, max_rows=self.max_rows,
+            overhead=self.overhead, probe_rows=self.probe_rows, read_ahead=self.read_ahead,
+            _replay=list(self.sizes),
+        )
+
+    def summary(self) -> dict[str, Any]:
+        sizes = self.sizes or [0]
+        return {
+            "budget_bytes": self.budget,
+            "chunks": len(self.sizes),
+            "min_rows": min(sizes),
+            "max_rows": max(sizes),
+            "mean_rows": round(sum(sizes) / len(sizes), 1),
+            "bytes_per_row": round(self._bytes_per_row or 0.0, 1),
+            "overhead": round(self.overhead, 2),
+        }
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+_CHECKPOINT_VERSION = 1
+_READ_BLOCK = 8 * 1024 * 1024
+
+
+class PrefixDigest:
+    """Running sha1 of the first `pos` bytes of a file, advanced as the run goes."""
+
+    def __init__(self, input_path: Path) -> None:
+        self.input_path = input_path
+        self.pos = 0
+        self._h = hashlib.sha1()
+
+    def advance(self, to: int) -> str:
+        """Hash bytes [pos, to) in; returns the digest of [0, to)."""
+        if to < self.pos:
+            raise ValueError(f"cannot move the digest back from {self.pos} to {to}")
+        with open(self.input_path, "rb") as fh:
+            fh.seek(self.pos)
+            left = to - self.pos
+            while left > 0:
+                block = fh.read(min(left, _READ_BLOCK))
+                if not block:
+                    raise ValueError(f"{self.input_path} ends before offset {to}")
+                self._h.update(block)
+                left -= len(block)
+        self.pos = to
+        return self.hexdigest()
+
+    def hexdigest(self) -> str:
+        return self._h.hexdigest()
+
+
+@dataclass
+class Checkpoint:
+    """Progress of pass 2 of a two-pass run, saved next to its outputs.
+
+    Index entries [0, entry) of the input (bytes [0, offset), checksummed) are encoded
+    and flushed into x_data.npy/y_data.npy rows [0, rows_written); fit_state.npz holds
+    the fitted encoder. `options` are the settings that shape the output; a resumed run
+    must use the same ones.
+    """
+
+    input_path: str
+    input_size: int
+    header_end: int
+    rows_per_entry: int
+    entry: int
+    offset: int
+    prefix_sha1: str
+    rows_read: int
+    rows_written: int
+    n_rows: int
+    feature_names: list[str]
+    options: dict[str, Any] = field(default_factory=dict)
+    complete: bool = False
+    version: int = _CHECKPOINT_VERSION
+
+    def problem(self, input_path: Path, options: dict[str, Any], digest: PrefixDigest) -> Optional[str]:
+        """Why this checkpoint cannot be resumed with `input_path` and `options` (None if it can).
+
+        Checks the prefix checksum by advancing `digest` (a fresh one) to `offset`.
+        """
+        if self.version != _CHECKPOINT_VERSION:
+            return f"unsupported checkpoint version {self.version}"
+        if self.options != options:
+            changed = sorted(k for k in set(self.options) | set(options) if self.options.get(k) != options.get(k))
+            return f"options changed: {', '.join(changed)}"
+        if not input_path.exists() or input_path.stat().st_size != self.input_size:
+            return f"{input_path} is not the {self.input_size}-byte file the checkpoint was made from"
+        if digest.advance(self.offset) != self.prefix_sha1:
+            return f"the first {self.offset} bytes of {input_path} changed"
+        return None
+
+    def save(self, path: Path) -> None:
+        # write-then-rename, so a crash leaves the previous checkpoint intact
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(asdict(self), ensure_ascii=False), encoding="utf-8")
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "Checkpoint":
+        return cls(**json.loads(path.read_text(encoding="utf-8")))
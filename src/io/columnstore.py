@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import json
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Iterator, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from src.encoding.encoders import FitState
+
+from .writers import GrowableNpy
+
+SCHEMA_NAME = "schema.json"
+_INT16_CODES = np.iinfo(np.int16).max + 1  # codes 0..32767
+_KIND_DTYPES = {"datetime": "int64", "bool": "uint8", "float": "float32"}
+
+
+@dataclass
+class ColumnSpec:
+    name: str
+    kind: str  # category | datetime | bool | float (see FitState.column_kind)
+    dtype: str
+    file: str
+    n_categories: Optional[int] = None
+
+
+def plan_columns(fit: FitState, X: pd.DataFrame, feature_names: list[str], fixed_codes: bool) -> list[ColumnSpec]:
+    """Column layout from the first encoded chunk.
+
+    Categorical codes are int16 when the mapping is final (`fixed_codes`, i.e. after a
+    fit pass) and small enough, int32 otherwise (codes may still grow; close() narrows
+    them to int16 if they ended up fitting).
+    """
+    specs = []
+    for j, col in enumerate(feature_names):
+        ser = X[col] if col in X.columns else pd.Series([pd.NA] * len(X))
+        kind = fit.column_kind(col, ser)
+        if kind == "category":
+            n = fit.n_codes(col)
+            dtype = "int16" if fixed_codes and n <= _INT16_CODES else "int32"
+        else:
+            dtype = _KIND_DTYPES[kind]
+        specs.append(ColumnSpec(name=col, kind=kind, dtype=dtype, file=f"columns/col_{j:03d}.npy"))
+    return specs
+
+
+@dataclass
+class ColumnStoreWriter:
+    """Per-column output: one growable .npy per feature in its own dtype, y.npy, and
+    schema.json mapping feature names to files, kinds and dtypes.
+
+    Compared with the float32 matrix, codes and timestamps stay exact and bools take one
+    byte. Columns are memmappable on their own; see ColumnStore for reading batches.
+    """
+
+    outdir: Path
+    columns: list[ColumnSpec]
+    _files: dict[str, GrowableNpy] = field(default_factory=dict, repr=False)
+
+    def __post_init__(self) -> None:
+        (self.outdir / "columns").mkdir(parents=True, exist_ok=True)
+        self.schema_path = self.outdir / SCHEMA_NAME
+        self.feat_path = self.outdir / "feature_names.txt"
+        self.y_path = self.outdir / "y.npy"
+        for spec in self.columns:
+            self._files[spec.name] = GrowableNpy(self.outdir / spec.file, np.dtype(spec.dtype), ())
+        self._y = GrowableNpy(self.y_path, np.float32, ())
+        self.feat_path.write_text("\n".join(c.name for c in self.columns), encoding="utf-8")
+
+    @property
+    def n_rows(self) -> int:
+        return self._y.n_rows
+
+    def kinds(self) -> dict[str, str]:
+        return {c.name: c.kind for c in self.columns}
+
+    def append(self, cols: dict[str, np.ndarray], y_arr: np.ndarray) -> None:
+        for spec in self.columns:
+            arr = cols[spec.name]
+            if arr.shape[0] != y_arr.shape[0]:
+                raise ValueError(f"{spec.name}: {arr.shape[0]} rows, y has {y_arr.shape[0]}")
+            if spec.kind == "category" and len(arr) and arr.max() > np.iinfo(spec.dtype).max:
+                raise OverflowError(f"{spec.name}: code {arr.max()} does not fit {spec.dtype}")
+            self._files[spec.name].append(arr.astype(spec.dtype, copy=False))
+        self._y.append(y_arr)
+
+    def close(self, fit: Optional[FitState] = None, block_rows: int = 4_000_000) -> None:
+        """Finish the files and write schema.json. With the final `fit`, int32 code
+        columns whose categories turned out to fit int16 are rewritten as int16."""
+        for f in self._files.values():
+            f.close()
+        self._y.close()
+        if fit is not None:
+            for spec in self.columns:
+                if spec.kind != "category":
+                    continue
+                spec.n_categories = fit.n_codes(spec.name)
+                if spec.dtype == "int32" and spec.n_categories <= _INT16_CODES:
+                    self._narrow(spec, block_rows)
+        schema = {
+            "version": 1,
+            "n_rows": self.n_rows,
+            "target": {"file": self.y_path.name, "dtype": "float32"},
+            "columns": [asdict(c) for c in self.columns],
+        }
+        self.schema_path.write_text(json.dumps(schema, ensure_ascii=False, indent=1), encoding="utf-8")
+
+    def _narrow(self, spec: ColumnSpec, block_rows: int) -> None:
+        path = self.outdir / spec.file
+        tmp = path.with_name(path.name + ".tmp")
+        src = np.load(path, mmap_mode="r")
+        dst = GrowableNpy(tmp, np.dtype(np.int16), ())
+        for start in range(0, len(src), block_rows):
+            dst.append(src[start : start + block_rows].astype(np.int16))
+        dst.close()
+        del src
+        tmp.replace(path)
+        spec.dtype = "int16"
+
+    def remap_codes(self, luts: dict[str, np.ndarray], block_rows: int = 4_000_000) -> None:
+        """After close(): rewrite categorical code columns in place, col = lut[col]."""
+        for spec in self.columns:
+            lut = luts.get(spec.name)
+            if lut is None:
+                continue
+            col = np.load(self.outdir / spec.file, mmap_mode="r+")
+            for start in range(0, len(col), block_rows):
+                col[start : start + block_rows] = lut[col[start : start + block_rows]]
+            col.flush()
+            del col
+
+
+class ColumnStore:
+    """Read side of ColumnStoreWriter: memmapped columns and batch assembly."""
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        schema = json.loads((self.path / SCHEMA_NAME).read_text(encoding="utf-8"))
+        self.n_rows: int = schema["n_rows"]
+        self.columns = [ColumnSpec(**c) for c in schema["columns"]]
+        self._arrays = {c.name: np.load(self.path / c.file, mmap_mode="r") for c in self.columns}
+        self.y = np.load(self.path / schema["target"]["file"], mmap_mode="r")
+
+    @property
+    def feature_names(self) -> list[str]:
+        return [c.name for c in self.columns]
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    def column(self, name: str) -> np.ndarray:
+        return self._arrays[name]
+
+    def batch(
+        self, start: int, stop: int, columns: Optional[list[str]] = None, dense: bool = False
+    ) -> tuple[Any, np.ndarray]:
+        """Rows [start, stop): ({name: array}, y), or (float32 matrix, y) with dense=True.
+
+        The dense matrix matches the legacy x_data.npy layout (same column order)."""
+        names = columns or self.feature_names
+        if dense:
+            X = np.empty((stop - start, len(names)), dtype=np.float32)
+            for j, name in enumerate(names):
+                X[:, j] = self._arrays[name][start:stop]
+            return X, np.asarray(self.y[start:stop])
+        return {name: np.asarray(self._arrays[name][start:stop]) for name in names}, np.asarray(self.y[start:stop])
+
+    def batches(
+        self, batch_size: int, columns: Optional[list[str]] = None, dense: bool = False
+    ) -> Iterator[tuple[Any, np.ndarray]]:
+        for start in range(0, self.n_rows, batch_size):
+            yield self.batch(start, min(start + batch_size, self.n_rows), columns=columns, dense=dense)
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import copy
+import mmap
+from pathlib import Path
+from typing import Any, Iterator, Optional, Union
+
+import numpy as np
+
+from .batching import rebatch
+from .prefetch import PrefetchStats, prefetch as _prefetch
+
+_BLOCK_ROWS = 65_536
+# madvise is missing on Windows (and on Python builds without it): read-ahead is then a no-op
+_HAS_MADVISE = hasattr(mmap.mmap, "madvise") and hasattr(mmap, "MADV_WILLNEED")
+
+
+def _map_npy(path: Path) -> tuple[mmap.mmap, int, np.ndarray]:
+    """Read-only array over a shared mmap of the whole .npy file (kept for madvise),
+    and the offset of the data in the file."""
+    meta = np.load(path, mmap_mode="r")  # parses the header; its own map is dropped
+    shape, dtype, offset = meta.shape, meta.dtype, meta.offset
+    order = "F" if meta.flags.f_contiguous and not meta.flags.c_contiguous else "C"
+    del meta
+    with open(path, "rb") as fh:
+        mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    arr = np.ndarray(shape, dtype=dtype, buffer=mm, offset=offset, order=order)
+    return mm, offset, arr
+
+
+class NpyDataset:
+    """Random access to x_data.npy/y_data.npy through read-only memory maps.
+
+    Nothing is loaded up front; rows come from the OS page cache as they are read, so
+    several processes over the same outputs share one copy of the data. A view made by
+    subset()/split() is an array of row positions over the same maps (no data copied).
+    Datasets pickle by path and reopen their maps, e.g. in worker processes.
+    """
+
+    def __init__(self, path: Union[str, Path], rows: Optional[np.ndarray] = None) -> None:
+        self.path = Path(path)
+        self._open()
+        feat_path = self.path / "feature_names.txt"
+        self.feature_names = feat_path.read_text(encoding="utf-8").split("\n") if feat_path.exists() else []
+        if self.feature_names and len(self.feature_names) != self.X.shape[1]:
+            raise ValueError(f"{feat_path}: {len(self.feature_names)} names for {self.X.shape[1]} columns")
+        self.rows: Optional[np.ndarray] = None
+        if rows is not None:
+            self.rows = self._check_rows(rows, len(self.X))
+
+    def _open(self) -> None:
+        x_map, x_off, self.X = _map_npy(self.path / "x_data.npy")
+        y_map, y_off, self.y = _map_npy(self.path / "y_data.npy")
+        self._maps = [(x_map, x_off, self.X), (y_map, y_off, self.y)]
+        if self.X.ndim != 2 or self.y.shape != (self.X.shape[0],):
+            raise ValueError(f"{self.path}: x_data {self.X.shape} and y_data {self.y.shape} do not line up")
+
+    def __getstate__(self) -> dict[str, Any]:
+        state = dict(self.__dict__)
+        for key in ("X", "y", "_maps"):
+            state.pop(key)
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._open()
+
+    @staticmethod
+    def _check_rows(rows: np.ndarray, n: int) -> np.ndarray:
+        rows = np.asarray(rows, dtype=np.int64)
+        if rows.ndim != 1:
+            raise ValueError("rows must be a 1-d array of row positions")
+        if len(rows) and (rows.min() < 0 or rows.max() >= n):
+            raise IndexError(f"row positions outside 0..{n - 1}")
+        return rows
+
+    def __len__(self) -> int:
+        return len(self.rows) if self.rows is not None else len(self.X)
+
+    @property
+    def n_features(self) -> int:
+        return self.X.shape[1]
+
+    def positions(self) -> np.ndarray:
+        """Row positions in the files of this view, in view order."""
+        return self.rows if self.rows is not None else np.arange(len(self.X), dtype=np.int64)
+
+    def subset(self, rows: np.ndarray) -> "NpyDataset":
+        """View of rows `rows` of this view (positions relative to it); shares the maps."""
+        rows = self._check_rows(rows, len(self))
+        view = copy.copy(self)
+        view.rows = self.rows[rows] if self.rows is not None else rows
+        return view
+
+    def split(self, val_fraction: float = 0.1, seed: Optional[int] = None) -> tuple["NpyDataset", "NpyDataset"]:
+        """(train, val) views of a random `val_fraction` of the rows. Both keep file
+        order, so reading either of them stays sequential."""
+        if not 0.0 <= val_fraction <= 1.0:
+            raise ValueError(f"val_fraction must be in [0, 1], got {val_fraction}")
+        n = len(self)
+        is_val = np.zeros(n, dtype=bool)
+        is_val[np.random.default_rng(seed).permutation(n)[: int(round(n * val_fraction))]] = True
+        return self.subset(np.flatnonzero(~is_val)), self.subset(np.flatnonzero(is_val))
+
+    def get(self, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """(X, y) of view rows `rows`, copied into memory."""
+        pos = self.positions()[np.asarray(rows, dtype=np.int64)]
+        return self.X[pos], self.y[pos]
+
+    def willneed(self, start: int, stop: int) -> None:
+        """Ask the OS to start reading file rows [start, stop) into the page cache."""
+        if not _HAS_MADVISE or stop <= start:
+            return
+        for mm, offset, arr in self._maps:
+            if not arr.flags.c_contiguous:
+                continue  # rows are not contiguous in a fortran-order file
+            row_bytes = arr.strides[0]
+            lo = offset + start * row_bytes
+            hi = lo + (stop - start) * row_bytes
+            lo -= lo % mmap.PAGESIZE
+            mm.madvise(mmap.MADV_WILLNEED, lo, min(hi, len(mm)) - lo)
+
+    def _blocks(self, order: np.ndarray, block_rows: int, rng: Optional[np.random.Generator], readahead: int):
+        """(X, y) of each block of view rows, in `order` of block numbers, read into memory.
+
+        A block is `block_rows` consecutive view rows, i.e. one mostly contiguous span of
+        the files; the next `readahead` blocks are madvised before a block is read."""
+        pos = self.positions()
+        n = len(pos)
+        spans = [(b * block_rows, min((b + 1) * block_rows, n)) for b in order.tolist()]
+        for i, (a, b) in enumerate(spans):
+            for a2, b2 in spans[i + 1 : i + 1 + readahead]:
+                ahead = pos[a2:b2] if self.rows is not None else None
+                if ahead is None:
+                    self.willneed(a2, b2)
+                else:
+                    self.willneed(int(ahead.min()), int(ahead.max()) + 1)
+            if self.rows is None:
+                X, y = np.array(self.X[a:b]), np.array(self.y[a:b])
+            else:
+                X, y = self.X[pos[a:b]], self.y[pos[a:b]]
+            if rng is not None:
+                perm = rng.permutation(b - a)
+                X, y = X[perm], y[perm]
+            yield X, y
+
+    def batches(
+        self,
+        batch_size: int,
+        shuffle: bool = False,
+        seed: Optional[int] = None,
+        block_rows: int = _BLOCK_ROWS,
+        readahead: int = 1,
+        prefetch: int = 0,
+        prefetch_stats: Optional[PrefetchStats] = None,
+        drop_last: bool = False,
+    ) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+        """(X, y) mini-batches of the view.
+
+        shuffle: block-wise. Blocks of `block_rows` rows are visited in random order and
+        each is shuffled in memory, so the files are read in large sequential runs.
+        readahead: madvise(WILLNEED) this many upcoming blocks (no-op where unsupported).
+        prefetch: read up to this many blocks ahead on a background thread.
+        """
+        if batch_size < 1 or block_rows < 1:
+            raise ValueError("batch_size and block_rows must be positive")
+        rng = np.random.default_rng(seed) if shuffle else None
+        n_blocks = -(-len(self) // block_rows)
+        order = rng.permutation(n_blocks) if rng is not None else np.arange(n_blocks)
+        blocks = self._blocks(order, block_rows, rng, readahead)
+        if prefetch > 0:
+            blocks = _prefetch(blocks, depth=prefetch, stats=prefetch_stats)
+        yield from rebatch(blocks, batch_size, drop_last)
+
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+_TAIL = 64 * 1024  # bytes before the stored offset that must be unchanged
+
+
+def _digest(input_path: Path, start: int, stop: int) -> str:
+    with open(input_path, "rb") as fh:
+        fh.seek(start)
+        return hashlib.sha1(fh.read(stop - start)).hexdigest()
+
+
+@dataclass
+class IncrementalState:
+    """How far an append-only CSV has been processed into the outputs next to this state.
+
+    `offset` is a record boundary: everything before it is already in x_data.npy/y_data.npy.
+    The header and the bytes just before `offset` are fingerprinted, so a rewritten (rather
+    than appended-to) input is detected.
+    """
+
+    input_path: str
+    header_end: int
+    header_sha1: str
+    offset: int
+    tail_sha1: str
+    rows_read: int
+    rows_written: int
+
+    @classmethod
+    def capture(
+        cls, input_path: Path, header_end: int, offset: int, rows_read: int, rows_written: int
+    ) -> "IncrementalState":
+        return cls(
+            input_path=str(input_path),
+            header_end=header_end,
+            header_sha1=_digest(input_path, 0, header_end),
+            offset=offset,
+            tail_sha1=_digest(input_path, max(header_end, offset - _TAIL), offset),
+            rows_read=rows_read,
+            rows_written=rows_written,
+        )
+
+    def matches(self, input_path: Path) -> bool:
+        """True if `input_path` still starts with the bytes this state has processed."""
+        if input_path.stat().st_size < self.offset:
+            return False
+        return (
+            _digest(input_path, 0, self.header_end) == self.header_sha1
+            and _digest(input_path, max(self.header_end, self.offset - _TAIL), self.offset) == self.tail_sha1
+        )
+
+    def save(self, path: Path) -> None:
+        # write-then-rename, so an interrupted run leaves the previous state intact
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(asdict(self)), encoding="utf-8")
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "IncrementalState":
+        return cls(**json.loads(path.read_text(encoding="utf-8")))
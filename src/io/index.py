@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import logging
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional
+
+import numpy as np
+
+log = logging.getLogger("io.index")
+
+_QUOTE = ord('"')
+_NL = ord("\n")
+_BLOCK = 64 * 1024 * 1024
+
+
+@dataclass
+class CsvIndex:
+    """Byte offsets of every `rows_per_entry`-th record of a CSV file.
+
+    offsets[i] is where data record i * rows_per_entry starts (the header is record -1);
+    offsets[-1] is the file size, so entry i spans [offsets[i], offsets[i + 1]).
+    Records are counted by newlines outside double quotes, so quoted multi-line fields
+    are handled. Blank lines count as records here while pandas skips them.
+    """
+
+    path: str
+    size: int
+    mtime_ns: int
+    rows_per_entry: int
+    header_end: int
+    n_records: int
+    offsets: list[int] = field(default_factory=list)
+
+    @property
+    def n_entries(self) -> int:
+        return len(self.offsets) - 1
+
+    def byte_range(self, start: int, stop: Optional[int] = None) -> tuple[int, int]:
+        """Byte span of entries [start, stop)."""
+        stop = self.n_entries if stop is None else min(stop, self.n_entries)
+        if not 0 <= start <= stop:
+            raise IndexError(f"Entry range [{start}, {stop}) outside 0..{self.n_entries}")
+        return self.offsets[start], self.offsets[stop]
+
+    def matches(self, input_path: Path) -> bool:
+        st = input_path.stat()
+        return st.st_size == self.size and st.st_mtime_ns == self.mtime_ns
+
+    def save(self, path: Path) -> None:
+        path.write_text(json.dumps(asdict(self)), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Path) -> "CsvIndex":
+        return cls(**json.loads(path.read_text(encoding="utf-8")))
+
+
+def index_path_for(input_path: Path) -> Path:
+    return input_path.with_name(input_path.name + ".idx.json")
+
+
+def _record_ends(fh: BinaryIO, pos: int = 0, block_size: int = _BLOCK) -> Iterator[np.ndarray]:
+    """Per block read from `fh` (positioned at record boundary `pos`), the absolute offsets
+    just past each newline outside double quotes."""
+    in_quotes = 0
+    while True:
+        block = fh.read(block_size)
+        if not block:
+            return
+        arr = np.frombuffer(block, dtype=np.uint8)
+        # quote parity before each byte; "" escapes toggle twice and cancel out
+        parity = (np.cumsum(arr == _QUOTE, dtype=np.int64) + in_quotes) & 1
+        yield np.flatnonzero((arr == _NL) & (parity == 0)) + pos + 1
+        in_quotes = int(parity[-1])
+        pos += len(block)
+
+
+def find_header_end(input_path: Path) -> int:
+    """Offset just past the header record (the file size if there is no data record)."""
+    with open(input_path, "rb") as fh:
+        for ends in _record_ends(fh, block_size=64 * 1024):
+            if len(ends):
+                return int(ends[0])
+    return input_path.stat().st_size
+
+
+def last_record_end(input_path: Path, start: int) -> int:
+    """Offset just past the last complete (newline-terminated) record at or after `start`.
+
+    `start` must be a record boundary. Returns `start` when no record has been completed
+    since, so a half-written last line of a growing file is left for the next read.
+    """
+    last = start
+    with open(input_path, "rb") as fh:
+        fh.seek(start)
+        for ends in _record_ends(fh, pos=start):
+            if len(ends):
+                last = int(ends[-1])
+    return last
+
+
+def build_csv_index(input_path: Path, rows_per_entry: int = 50_000) -> CsvIndex:
+    """Scan the file once (numpy over large blocks) and record row-aligned offsets; entry
+    starts are picked per block by slicing the record ends, not row by row."""
+    st = input_path.stat()
+    offsets: list[int] = []
+    header_end: Optional[int] = None
+    n_records = 0  # data records whose start has been seen
+    with open(input_path, "rb") as fh:
+        for ends in _record_ends(fh):
+            ends = ends[ends < st.st_size]  # trailing newline: no record starts there
+            if header_end is None and len(ends):
+                header_end = int(ends[0])
+                offsets.append(header_end)
+                ends = ends[1:]
+            # record n_records + i + 1 starts at ends[i]; keep every rows_per_entry-th
+            offsets.extend(ends[(-n_records - 1) % rows_per_entry :: rows_per_entry].tolist())
+            n_records += len(ends)
+
+    if header_end is None:  # header only (or empty file)
+        header_end = st.st_size
+        offsets.append(header_end)
+    elif header_end < st.st_size:
+        n_records += 1  # the record starting at the last counted line end
+    if offsets[-1] != st.st_size:
+        offsets.append(st.st_size)
+
+    return CsvIndex(
+        path=str(input_path),
+        size=st.st_size,
+        mtime_ns=st.st_mtime_ns,
+        rows_per_entry=rows_per_entry,
+        header_end=header_end,
+        n_records=n_records,
+        offsets=offsets,
+    )
+
+
+def load_or_build_index(input_path: Path, rows_per_entry: int = 50_000) -> CsvIndex:
+    """Reuse the sidecar index if it matches the file and granularity, else rebuild it."""
+    sidecar = index_path_for(input_path)
+    if sidecar.exists():
+        try:
+            idx = CsvIndex.load(sidecar)
+            if idx.rows_per_entry == rows_per_entry and idx.matches(input_path):
+                return idx
+        except (OSError, ValueError, TypeError) as e:
+            log.warning("Ignoring unreadable index %s: %s", sidecar, e)
+    log.info("Indexing %s every %s rows", input_path, rows_per_entry)
+    idx = build_csv_index(input_path, rows_per_entry=rows_per_entry)
+    try:
+        idx.save(sidecar)
+    except OSError as e:
+        log.warning("Could not write index %s: %s", sidecar, e)
+    return idx
+
+
+class RangeReader(io.RawIOBase):
+    """Binary stream of the header line followed by bytes [start, stop) of the file."""
+
+    def __init__(self, input_path: Path, header_end: int, start: int, stop: int) -> None:
+        super().__init__()
+        self._fh = open(input_path, "rb")
+        self._header = self._fh.read(header_end)
+        self._fh.seek(start)
+        self._remaining = stop - start
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:  # type: ignore[override]
+        view = memoryview(b)
+        n = 0
+        if self._header:
+            n = min(len(view), len(self._header))
+            view[:n] = self._header[:n]
+            self._header = self._header[n:]
+            return n
+        if self._remaining <= 0:
+            return 0
+        data = self._fh.read(min(len(view), self._remaining))
+        n = len(data)
+        view[:n] = data
+        self._remaining -= n
+        return n
+
+    def close(self) -> None:
+        self._fh.close()
+        super().close()
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="Build the row-aligned byte index sidecar for a CSV")
+    p.add_argument("input", help="Path to hh.csv")
+    p.add_argument("--every", type=int, default=50_000, help="Rows per index entry")
+    args = p.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    idx = load_or_build_index(Path(args.input), rows_per_entry=args.every)
+    log.info("%s: %s records, %s entries -> %s", args.input, idx.n_records, idx.n_entries, index_path_for(Path(args.input)))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
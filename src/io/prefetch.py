@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+@dataclass
+class PrefetchStats:
+    """Counters filled in by `prefetch` while it runs."""
+
+    depth: int = 0
+    items: int = 0
+    # consumer waited on an empty queue (reader is the bottleneck)
+    stall_s: float = 0.0
+    # producer waited on a full queue (consumer is the bottleneck; backpressure)
+    blocked_s: float = 0.0
+    max_queued: int = 0
+    _queued_sum: int = field(default=0, repr=False)
+
+    @property
+    def mean_queued(self) -> float:
+        return self._queued_sum / self.items if self.items else 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "depth": self.depth,
+            "items": self.items,
+            "stall_s": round(self.stall_s, 3),
+            "blocked_s": round(self.blocked_s, 3),
+            "max_queued": self.max_queued,
+            "mean_queued": round(self.mean_queued, 2),
+        }
+
+
+def prefetch(it: Iterator[T], depth: int, stats: Optional[PrefetchStats] = None) -> Iterator[T]:
+    """Run `it` on a background thread, keeping at most `depth` items ready ahead.
+
+    Exceptions from `it` are re-raised in the consumer. Closing the returned generator
+    stops the producer after its current item.
+    """
+    stats = stats if stats is not None else PrefetchStats()
+    stats.depth = depth
+    q: queue.Queue = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item: Any) -> bool:
+        t0 = time.perf_counter()
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                stats.blocked_s += time.perf_counter() - t0
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in it:
+                if not put(item):
+                    return
+        except BaseException as e:  # forwarded to the consumer
+            put((_DONE, e))
+            return
+        finally:
+            close = getattr(it, "close", None)
+            if close is not None:
+                close()
+        put((_DONE, None))
+
+    thread = threading.Thread(target=produce, name="csv-prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            queued = q.qsize()
+            t0 = time.perf_counter()
+            item = q.get()
+            if queued == 0:
+                stats.stall_s += time.perf_counter() - t0
+            if isinstance(item, tuple) and len(item) == 2 and item[0] is _DONE:
+                if item[1] is not None:
+                    raise item[1]
+                return
+            stats.items += 1
+            stats._queued_sum += queued
+            stats.max_queued = max(stats.max_queued, queued)
+            yield item
+    finally:
+        stop.set()
+        thread.join()
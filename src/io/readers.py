@@ -1,34 +1,62 @@
 from __future__ import annotations
 
+import io
 import logging
 from pathlib import Path
-from typing import Iterator, Optional
+from typing import IO, Any, Iterable, Iterator, Optional, Union
 
 import pandas as pd
 
+from .budget import ChunkSizer
+from .index import CsvIndex, RangeReader, find_header_end
+from .prefetch import PrefetchStats, prefetch as _prefetch
+from .sniff import Cp1251Fallback, decode_errors, load_or_sniff
+from .sources import compression_of, open_decompressed
+
 log = logging.getLogger("io.readers")
 
 
 def _try_read_chunks(
-    input_path: Path,
+    input_path: Union[Path, IO[bytes]],
     chunksize: int,
     encoding: Optional[str],
     delimiter: Optional[str],
     engine: str,
+    encoding_errors: str = "strict",
+    usecols: Optional[Iterable[str]] = None,
+    dtype: Optional[dict[str, Any]] = None,
+    sizer: Optional[ChunkSizer] = None,
 ) -> Iterator[pd.DataFrame]:
     kwargs = dict(
         chunksize=chunksize,
         encoding=encoding,
+        encoding_errors=encoding_errors,
         sep=delimiter,
         engine=engine,
         quotechar='"',
         on_bad_lines="skip",
     )
+    if usecols is not None:
+        # match on stripped names, like NormalizeColumnsHandler does after reading
+        wanted = set(usecols)
+        kwargs["usecols"] = lambda c: str(c).strip() in wanted
+    if dtype:
+        kwargs["dtype"] = dtype
     if engine == "c":
         kwargs["low_memory"] = False
 
-    yield from pd.read_csv(input_path, **kwargs)
-
+    with pd.read_csv(input_path, **kwargs) as reader:
+        if sizer is None:
+            yield from reader
+            return
+        # variable chunk sizes: ask the sizer before every chunk
+        while True:
+            try:
+                chunk = reader.get_chunk(sizer.next_rows())
+            except StopIteration:
+                return
+            sizer.observe(chunk)
+            yield chunk
 
 
 def iter_csv_chunks(
@@ -36,24 +64,148 @@ def iter_csv_chunks(
     chunksize: int = 50_000,
     encoding: Optional[str] = None,
     delimiter: Optional[str] = None,
+    index: Optional[CsvIndex] = None,
+    start: int = 0,
+    stop: Optional[int] = None,
+    prefetch: int = 0,
+    prefetch_stats: Optional[PrefetchStats] = None,
+    usecols: Optional[Iterable[str]] = None,
+    dtype: Optional[dict[str, Any]] = None,
+    byte_range: Optional[tuple[int, int]] = None,
+    sizer: Optional[ChunkSizer] = None,
 ) -> Iterator[pd.DataFrame]:
-    encodings = [encoding] if encoding else ["utf-8", "utf-8-sig", "cp1251"]
-    engines = ["c", "python"]
+    """Stream the CSV in chunks of `chunksize` rows.
+
+    With an `index` (see src.io.index), only index entries [start, stop) are read:
+    the reader seeks straight to their byte range and prepends the header line.
+    `byte_range` does the same for an explicit [start, stop) span of whole records.
+
+    prefetch: parse up to this many chunks ahead on a background thread (bounded queue,
+    so at most `prefetch` + 2 chunks are alive). Queue depth and stall times go to
+    `prefetch_stats`. The C engine releases the GIL while tokenizing.
+
+    encoding/delimiter: when not given, taken from the sniffed dialect (src.io.sniff,
+    cached in a sidecar). The file is read once: bytes that are not valid utf-8 are
+    decoded as cp1251 where they occur, and the python engine is only tried if the C
+    engine fails before the first chunk; a later failure raises instead of re-reading.
+
+    usecols/dtype: read only these columns (see Pipeline.required_columns), with these
+    dtypes (see builder.compact_dtypes). Other columns are never materialized.
+
+    sizer: pick each chunk's row count from a memory budget instead of `chunksize`
+    (see src.io.budget.ChunkSizer).
+
+    .gz/.bz2/.xz files are decompressed as they are read, on a helper thread (see
+    src.io.sources); they have no byte offsets, so `index`/`byte_range` do not apply.
+    """
+    compressed = compression_of(input_path) is not None
+    if compressed and (index is not None or byte_range is not None):
+        raise ValueError(f"{input_path}: byte ranges cannot be read from a compressed file")
+    if prefetch > 0:
+        inner = iter_csv_chunks(
+            input_path,
+            chunksize,
+            encoding,
+            delimiter,
+            index=index,
+            start=start,
+            stop=stop,
+            usecols=usecols,
+            dtype=dtype,
+            byte_range=byte_range,
+            sizer=sizer,
+        )
+        yield from _prefetch(inner, depth=prefetch, stats=prefetch_stats)
+        return
+
+    header_end: Optional[int] = None
+    if index is not None and byte_range is None:
+        byte_range = index.byte_range(start, stop)
+        header_end = index.header_end
+    elif byte_range is not None:
+        header_end = index.header_end if index is not None else find_header_end(input_path)
+
+    def source() -> Union[Path, IO[bytes]]:
+        if compressed:
+            return open_decompressed(input_path)
+        if byte_range is None or header_end is None:
+            return input_path
+        return io.BufferedReader(RangeReader(input_path, header_end, *byte_range))
+
+    if encoding is None or delimiter is None:
+        # sniffed once per file version (sidecar), so every pass and range read agrees
+        dialect = load_or_sniff(input_path)
+        encoding = encoding or dialect.encoding
+        delimiter = delimiter or dialect.delimiter
+    fallback = Cp1251Fallback()
+    errors = decode_errors(encoding, fallback)
 
     last_err: Exception | None = None
-    for enc in encodings:
-        for eng in engines:
-            try:
-                log.info("Reading %s with encoding=%s engine=%s", input_path, enc, eng)
-                it = _try_read_chunks(input_path, chunksize=chunksize, encoding=enc, delimiter=delimiter, engine=eng)
-                first = next(it)  # smoke test
-                yield first
-                for chunk in it:
-                    yield chunk
-                return
-            except StopIteration:
-                return
-            except Exception as e:
-                last_err = e
+    for eng in ("c", "python"):
+        log.info("Reading %s with encoding=%s delimiter=%r engine=%s", input_path, encoding, delimiter, eng)
+        src = source()
+        it = _try_read_chunks(
+            src,
+            chunksize=chunksize,
+            encoding=encoding,
+            delimiter=delimiter,
+            engine=eng,
+            encoding_errors=errors,
+            usecols=usecols,
+            dtype=dtype,
+            sizer=sizer,
+        )
+        yielded = 0
+        try:
+            while True:
+                seen = fallback.decoded_bytes
+                try:
+                    chunk = next(it)
+                except StopIteration:
+                    return
+                except Exception as e:
+                    if yielded:
+                        # never restart: chunks already handed out would be emitted again
+                        raise RuntimeError(f"Failed to read CSV {input_path} after {yielded} chunks: {e}") from e
+                    last_err = e
+                    break
+                if fallback.decoded_bytes > seen:
+                    log.warning(
+                        "Chunk %s of %s: %s bytes are not %s, decoded as cp1251",
+                        yielded, input_path, fallback.decoded_bytes - seen, encoding,
+                    )
+                yielded += 1
+                yield chunk
+        finally:
+            # close pandas' reader before the range/decompressing stream it wraps
+            it.close()
+            if src is not input_path:
+                src.close()
 
     raise RuntimeError(f"Failed to read CSV {input_path}: {last_err}") from last_err
+
+
+def iter_files_chunks(
+    paths: list[Path],
+    chunksize: int = 50_000,
+    encoding: Optional[str] = None,
+    delimiter: Optional[str] = None,
+    prefetch: int = 0,
+    prefetch_stats: Optional[PrefetchStats] = None,
+    usecols: Optional[Iterable[str]] = None,
+    dtype: Optional[dict[str, Any]] = None,
+    sizer: Optional[ChunkSizer] = None,
+) -> Iterator[pd.DataFrame]:
+    """iter_csv_chunks over several files, one after the other, as one stream.
+
+    Every file has its own header and is sniffed on its own (see iter_csv_chunks).
+    A chunk never spans two files. Prefetching runs across file boundaries.
+    """
+    if prefetch > 0:
+        inner = iter_files_chunks(paths, chunksize, encoding, delimiter, usecols=usecols, dtype=dtype, sizer=sizer)
+        yield from _prefetch(inner, depth=prefetch, stats=prefetch_stats)
+        return
+    for path in paths:
+        yield from iter_csv_chunks(
+            path, chunksize, encoding, delimiter, usecols=usecols, dtype=dtype, sizer=sizer
+        )
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import argparse
+import codecs
+import csv
+import itertools
+import json
+import logging
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from .sources import COMPRESSIONS, compression_of
+
+log = logging.getLogger("io.sniff")
+
+_SNIFF_VERSION = 1
+_BOM = codecs.BOM_UTF8
+_DELIMITERS = ",;\t|"
+_HEAD_BYTES = 256 * 1024
+_RANGE_BYTES = 64 * 1024
+_N_RANGES = 16
+
+# codec error handler for utf-8 reads: bytes that are not utf-8 are decoded as cp1251
+# in place, so a stray cp1251 line costs nothing extra and nothing is re-read
+FALLBACK_ERRORS = "hh-cp1251-fallback"
+_handler_ids = itertools.count()
+
+
+def _decode_cp1251(err: UnicodeError) -> tuple[str, int]:
+    if not isinstance(err, UnicodeDecodeError):
+        raise err
+    return bytes(err.object[err.start : err.end]).decode("cp1251", errors="replace"), err.end
+
+
+codecs.register_error(FALLBACK_ERRORS, _decode_cp1251)
+
+
+@dataclass
+class Cp1251Fallback:
+    """The cp1251 fallback of one reader, counting the bytes it decoded.
+
+    pandas takes `encoding_errors` by name, so every instance registers a handler of its
+    own under `errors`; readers on other threads or files never share a count. (Codec
+    error handlers cannot be unregistered: one small closure per reader stays behind.)
+    """
+
+    decoded_bytes: int = 0
+    errors: str = field(default="", init=False)
+
+    def __post_init__(self) -> None:
+        self.errors = f"{FALLBACK_ERRORS}-{next(_handler_ids)}"
+        codecs.register_error(self.errors, self._handle)
+
+    def _handle(self, err: UnicodeError) -> tuple[str, int]:
+        text, end = _decode_cp1251(err)
+        self.decoded_bytes += end - err.start
+        return text, end
+
+
+def decode_errors(encoding: str, fallback: Optional[Cp1251Fallback] = None) -> str:
+    """`encoding_errors` for read_csv: the cp1251 fallback for utf-8 (`fallback`'s own
+    handler when given, so it counts the bytes), replace otherwise."""
+    if not codecs.lookup(encoding).name.startswith("utf-8"):
+        return "replace"
+    return fallback.errors if fallback is not None else FALLBACK_ERRORS
+
+
+@dataclass
+class CsvDialect:
+    """Encoding and delimiter of a CSV file, picked once from samples of it.
+
+    Cached in a sidecar next to the file (see load_or_sniff) and reused while the file
+    keeps its size and mtime, by both passes and by later runs.
+    """
+
+    path: str
+    size: int
+    mtime_ns: int
+    encoding: str
+    delimiter: str
+    sampled_bytes: int = 0
+    version: int = _SNIFF_VERSION
+
+    def matches(self, input_path: Path) -> bool:
+        st = input_path.stat()
+        return self.version == _SNIFF_VERSION and st.st_size == self.size and st.st_mtime_ns == self.mtime_ns
+
+    def save(self, path: Path) -> None:
+        path.write_text(json.dumps(asdict(self), ensure_ascii=False), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Path) -> "CsvDialect":
+        return cls(**json.loads(path.read_text(encoding="utf-8")))
+
+
+def dialect_path_for(input_path: Path) -> Path:
+    return input_path.with_name(input_path.name + ".sniff.json")
+
+
+def _whole_lines(block: bytes, at_start: bool, at_end: bool) -> bytes:
+    """Trim a block to complete lines. A newline byte never occurs inside a utf-8 or
+    cp1251 character, so the result also starts and ends on character boundaries."""
+    if not at_start:
+        cut = block.find(b"\n")
+        block = block[cut + 1 :] if cut >= 0 else b""
+    if not at_end:
+        cut = block.rfind(b"\n")
+        block = block[: cut + 1] if cut >= 0 else b""
+    return block
+
+
+def _read_compressed_samples(
+    input_path: Path, head_bytes: int, range_bytes: int, n_ranges: int
+) -> tuple[bytes, list[bytes]]:
+    """The head of the decompressed stream and `n_ranges` blocks right after it: seeking
+    in a compressed stream means inflating everything before the target anyway."""
+    with COMPRESSIONS[compression_of(input_path)](input_path) as fh:
+        head = fh.read(head_bytes)
+        rest = fh.read(range_bytes * n_ranges)
+    head = _whole_lines(head, at_start=True, at_end=not rest)
+    samples = [head]
+    if rest:
+        samples.append(_whole_lines(rest, at_start=False, at_end=len(rest) < range_bytes * n_ranges))
+    return head, samples
+
+
+def _read_samples(input_path: Path, head_bytes: int, range_bytes: int, n_ranges: int) -> tuple[bytes, list[bytes]]:
+    """The head of the file and `n_ranges` blocks spread evenly over the rest."""
+    if compression_of(input_path) is not None:
+        return _read_compressed_samples(input_path, head_bytes, range_bytes, n_ranges)
+    size = input_path.stat().st_size
+    with open(input_path, "rb") as fh:
+        head = _whole_lines(fh.read(head_bytes), at_start=True, at_end=size <= head_bytes)
+        samples = [head]
+        if size > head_bytes:
+            for i in range(1, n_ranges + 1):
+                pos = head_bytes + (size - head_bytes - range_bytes) * i // n_ranges
+                fh.seek(max(pos, head_bytes))
+                block = fh.read(range_bytes)
+                samples.append(_whole_lines(block, at_start=False, at_end=fh.tell() >= size))
+    return head, samples
+
+
+def _pick_encoding(head: bytes, samples: list[bytes]) -> str:
+    """utf-8 unless the samples hold more undecodable bytes than utf-8 characters.
+
+    cp1251 decodes almost anything, so it cannot be tried first; a mostly-utf-8 file
+    with a few cp1251 lines stays utf-8 and those lines go through the fallback.
+    """
+    utf8 = "utf-8-sig" if head.startswith(_BOM) else "utf-8"
+    good = bad = 0
+    for block in samples:
+        text = block.decode("utf-8", errors="replace")
+        n_bad = text.count("\ufffd")
+        bad += n_bad
+        good += len(text) - len(text.encode("ascii", errors="ignore")) - n_bad
+    if bad == 0 or good >= bad:
+        return utf8
+    return "cp1251"
+
+
+def _pick_delimiter(text: str) -> str:
+    lines = text.splitlines()[:50]
+    try:
+        return csv.Sniffer().sniff("\n".join(lines), delimiters=_DELIMITERS).delimiter
+    except csv.Error:
+        pass
+    # the header alone, outside quotes
+    header = lines[0] if lines else ""
+    counts = {d: 0 for d in _DELIMITERS}
+    quoted = False
+    for ch in header:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch in counts:
+            counts[ch] += 1
+    best = max(counts, key=counts.get)
+    return best if counts[best] else ","
+
+
+def sniff_csv(
+    input_path: Path,
+    head_bytes: int = _HEAD_BYTES,
+    range_bytes: int = _RANGE_BYTES,
+    n_ranges: int = _N_RANGES,
+) -> CsvDialect:
+    """Pick the encoding from the head and `n_ranges` blocks scattered over the file
+    (utf-8, or cp1251 if most of the samples are not utf-8) and the delimiter from the head."""
+    st = input_path.stat()
+    head, samples = _read_samples(input_path, head_bytes, range_bytes, n_ranges)
+    encoding = _pick_encoding(head, samples)
+    delimiter = _pick_delimiter(head.decode(encoding, errors=decode_errors(encoding)))
+    return CsvDialect(
+        path=str(input_path),
+        size=st.st_size,
+        mtime_ns=st.st_mtime_ns,
+        encoding=encoding,
+        delimiter=delimiter,
+        sampled_bytes=sum(len(b) for b in samples),
+    )
+
+
+def load_or_sniff(input_path: Path) -> CsvDialect:
+    """Reuse the sidecar dialect if it matches the file, else sniff and save it."""
+    sidecar = dialect_path_for(input_path)
+    if sidecar.exists():
+        try:
+            dialect = CsvDialect.load(sidecar)
+            if dialect.matches(input_path):
+                return dialect
+        except (OSError, ValueError, TypeError) as e:
+            log.warning("Ignoring unreadable dialect %s: %s", sidecar, e)
+    dialect = sniff_csv(input_path)
+    log.info(
+        "Sniffed %s: encoding=%s delimiter=%r (%s bytes sampled)",
+        input_path, dialect.encoding, dialect.delimiter, dialect.sampled_bytes,
+    )
+    try:
+        dialect.save(sidecar)
+    except OSError as e:
+        log.warning("Could not write dialect %s: %s", sidecar, e)
+    return dialect
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="Sniff and cache the encoding and delimiter of a CSV")
+    p.add_argument("input", help="Path to hh.csv")
+    p.add_argument("--force", action="store_true", help="Ignore an existing sidecar")
+    args = p.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    input_path = Path(args.input)
+    if args.force:
+        dialect_path_for(input_path).unlink(missing_ok=True)
+    dialect = load_or_sniff(input_path)
+    log.info("%s: %s -> %s", args.input, asdict(dialect), dialect_path_for(input_path))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
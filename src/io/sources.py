@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import bz2
+import glob
+import gzip
+import io
+import lzma
+import queue
+import threading
+from pathlib import Path
+from typing import IO, Callable, Iterable, Optional
+
+# suffix -> opener of a binary stream of the decompressed bytes (stdlib codecs only)
+COMPRESSIONS: dict[str, Callable[[Path], IO[bytes]]] = {
+    ".gz": lambda p: gzip.open(p, "rb"),
+    ".bz2": lambda p: bz2.open(p, "rb"),
+    ".xz": lambda p: lzma.open(p, "rb"),
+    ".lzma": lambda p: lzma.open(p, "rb"),
+}
+
+# sidecars written next to an input (src.io.sniff, src.io.index): never inputs themselves
+SIDECAR_SUFFIXES = (".sniff.json", ".idx.json")
+_BLOCK_BYTES = 1 << 20
+_DONE = b""
+
+
+def compression_of(path: Path) -> Optional[str]:
+    """The compression suffix of `path` (".gz", ".bz2", ".xz", ".lzma") or None."""
+    suffix = path.suffix.lower()
+    return suffix if suffix in COMPRESSIONS else None
+
+
+def expand_inputs(specs: Iterable[str]) -> list[Path]:
+    """Input paths of --input: each spec is a path or a glob (sorted matches, sidecar
+    files left out). Duplicates are dropped; a spec that matches nothing is an error."""
+    out: list[Path] = []
+    for spec in specs:
+        spec = str(Path(spec).expanduser())
+        if glob.has_magic(spec):
+            matches = sorted(m for m in glob.glob(spec) if not m.endswith(SIDECAR_SUFFIXES))
+            if not matches:
+                raise FileNotFoundError(f"No input files match {spec!r}")
+            paths = [Path(m) for m in matches]
+        else:
+            paths = [Path(spec)]
+            if not paths[0].exists():
+                raise FileNotFoundError(f"Input file not found: {spec}")
+        out.extend(p.resolve() for p in paths)
+    return list(dict.fromkeys(out))
+
+
+class DecompressingReader(io.RawIOBase):
+    """Decompressed bytes of a .gz/.bz2/.xz file, inflated on a helper thread.
+
+    The thread keeps up to `depth` blocks of `block_bytes` ready, so decompression (zlib,
+    bz2 and lzma release the GIL) overlaps with CSV parsing instead of alternating with
+    it, and nothing is written to disk. Errors of the codec are re-raised by read().
+    """
+
+    def __init__(self, path: Path, depth: int = 4, block_bytes: int = _BLOCK_BYTES) -> None:
+        super().__init__()
+        suffix = compression_of(path)
+        if suffix is None:
+            raise ValueError(f"{path}: not a {'/'.join(COMPRESSIONS)} file")
+        self.path = path
+        self._q: queue.Queue = queue.Queue(maxsize=depth)
+        self._stop = threading.Event()
+        self._buf = memoryview(b"")
+        self._eof = False
+        self._src = COMPRESSIONS[suffix](path)
+        self._thread = threading.Thread(target=self._run, args=(block_bytes,), name=f"inflate-{path.name}", daemon=True)
+        self._thread.start()
+
+    def _put(self, item: object) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self, block_bytes: int) -> None:
+        try:
+            while not self._stop.is_set():
+                block = self._src.read(block_bytes)
+                if not self._put(block) or not block:
+                    return
+        except BaseException as e:  # handed to the reader
+            self._put(e)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        if not len(self._buf) and not self._eof:
+            item = self._q.get()
+            if isinstance(item, BaseException):
+                self._eof = True
+                raise OSError(f"Failed to decompress {self.path}: {item}") from item
+            if item == _DONE:
+                self._eof = True
+            self._buf = memoryview(item)
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        return n
+
+    def close(self) -> None:
+        if not self.closed:
+            self._stop.set()
+            self._thread.join()
+            self._src.close()
+        super().close()
+
+
+def open_decompressed(path: Path, depth: int = 4) -> IO[bytes]:
+    """Buffered binary stream of the decompressed contents of `path` (see DecompressingReader)."""
+    return io.BufferedReader(DecompressingReader(path, depth=depth), buffer_size=_BLOCK_BYTES)
@@ -0,0 +1,351 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+
+from src.encoding.strategies import HeavyHitters
+
+STATS_NAME = "stats.json"
+_STATS_VERSION = 1
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+# categorical columns with more distinct codes keep only their most frequent ones in stats.json
+MAX_CODES = 1_000
+
+
+@dataclass
+class QuantileSketch:
+    """Mergeable quantile summary: a stack of compactors (KLL-style, fixed size per level).
+
+    Level i holds items of weight 2**i, at most `k` of them: a fuller level is sorted and
+    every other item (alternating offsets) moves up a level, which keeps the total weight
+    at n. Rank error is roughly log2(n / k) / k of n. Merging the same per-chunk sketches
+    in the same order gives the same summary, wherever they were built (RunningStats
+    always merges chunk summaries, so --workers matches the serial run).
+    """
+
+    k: int = 256
+    n: int = 0
+    levels: list[np.ndarray] = field(default_factory=list)
+    flips: int = 0
+
+    def update(self, values: np.ndarray) -> None:
+        """Add finite values."""
+        self.n += len(values)
+        self._add(0, np.asarray(values, dtype=np.float64))
+        self._compact()
+
+    def merge(self, other: "QuantileSketch") -> None:
+        self.n += other.n
+        for i, level in enumerate(other.levels):
+            self._add(i, level)
+        self._compact()
+
+    def _add(self, i: int, values: np.ndarray) -> None:
+        while len(self.levels) <= i:
+            self.levels.append(np.empty(0, dtype=np.float64))
+        self.levels[i] = np.concatenate([self.levels[i], values]) if len(self.levels[i]) else values.copy()
+
+    def _compact(self) -> None:
+        i = 0
+        while i < len(self.levels):
+            level = self.levels[i]
+            if len(level) > self.k:
+                level = np.sort(level)
+                flip = self.flips & 1
+                self.flips += 1
+                stay = level[:0]
+                if len(level) % 2:
+                    # the odd item out stays at this level; which end alternates like the offset
+                    stay, level = (level[:1], level[1:]) if flip else (level[-1:], level[:-1])
+                self.levels[i] = stay.copy()
+                self._add(i + 1, level[flip::2])
+            i += 1
+
+    def quantiles(self, qs: tuple[float, ...] = QUANTILES) -> list[Optional[float]]:
+        if self.n == 0:
+            return [None] * len(qs)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(lv), 2**i, dtype=np.float64) for i, lv in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        cum = np.cumsum(weights[order])
+        at = np.searchsorted(cum, np.asarray(qs) * cum[-1], side="left").clip(0, len(items) - 1)
+        return [float(v) for v in items[order][at]]
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"k": self.k, "n": self.n, "flips": self.flips, "levels": [lv.tolist() for lv in self.levels]}
+
+    @classmethod
+    def from_dict(cls, d: dict[str, Any]) -> "QuantileSketch":
+        levels = [np.asarray(lv, dtype=np.float64) for lv in d["levels"]]
+        return cls(k=d["k"], n=d["n"], levels=levels, flips=d["flips"])
+
+
+def _heavy_hitters(codes: np.ndarray, capacity: int) -> HeavyHitters:
+    """Code histogram as a (not yet pruned) HeavyHitters summary keyed by code."""
+    used = np.flatnonzero(codes)
+    return HeavyHitters(
+        capacity=capacity, counts=dict(zip(used.tolist(), codes[used].tolist())), total=int(codes.sum())
+    )
+
+
+def _top_codes(codes: np.ndarray, capacity: int) -> HeavyHitters:
+    """The `capacity` most frequent codes with exact counts; `error` is the largest count
+    left out, so the summary keeps the Misra-Gries guarantees."""
+    hh = _heavy_hitters(codes, capacity)
+    used = np.fromiter(hh.counts, dtype=np.int64, count=len(hh.counts))
+    if len(used) > capacity:
+        order = np.lexsort((used, -codes[used]))
+        hh.error = int(codes[used[order[capacity]]])
+        hh.counts = {int(c): int(codes[c]) for c in used[order[:capacity]]}
+    return hh
+
+
+@dataclass
+class ColumnStats:
+    """Streaming statistics of one encoded column.
+
+    Moments are Welford's (mean and the sum of squared deviations m2), merged with Chan's
+    formula. NaNs are counted and left out of everything else. Categorical columns keep a
+    histogram of codes, the others a QuantileSketch.
+
+    A histogram of more than `max_codes` distinct codes is saved as its top codes only
+    (see to_dict); read back, it is a HeavyHitters summary (`top`) that later chunks are
+    merged into, with counts under the true ones by at most `top.error`.
+    """
+
+    categorical: bool = False
+    count: int = 0
+    nans: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    min: Optional[float] = None
+    max: Optional[float] = None
+    codes: Optional[np.ndarray] = None
+    sketch: Optional[QuantileSketch] = None
+    top: Optional[HeavyHitters] = None
+
+    def __post_init__(self) -> None:
+        if self.categorical and self.codes is None and self.top is None:
+            self.codes = np.zeros(0, dtype=np.int64)
+        if not self.categorical and self.sketch is None:
+            self.sketch = QuantileSketch()
+
+    @classmethod
+    def of_values(cls, values: np.ndarray, categorical: bool) -> "ColumnStats":
+        v = np.asarray(values, dtype=np.float64)
+        nan = np.isnan(v)
+        v = v[~nan] if nan.any() else v
+        st = cls(categorical=categorical, count=len(v), nans=int(nan.sum()))
+        if len(v):
+            st.mean = float(v.mean())
+            st.m2 = float(np.square(v - st.mean).sum())
+            st.min, st.max = float(v.min()), float(v.max())
+            if categorical:
+                st.codes = np.bincount(v.astype(np.int64))
+            else:
+                st.sketch.update(v)
+        return st
+
+    def merge(self, other: "ColumnStats") -> None:
+        self.nans += other.nans
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.mean, self.m2 = other.mean, other.m2
+        else:
+            n = self.count + other.count
+            delta = other.mean - self.mean
+            self.mean += delta * other.count / n
+            self.m2 += other.m2 + delta * delta * self.count * other.count / n
+        self.count += other.count
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        if self.categorical and self.top is None and other.top is None:
+            if len(other.codes) > len(self.codes):
+                self.codes = np.pad(self.codes, (0, len(other.codes) - len(self.codes)))
+            self.codes[: len(other.codes)] += other.codes
+        elif self.categorical:
+            if self.top is None:
+                self.top, self.codes = _heavy_hitters(self.codes, other.top.capacity), None
+            self.top.merge(other.top if other.top is not None else _heavy_hitters(other.codes, self.top.capacity))
+        else:
+            self.sketch.merge(other.sketch)
+
+    @property
+    def std(self) -> Optional[float]:
+        return float(np.sqrt(self.m2 / self.count)) if self.count else None
+
+    def to_dict(self, max_codes: int = MAX_CODES) -> dict[str, Any]:
+        d: dict[str, Any] = {
+            "categorical": self.categorical,
+            "count": self.count,
+            "nan": self.nans,
+            "mean": self.mean if self.count else None,
+            "std": self.std,
+            "min": self.min,
+            "max": self.max,
+            "m2": self.m2,
+        }
+        top = self.top
+        if self.categorical and top is None and np.count_nonzero(self.codes) > max_codes:
+            top = _top_codes(self.codes, max_codes)
+        if self.categorical and top is None:
+            d["codes"] = self.codes.tolist()
+        elif self.categorical:
+            ranked = sorted(top.counts.items(), key=lambda cn: (-cn[1], cn[0]))
+            d["top_codes"] = {
+                "capacity": top.capacity,
+                "codes": [c for c, _ in ranked],
+                "counts": [n for _, n in ranked],
+                "error": top.error,
+                "total": top.total,
+            }
+        else:
+            d["quantiles"] = dict(zip(map(str, QUANTILES), self.sketch.quantiles()))
+            d["sketch"] = self.sketch.to_dict()
+        return d
+
+    @classmethod
+    def from_dict(cls, d: dict[str, Any]) -> "ColumnStats":
+        top = d.get("top_codes")
+        return cls(
+            categorical=d["categorical"],
+            count=d["count"],
+            nans=d["nan"],
+            mean=d["mean"] or 0.0,
+            m2=d["m2"],
+            min=d["min"],
+            max=d["max"],
+            codes=np.asarray(d["codes"], dtype=np.int64) if d["categorical"] and top is None else None,
+            sketch=None if d["categorical"] else QuantileSketch.from_dict(d["sketch"]),
+            top=None if top is None else HeavyHitters(
+                capacity=top["capacity"], counts=dict(zip(top["codes"], top["counts"])),
+                error=top["error"], total=top["total"],
+            ),
+        )
+
+
+@dataclass
+class RunningStats:
+    """Column statistics of the written outputs, accumulated chunk by chunk.
+
+    Every chunk is summarized on its own (chunk()) and merged in chunk order (update()
+    does both), so parallel workers can return chunk summaries and the result matches
+    the serial run. save() writes stats.json with the summaries (count, nan, mean, std,
+    min, max, quantiles or code histogram) and the state to continue merging from; code
+    histograms of more than `max_codes` distinct codes are cut to the most frequent ones.
+    """
+
+    feature_names: list[str]
+    categorical: list[str] = field(default_factory=list)
+    max_codes: int = MAX_CODES
+    n_rows: int = 0
+    columns: dict[str, ColumnStats] = field(default_factory=dict)
+    target: ColumnStats = field(default_factory=ColumnStats)
+    complete: bool = False
+
+    def __post_init__(self) -> None:
+        for name in self.feature_names:
+            self.columns.setdefault(name, ColumnStats(categorical=name in self.categorical))
+
+    def chunk(self, columns: dict[str, np.ndarray], y: np.ndarray) -> "RunningStats":
+        """Summary of one chunk (column name -> values as written, and the target)."""
+        cat = set(self.categorical)
+        return RunningStats(
+            feature_names=self.feature_names,
+            categorical=self.categorical,
+            max_codes=self.max_codes,
+            n_rows=len(y),
+            columns={name: ColumnStats.of_values(columns[name], name in cat) for name in self.feature_names},
+            target=ColumnStats.of_values(y, False),
+        )
+
+    def update(self, columns: dict[str, np.ndarray], y: np.ndarray) -> None:
+        self.merge(self.chunk(columns, y))
+
+    def update_matrix(self, X: np.ndarray, y: np.ndarray) -> None:
+        """update() for a row block of the x_data.npy layout."""
+        self.update({name: X[:, j] for j, name in enumerate(self.feature_names)}, y)
+
+    def merge(self, other: "RunningStats") -> None:
+        if other.feature_names != self.feature_names:
+            raise ValueError("cannot merge statistics of different feature sets")
+        self.n_rows += other.n_rows
+        for name, st in other.columns.items():
+            self.columns[name].merge(st)
+        self.target.merge(other.target)
+
+    def remap_codes(self, luts: dict[str, np.ndarray]) -> None:
+        """Codes were rewritten as lut[code]: move the histogram counts along."""
+        for name, lut in luts.items():
+            st = self.columns.get(name)
+            if st is None or not st.categorical:
+                continue
+            if st.top is not None:
+                raise ValueError(f"{name}: only the top codes of the histogram are kept; it cannot be remapped")
+            m = min(len(lut), len(st.codes))
+            counts = np.zeros(max(len(lut), len(st.codes)), dtype=np.int64)
+            np.add.at(counts, lut[:m], st.codes[:m])
+            st.codes = counts
+            if st.count:
+                used = np.flatnonzero(counts)
+                st.mean = float((used * counts[used]).sum() / st.count)
+                st.m2 = float((np.square(used - st.mean) * counts[used]).sum())
+                st.min, st.max = float(used[0]), float(used[-1])
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "version": _STATS_VERSION,
+            "n_rows": self.n_rows,
+            "complete": self.complete,
+            "feature_names": self.feature_names,
+            "categorical": self.categorical,
+            "max_codes": self.max_codes,
+            "target": self.target.to_dict(),
+            "columns": {name: self.columns[name].to_dict(self.max_codes) for name in self.feature_names},
+        }
+
+    def save(self, path: Path) -> None:
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(self.to_dict(), ensure_ascii=False), encoding="utf-8")
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "RunningStats":
+        d = json.loads(path.read_text(encoding="utf-8"))
+        if d.get("version") != _STATS_VERSION:
+            raise ValueError(f"{path}: unsupported stats version {d.get('version')}")
+        return cls(
+            feature_names=d["feature_names"],
+            categorical=d["categorical"],
+            max_codes=d.get("max_codes", MAX_CODES),
+            n_rows=d["n_rows"],
+            columns={name: ColumnStats.from_dict(c) for name, c in d["columns"].items()},
+            target=ColumnStats.from_dict(d["target"]),
+            complete=d["complete"],
+        )
+
+    @classmethod
+    def of_npy(
+        cls,
+        x_path: Path,
+        y_path: Path,
+        feature_names: list[str],
+        categorical: list[str],
+        stop: Optional[int] = None,
+        block_rows: int = 1_000_000,
+        max_codes: int = MAX_CODES,
+    ) -> "RunningStats":
+        """Statistics of rows [0, stop) of existing x_data.npy/y_data.npy (one sequential scan)."""
+        X = np.load(x_path, mmap_mode="r")
+        y = np.load(y_path, mmap_mode="r")
+        stats = cls(feature_names=feature_names, categorical=categorical, max_codes=max_codes)
+        stop = len(y) if stop is None else stop
+        for start in range(0, stop, block_rows):
+            end = min(start + block_rows, stop)
+            stats.update_matrix(np.asarray(X[start:end]), np.asarray(y[start:end]))
+        return stats
@@ -1,16 +1,28 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import hashlib
+import io
+import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Any
 
 import numpy as np
 
 
 @dataclass
 class NpyWriter:
+    """x_data.npy/y_data.npy preallocated with the final shape, written at row offsets.
+
+    resume=True reopens existing files (r+) instead, after checking their shape.
+    """
+
     outdir: Path
     n_rows: int
     feature_names: list[str]
+    resume: bool = False
 
     def __post_init__(self) -> None:
         self.outdir.mkdir(parents=True, exist_ok=True)
@@ -18,11 +30,17 @@ class NpyWriter:
         self.y_path = self.outdir / "y_data.npy"
         self.feat_path = self.outdir / "feature_names.txt"
 
-        # npy memmaps (proper .npy format, writable without loading whole array)
-        self._X = np.lib.format.open_memmap(
-            self.x_path, mode="w+", dtype=np.float32, shape=(self.n_rows, len(self.feature_names))
-        )
-        self._y = np.lib.format.open_memmap(self.y_path, mode="w+", dtype=np.float32, shape=(self.n_rows,))
+        x_shape = (self.n_rows, len(self.feature_names))
+        if self.resume:
+            self._X = np.lib.format.open_memmap(self.x_path, mode="r+")
+            self._y = np.lib.format.open_memmap(self.y_path, mode="r+")
+            for arr, path, shape in ((self._X, self.x_path, x_shape), (self._y, self.y_path, (self.n_rows,))):
+                if arr.shape != shape or arr.dtype != np.float32:
+                    raise ValueError(f"{path}: holds {arr.dtype} {arr.shape}, expected float32 {shape}")
+        else:
+            # npy memmaps (proper .npy format, writable without loading whole array)
+            self._X = np.lib.format.open_memmap(self.x_path, mode="w+", dtype=np.float32, shape=x_shape)
+            self._y = np.lib.format.open_memmap(self.y_path, mode="w+", dtype=np.float32, shape=(self.n_rows,))
 
         self.feat_path.write_text("\n".join(self.feature_names), encoding="utf-8")
 
@@ -31,7 +49,325 @@ class NpyWriter:
         self._X[offset : offset + n, :] = X_arr
         self._y[offset : offset + n] = y_arr
 
-    def close(self) -> None:
-        # flush memmaps
+    def flush(self) -> None:
         self._X.flush()
         self._y.flush()
+
+    def close(self) -> None:
+        # flush memmaps
+        self.flush()
+
+
+_NPY_MAGIC = b"\x93NUMPY\x01\x00"  # format version 1.0
+_MAX_ROW_DIGITS = 20  # room for any int64 row count
+
+
+def _npy_header(dtype: np.dtype, shape: tuple[int, ...], size: int | None = None) -> bytes:
+    """Version 1.0 .npy header, space-padded to `size` bytes (or the minimal 64-aligned size
+    that still fits a row count of _MAX_ROW_DIGITS digits, so it can be rewritten in place)."""
+
+    def text(shape_repr: str) -> str:
+        descr = np.lib.format.dtype_to_descr(np.dtype(dtype))
+        return "{'descr': %r, 'fortran_order': False, 'shape': %s, }" % (descr, shape_repr)
+
+    if size is None:
+        widest = (int("9" * _MAX_ROW_DIGITS),) + tuple(shape[1:])
+        size = len(_NPY_MAGIC) + 2 + len(text(repr(widest))) + 1
+        size = -(-size // 64) * 64
+    body = text(repr(tuple(shape)))
+    body += " " * (size - len(_NPY_MAGIC) - 2 - len(body) - 1) + "\n"
+    header = _NPY_MAGIC + len(body).to_bytes(2, "little") + body.encode("latin1")
+    assert len(header) == size
+    return header
+
+
+class GrowableNpy:
+    """A .npy file opened for appending rows; the header shape is fixed up on close.
+
+    With append=True an existing file is extended: bytes past the rows its header
+    declares (left by an interrupted run) are dropped first.
+    """
+
+    def __init__(self, path: Path, dtype: np.dtype, row_shape: tuple[int, ...], append: bool = False) -> None:
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.row_shape = row_shape
+        if append:
+            self._fh = open(path, "r+b")
+            self.n_rows, self.header_size = self._read_header()
+            row_bytes = self.dtype.itemsize * int(np.prod(row_shape, dtype=np.int64))
+            self._fh.truncate(self.header_size + self.n_rows * row_bytes)
+            self._fh.seek(0, 2)
+            return
+        self.n_rows = 0
+        header = _npy_header(self.dtype, (0,) + row_shape)
+        self.header_size = len(header)
+        self._fh = open(path, "wb")
+        self._fh.write(header)
+
+    def _read_header(self) -> tuple[int, int]:
+        version = np.lib.format.read_magic(self._fh)
+        if version != (1, 0):
+            raise ValueError(f"{self.path}: .npy format {version} cannot be appended to")
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(self._fh)
+        if fortran_order or dtype != self.dtype or tuple(shape[1:]) != self.row_shape:
+            raise ValueError(f"{self.path}: holds {dtype} {shape}, expected {self.dtype} rows of {self.row_shape}")
+        header_size = self._fh.tell()
+        if header_size < len(_npy_header(self.dtype, (0,) + self.row_shape)):
+            raise ValueError(f"{self.path}: header has no room to grow in place")
+        return int(shape[0]), header_size
+
+    def append(self, arr: np.ndarray) -> None:
+        arr = np.ascontiguousarray(arr, dtype=self.dtype)
+        if arr.shape[1:] != self.row_shape:
+            raise ValueError(f"{self.path}: row shape {arr.shape[1:]} != {self.row_shape}")
+        self._fh.write(arr.tobytes())
+        self.n_rows += arr.shape[0]
+
+    def close(self) -> None:
+        self._fh.seek(0)
+        self._fh.write(_npy_header(self.dtype, (self.n_rows,) + self.row_shape, size=self.header_size))
+        self._fh.close()
+
+
+@dataclass
+class GrowableNpyWriter:
+    """Same outputs as NpyWriter, but the row count need not be known up front.
+
+    Rows are appended as they arrive; the .npy headers get the final shape on close().
+    resume=True extends the outputs already in `outdir` (same feature names required).
+    """
+
+    outdir: Path
+    feature_names: list[str]
+    resume: bool = False
+
+    def __post_init__(self) -> None:
+        self.outdir.mkdir(parents=True, exist_ok=True)
+        self.x_path = self.outdir / "x_data.npy"
+        self.y_path = self.outdir / "y_data.npy"
+        self.feat_path = self.outdir / "feature_names.txt"
+
+        if self.resume:
+            existing = self.feat_path.read_text(encoding="utf-8").split("\n")
+            if existing != list(self.feature_names):
+                raise ValueError(f"{self.feat_path}: feature names differ from the ones being appended")
+
+        self._X = GrowableNpy(self.x_path, np.float32, (len(self.feature_names),), append=self.resume)
+        self._y = GrowableNpy(self.y_path, np.float32, (), append=self.resume)
+        if self._X.n_rows != self._y.n_rows:
+            raise ValueError(f"{self.x_path} has {self._X.n_rows} rows, {self.y_path} has {self._y.n_rows}")
+
+        self.feat_path.write_text("\n".join(self.feature_names), encoding="utf-8")
+
+    @property
+    def n_rows(self) -> int:
+        return self._X.n_rows
+
+    def append(self, X_arr: np.ndarray, y_arr: np.ndarray) -> None:
+        if X_arr.shape[0] != y_arr.shape[0]:
+            raise ValueError(f"X has {X_arr.shape[0]} rows, y has {y_arr.shape[0]}")
+        self._X.append(X_arr)
+        self._y.append(y_arr)
+
+    def close(self) -> None:
+        self._X.close()
+        self._y.close()
+
+
+@dataclass
+class CsrWriter:
+    """Sparse rows appended chunk by chunk as CSR: <prefix>_indptr.npy (int64),
+    <prefix>_indices.npy (int32), <prefix>_data.npy (float32) and <prefix>.json.
+
+    Row i of the matrix is indices/data[indptr[i]:indptr[i + 1]]; all three files can
+    be memmapped, e.g. scipy.sparse.csr_matrix((data, indices, indptr), shape=(n_rows,
+    n_features)). Each chunk costs memory in proportion to its non-zeros.
+    """
+
+    outdir: Path
+    n_features: int
+    prefix: str = "tokens"
+    columns: list[str] = field(default_factory=list)
+    resume: bool = False
+
+    def __post_init__(self) -> None:
+        self.outdir.mkdir(parents=True, exist_ok=True)
+        self.indptr_path = self.outdir / f"{self.prefix}_indptr.npy"
+        self.indices_path = self.outdir / f"{self.prefix}_indices.npy"
+        self.data_path = self.outdir / f"{self.prefix}_data.npy"
+        self.meta_path = self.outdir / f"{self.prefix}.json"
+
+        if self.resume:
+            meta = json.loads(self.meta_path.read_text(encoding="utf-8"))
+            if meta["n_features"] != self.n_features:
+                raise ValueError(f"{self.meta_path}: {meta['n_features']} features, expected {self.n_features}")
+        self._indptr = GrowableNpy(self.indptr_path, np.int64, (), append=self.resume)
+        self._indices = GrowableNpy(self.indices_path, np.int32, (), append=self.resume)
+        self._data = GrowableNpy(self.data_path, np.float32, (), append=self.resume)
+        if self._indices.n_rows != self._data.n_rows:
+            raise ValueError(f"{self.indices_path} has {self._indices.n_rows} values, {self.data_path} has {self._data.n_rows}")
+        if self.resume:
+            last = np.load(self.indptr_path, mmap_mode="r")[self._indptr.n_rows - 1] if self._indptr.n_rows else -1
+            if last != self._indices.n_rows:
+                raise ValueError(f"{self.indptr_path} ends at {last}, {self.indices_path} has {self._indices.n_rows} values")
+        else:
+            self._indptr.append(np.zeros(1, dtype=np.int64))
+
+    @property
+    def n_rows(self) -> int:
+        return self._indptr.n_rows - 1
+
+    @property
+    def nnz(self) -> int:
+        return self._indices.n_rows
+
+    def append(self, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray) -> None:
+        """Add rows given in CSR form with a chunk-local `indptr` starting at 0."""
+        if indptr[0] != 0 or indptr[-1] != len(indices) or len(indices) != len(data):
+            raise ValueError(f"inconsistent CSR chunk: indptr ends at {indptr[-1]}, {len(indices)} indices, {len(data)} values")
+        if len(indices) and (indices.min() < 0 or indices.max() >= self.n_features):
+            raise ValueError(f"feature index out of range [0, {self.n_features})")
+        self._indptr.append(np.asarray(indptr[1:], dtype=np.int64) + self.nnz)
+        self._indices.append(indices)
+        self._data.append(data)
+
+    def close(self) -> None:
+        self._indptr.close()
+        self._indices.close()
+        self._data.close()
+        meta = {
+            "format": "csr",
+            "n_rows": self.n_rows,
+            "n_features": self.n_features,
+            "nnz": self.nnz,
+            "columns": self.columns,
+            "indptr": self.indptr_path.name,
+            "indices": self.indices_path.name,
+            "data": self.data_path.name,
+        }
+        self.meta_path.write_text(json.dumps(meta, ensure_ascii=False, indent=1), encoding="utf-8")
+
+
+@dataclass
+class ShardedWriter:
+    """Writes fixed-size shards plus manifest.json instead of one x_data.npy/y_data.npy pair.
+
+    Every `shard_rows` rows become shards/x_NNNNN.npy + y_NNNNN.npy (or one shard_NNNNN.npz
+    with arrays x and y when `compress`). Shards are written on `io_threads` background
+    threads as soon as they fill up, each to a temp name and then renamed. The manifest is
+    rewritten after every finished shard, so readers can start before the run ends: it
+    lists finished shards only (row range, files, sha256), and "complete" turns true on close().
+    """
+
+    outdir: Path
+    feature_names: list[str]
+    shard_rows: int = 1_000_000
+    compress: bool = False
+    io_threads: int = 2
+    _shards: list[dict[str, Any]] = field(default_factory=list, repr=False)
+
+    def __post_init__(self) -> None:
+        if self.shard_rows <= 0:
+            raise ValueError("shard_rows must be positive")
+        self.shard_dir = self.outdir / "shards"
+        self.shard_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.outdir / "manifest.json"
+        self.feat_path = self.outdir / "feature_names.txt"
+        self.feat_path.write_text("\n".join(self.feature_names), encoding="utf-8")
+
+        self.n_rows = 0  # rows handed to append()
+        self._buf_X: list[np.ndarray] = []
+        self._buf_y: list[np.ndarray] = []
+        self._buffered = 0
+        self._next_shard = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, self.io_threads), thread_name_prefix="shard-writer")
+        self._pending: list[Future] = []
+        self._write_manifest(complete=False)
+
+    def append(self, X_arr: np.ndarray, y_arr: np.ndarray) -> None:
+        if X_arr.shape[0] != y_arr.shape[0]:
+            raise ValueError(f"X has {X_arr.shape[0]} rows, y has {y_arr.shape[0]}")
+        if X_arr.shape[1:] != (len(self.feature_names),):
+            raise ValueError(f"X rows have shape {X_arr.shape[1:]}, expected ({len(self.feature_names)},)")
+        self._buf_X.append(np.asarray(X_arr, dtype=np.float32))
+        self._buf_y.append(np.asarray(y_arr, dtype=np.float32))
+        self._buffered += X_arr.shape[0]
+        self.n_rows += X_arr.shape[0]
+        while self._buffered >= self.shard_rows:
+            self._flush(self.shard_rows)
+
+    def _flush(self, n: int) -> None:
+        X = np.concatenate(self._buf_X) if len(self._buf_X) > 1 else self._buf_X[0]
+        y = np.concatenate(self._buf_y) if len(self._buf_y) > 1 else self._buf_y[0]
+        self._buf_X, self._buf_y = ([X[n:]], [y[n:]]) if len(X) > n else ([], [])
+        self._buffered = len(X) - n
+        index = self._next_shard
+        start = self.n_rows - self._buffered - n
+        self._next_shard += 1
+        self._pending.append(self._pool.submit(self._write_shard, index, start, X[:n], y[:n]))
+        # surface write errors early; at most 2 shards per thread are waiting in memory
+        while self._pending and (self._pending[0].done() or len(self._pending) > 2 * self.io_threads):
+            self._pending.pop(0).result()
+
+    def _write_file(self, name: str, payload: bytes) -> dict[str, Any]:
+        path = self.shard_dir / name
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_bytes(payload)
+        tmp.replace(path)
+        return {"path": f"{self.shard_dir.name}/{name}", "bytes": len(payload), "sha256": hashlib.sha256(payload).hexdigest()}
+
+    def _write_shard(self, index: int, start: int, X: np.ndarray, y: np.ndarray) -> None:
+        files: dict[str, Any] = {}
+        if self.compress:
+            buf = io.BytesIO()
+            np.savez_compressed(buf, x=X, y=y)
+            files["npz"] = self._write_file(f"shard_{index:05d}.npz", buf.getvalue())
+        else:
+            for key, arr in (("x", X), ("y", y)):
+                buf = io.BytesIO()
+                np.lib.format.write_array(buf, np.ascontiguousarray(arr), allow_pickle=False)
+                files[key] = self._write_file(f"{key}_{index:05d}.npy", buf.getvalue())
+        with self._lock:
+            self._shards.append({"index": index, "start": start, "stop": start + len(X), "files": files})
+            self._write_manifest(complete=False)
+
+    def _write_manifest(self, complete: bool) -> None:
+        shards = sorted(self._shards, key=lambda s: s["index"])
+        manifest = {
+            "version": 1,
+            "format": "npz" if self.compress else "npy",
+            "dtype": "float32",
+            "feature_names": list(self.feature_names),
+            "shard_rows": self.shard_rows,
+            "n_rows": sum(s["stop"] - s["start"] for s in shards),
+            "complete": complete,
+            "shards": shards,
+        }
+        tmp = self.manifest_path.with_name(self.manifest_path.name + ".tmp")
+        tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=1), encoding="utf-8")
+        tmp.replace(self.manifest_path)
+
+    def close(self) -> None:
+        if self._buffered:
+            self._flush(self._buffered)
+        self._pool.shutdown(wait=True)
+        for f in self._pending:
+            f.result()
+        self._pending.clear()
+        with self._lock:
+            self._write_manifest(complete=True)
+
+
+def remap_codes(x_path: Path, luts: dict[int, np.ndarray], block_rows: int = 1_000_000) -> None:
+    """Rewrite categorical code columns of an x_data.npy in place: X[:, j] = lut[X[:, j]]."""
+    if not luts:
+        return
+    X = np.load(x_path, mmap_mode="r+")
+    for start in range(0, X.shape[0], block_rows):
+        block = X[start : start + block_rows]
+        for j, lut in luts.items():
+            block[:, j] = lut[block[:, j].astype(np.int64)]
+    X.flush()
+    del X
@@ -1,19 +1,42 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import Protocol, Optional, Any
+from typing import ClassVar, Protocol, Optional, Any
 
+import numpy as np
 import pandas as pd
 
 
+@dataclass
+class CsrChunk:
+    """Sparse features of a chunk's rows in CSR form (indptr starts at 0)."""
+
+    indptr: np.ndarray  # int64, n_rows + 1
+    indices: np.ndarray  # int32 feature ids
+    data: np.ndarray  # float32
+    n_features: int
+
+    @property
+    def n_rows(self) -> int:
+        return len(self.indptr) - 1
+
+
 @dataclass
 class PipelineContext:
-    """State passed through the chain for a single chunk."""
+    """State passed through the chain for a single chunk.
+
+    With `copy_free=True` handlers mutate `df` in place (adding/replacing only the
+    columns they declare) instead of copying it, and `raw` is not kept.
+    notes["fit_only"] marks a fitting pass whose outputs are not written.
+    """
 
-    raw: pd.DataFrame
     df: pd.DataFrame
+    raw: Optional[pd.DataFrame] = None
     X: Optional[pd.DataFrame] = None
     y: Optional[pd.Series] = None
+    # sparse features row-aligned with X (HashTokensHandler)
+    tokens: Optional[CsrChunk] = None
+    copy_free: bool = False
     notes: dict[str, Any] = field(default_factory=dict)
 
 
@@ -29,6 +52,11 @@ class BaseHandler:
     поэтому _next может отсутствовать. Используем getattr/setattr.
     """
 
+    # input columns this handler reads from ctx.df
+    requires: ClassVar[tuple[str, ...]] = ()
+    # columns this handler adds to (or rewrites in) ctx.df
+    produces: ClassVar[tuple[str, ...]] = ()
+
     def __init__(self) -> None:
         self._next: Optional["BaseHandler"] = None
 
@@ -36,7 +64,15 @@ class BaseHandler:
         setattr(self, "_next", nxt)
         return nxt
 
+    def frame(self, ctx: PipelineContext) -> pd.DataFrame:
+        """Frame to write into: ctx.df itself in copy-free mode, a private copy otherwise."""
+        return ctx.df if ctx.copy_free else ctx.df.copy()
+
     def handle(self, ctx: PipelineContext) -> PipelineContext:
+        # subclasses call this once their own work is done: report it, then pass on
+        instrumentation = ctx.notes.get("instrumentation")
+        if instrumentation is not None:
+            instrumentation.handler_done(self, ctx)
         nxt = getattr(self, "_next", None)
         if nxt is None:
             return ctx
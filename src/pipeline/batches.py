@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+import numpy as np
+
+from src.encoding.encoders import FitState
+from src.io.batching import Batch, rebatch
+from src.io.prefetch import PrefetchStats, prefetch as _prefetch
+from src.io.readers import iter_csv_chunks
+
+from .builder import build_pipeline
+from .cache import ParseCache
+from .pipeline import Pipeline
+
+log = logging.getLogger("pipeline.batches")
+
+
+def fit_encoders(
+    input_path: Union[str, Path],
+    pipeline: Optional[Pipeline] = None,
+    chunksize: int = 50_000,
+    encoding: Optional[str] = None,
+    delimiter: Optional[str] = None,
+) -> FitState:
+    """Pass 1 in-process: fit and finalize the encoders over the whole file (nothing is written)."""
+    pipeline = pipeline if pipeline is not None else build_pipeline(parse_cache=ParseCache())
+    fit = pipeline.new_fit_state()
+    chunks = iter_csv_chunks(
+        Path(input_path), chunksize, encoding, delimiter, usecols=pipeline.required_columns()
+    )
+    for chunk in chunks:
+        ctx = pipeline.process_chunk(chunk, fit_only=True)
+        if ctx.X is None or ctx.y is None:
+            continue
+        if not fit.feature_names:
+            fit.init_columns(list(ctx.X.columns))
+        fit.fit_chunk(ctx.X)
+    if not fit.feature_names:
+        raise RuntimeError("No data produced by pipeline. Check input/filters/target parsing.")
+    fit.finalize()
+    return fit
+
+
+def _encoded_chunks(
+    input_path: Path,
+    pipeline: Pipeline,
+    fit: FitState,
+    streaming_fit: bool,
+    chunksize: int,
+    encoding: Optional[str],
+    delimiter: Optional[str],
+) -> Iterator[Batch]:
+    """(X, y) float32 per CSV chunk. streaming_fit: extend the maps as values first appear."""
+    chunks = iter_csv_chunks(input_path, chunksize, encoding, delimiter, usecols=pipeline.required_columns())
+    for chunk in chunks:
+        ctx = pipeline.process_chunk(chunk)
+        if ctx.X is None or ctx.y is None or len(ctx.X) == 0:
+            continue
+        if streaming_fit:
+            if not fit.feature_names:
+                fit.init_columns(list(ctx.X.columns))
+            fit.partial_fit(ctx.X)
+        yield fit.transform_chunk(ctx.X, ctx.y, feature_names=fit.feature_names)
+
+
+def _shuffled(
+    chunks: Iterator[Batch], batch_size: int, buffer_rows: int, rng: np.random.Generator, drop_last: bool
+) -> Iterator[Batch]:
+    """Batches drawn at random from a buffer of at most ~`buffer_rows` rows (plus one chunk
+    while it is being added). Drawn rows are filled in from the tail, so nothing is moved
+    but the batch itself."""
+    X_buf: Optional[np.ndarray] = None
+    y_buf: Optional[np.ndarray] = None
+    n = 0
+
+    def draw() -> Batch:
+        nonlocal n
+        picked = np.sort(rng.choice(n, size=batch_size, replace=False))
+        X_out, y_out = X_buf[picked], y_buf[picked]
+        tail = n - batch_size
+        holes = picked[picked < tail]
+        # tail rows that were not picked move into the holes
+        keep = np.ones(batch_size, dtype=bool)
+        keep[picked[picked >= tail] - tail] = False
+        movers = np.flatnonzero(keep) + tail
+        X_buf[holes] = X_buf[movers]
+        y_buf[holes] = y_buf[movers]
+        n = tail
+        return X_out, y_out
+
+    for X, y in chunks:
+        if X_buf is None:
+            X_buf, y_buf = X.copy(), y.copy()
+        else:
+            X_buf, y_buf = np.concatenate([X_buf[:n], X]), np.concatenate([y_buf[:n], y])
+        n = len(X_buf)
+        while n >= max(buffer_rows, batch_size):
+            yield draw()
+    if X_buf is None:
+        return
+    # drain what is left in random order
+    order = rng.permutation(n)
+    X_buf, y_buf = X_buf[order], y_buf[order]
+    for start in range(0, n, batch_size):
+        if drop_last and start + batch_size > n:
+            return
+        yield X_buf[start : start + batch_size], y_buf[start : start + batch_size]
+
+
+def iter_batches(
+    input_path: Union[str, Path],
+    batch_size: int = 1024,
+    fit_state: Union[FitState, str, Path, None] = None,
+    pipeline: Optional[Pipeline] = None,
+    shuffle_buffer: int = 0,
+    seed: Optional[int] = None,
+    prefetch: int = 0,
+    prefetch_stats: Optional[PrefetchStats] = None,
+    drop_last: bool = False,
+    chunksize: int = 50_000,
+    encoding: Optional[str] = None,
+    delimiter: Optional[str] = None,
+) -> Iterator[Batch]:
+    """Stream (X, y) float32 batches straight from the CSV, without writing .npy files.
+
+    Columns of X are fit_state.feature_names, encoded exactly as in x_data.npy.
+
+    fit_state: a fitted FitState or a saved fit_state.npz: transform only, one read.
+    None: codes are assigned as values first appear (the same codes as the two-pass run,
+    like --single-pass), so the first batch is ready after the first chunk. Pass an empty
+    `pipeline.new_fit_state()` instead to keep the state that is filled in. "topk"
+    columns need the whole file first: fit_encoders() runs before streaming.
+    pipeline: the handler chain (default: build_pipeline() with a parse cache).
+    shuffle_buffer: when > 0, every batch is drawn at random from a buffer of that many
+    rows (filled from the stream, drained at the end), seeded by `seed`; 0 keeps file order.
+    prefetch: parse and encode up to this many chunks ahead on a background thread, so
+    the consumer trains while the next chunks are read.
+    drop_last: skip the final batch if it is short.
+    """
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be positive, got {batch_size}")
+    input_path = Path(input_path)
+    pipeline = pipeline if pipeline is not None else build_pipeline(parse_cache=ParseCache())
+
+    if isinstance(fit_state, (str, Path)):
+        fit = FitState.load(Path(fit_state).expanduser())
+    elif fit_state is not None:
+        fit = fit_state
+    elif any(st.kind == "topk" for st in pipeline.encoding.values()):
+        log.info("Top-K encoded columns: fitting %s before streaming", input_path)
+        fit = fit_encoders(input_path, pipeline, chunksize, encoding, delimiter)
+    else:
+        fit = pipeline.new_fit_state()
+    streaming_fit = not fit.feature_names
+
+    chunks = _encoded_chunks(input_path, pipeline, fit, streaming_fit, chunksize, encoding, delimiter)
+    if prefetch > 0:
+        chunks = _prefetch(chunks, depth=prefetch, stats=prefetch_stats)
+    if shuffle_buffer > 0:
+        yield from _shuffled(chunks, batch_size, shuffle_buffer, np.random.default_rng(seed), drop_last)
+    else:
+        yield from rebatch(chunks, batch_size, drop_last)
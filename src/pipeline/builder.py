@@ -1,5 +1,11 @@
 from __future__ import annotations
 
+import importlib.util
+from typing import Iterable, Optional
+
+from src.encoding.strategies import ColumnStrategy
+
+from .cache import ParseCache
 from .pipeline import Pipeline
 from .handlers import (
     NormalizeColumnsHandler,
@@ -11,10 +17,68 @@ from .handlers import (
     ParseEducationHandler,
     ParseCarHandler,
     SelectXYHandler,
+    HashTokensHandler,
+    DateParser,
+)
+
+
+# Source columns whose values repeat a lot across resumes; read as `category` with compact dtypes.
+LOW_CARDINALITY_COLUMNS = (
+    "Пол, возраст",
+    "ЗП",
+    "Город",
+    "Занятость",
+    "График",
+    "Образование и ВУЗ",
+    "Обновление резюме",
+    "Авто",
+)
+
+
+# Output columns that are close to free text: millions of distinct values on full dumps.
+HIGH_CARDINALITY_COLUMNS = (
+    "Ищет работу на должность:",
+    "Последенее/нынешнее место работы",
+    "Последеняя/нынешняя должность",
 )
 
 
-def build_pipeline(target: str = "salary_rub", drop_missing_target: bool = False) -> Pipeline:
+def high_cardinality_encoding(strategy: ColumnStrategy) -> dict[str, ColumnStrategy]:
+    """`strategy` for every HIGH_CARDINALITY_COLUMNS column (empty for "exact")."""
+    if strategy.kind == "exact":
+        return {}
+    return {col: strategy for col in HIGH_CARDINALITY_COLUMNS}
+
+
+def compact_dtypes(columns: Iterable[str]) -> dict[str, str]:
+    """read_csv dtypes for `columns`: category for low-cardinality ones, and
+    string[pyarrow] for the free-text rest when pyarrow is installed."""
+    has_arrow = importlib.util.find_spec("pyarrow") is not None
+    dtypes: dict[str, str] = {}
+    for col in columns:
+        if col in LOW_CARDINALITY_COLUMNS:
+            dtypes[col] = "category"
+        elif has_arrow:
+            dtypes[col] = "string[pyarrow]"
+    return dtypes
+
+
+def build_pipeline(
+    target: str = "salary_rub",
+    drop_missing_target: bool = False,
+    vectorized: bool = False,
+    parse_cache: Optional[ParseCache] = None,
+    copy_free: bool = False,
+    encoding: Optional[dict[str, ColumnStrategy]] = None,
+    token_features: int = 0,
+    date_cache_size: int = 200_000,
+) -> Pipeline:
+    """encoding: per output column ColumnStrategy (see high_cardinality_encoding);
+    unlisted categorical columns get exact codes.
+    token_features: when > 0, also hash the words of HIGH_CARDINALITY_COLUMNS into
+    this many sparse features (ctx.tokens).
+    date_cache_size: distinct resume update dates kept parsed across chunks by the
+    DateParser (0 disables it); independent of `parse_cache`."""
     first = NormalizeColumnsHandler()
     h = first
     h = h.set_next(
@@ -32,14 +96,23 @@ def build_pipeline(target: str = "salary_rub", drop_missing_target: bool = False
                 "Образование и ВУЗ",
                 "Обновление резюме",
                 "Авто",
-            ]
+            ],
+            vectorized=vectorized,
         )
     )
-    h = h.set_next(ParseGenderAgeHandler())
-    h = h.set_next(ParseSalaryHandler())
-    h = h.set_next(ParseCityHandler())
-    h = h.set_next(ParseExperienceHandler())
-    h = h.set_next(ParseEducationHandler())
-    h = h.set_next(ParseCarHandler())
-    h = h.set_next(SelectXYHandler(target=target, drop_missing_target=drop_missing_target))
-    return Pipeline(first)
+    h = h.set_next(ParseGenderAgeHandler(vectorized=vectorized, cache=parse_cache))
+    h = h.set_next(ParseSalaryHandler(vectorized=vectorized, cache=parse_cache))
+    h = h.set_next(ParseCityHandler(vectorized=vectorized, cache=parse_cache))
+    h = h.set_next(ParseExperienceHandler(vectorized=vectorized))
+    h = h.set_next(ParseEducationHandler(vectorized=vectorized, cache=parse_cache))
+    h = h.set_next(ParseCarHandler(vectorized=vectorized, cache=parse_cache))
+
+    # selection and extra outputs: kept apart so a cached parse stage output can skip the above
+    rest = SelectXYHandler(
+        target=target,
+        drop_missing_target=drop_missing_target,
+        dates=DateParser(cache_size=date_cache_size),
+    )
+    if token_features > 0:
+        rest.set_next(HashTokensHandler(columns=HIGH_CARDINALITY_COLUMNS, n_features=token_features))
+    return Pipeline(first, copy_free=copy_free, encoding=encoding, rest=rest)
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any
+
+
+@dataclass
+class ParseCache:
+    """Bounded LRU cache of parsed text values, shared across chunks and passes.
+
+    Keys are (parser name, cleaned source text); values are whatever the parser
+    returned. One instance is meant to live as long as the pipeline, so repeated
+    values (salary strings, cities, flags) are parsed once per run.
+    """
+
+    maxsize: int = 200_000
+    hits: int = 0
+    misses: int = 0
+    _data: OrderedDict[tuple[str, str], Any] = field(default_factory=OrderedDict, repr=False)
+
+    def get(self, parser: str, text: str) -> tuple[bool, Any]:
+        key = (parser, text)
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return False, None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return True, value
+
+    def put(self, parser: str, text: str, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        self._data[(parser, text)] = value
+        self._data.move_to_end((parser, text))
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+        }
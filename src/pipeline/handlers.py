@@ -1,14 +1,17 @@
 from __future__ import annotations
 
 import re
-from dataclasses import dataclass
-from typing import Optional, Iterable
+from dataclasses import dataclass, field
+from typing import Any, Callable, ClassVar, Optional, Iterable
 
+import numpy as np
 import pandas as pd
 
-from .base import BaseHandler, PipelineContext
+from .base import BaseHandler, CsrChunk, PipelineContext
+from .cache import ParseCache
 
 _NBSP = "\u00A0"
+_TOKEN_RE = r"\w+"
 _WS_RE = re.compile(r"\s+")
 
 
@@ -149,13 +152,439 @@ def _has_car(text: str) -> Optional[bool]:
     return False
 
 
+# ---------------------------------------------------------------------------
+# Vectorized counterparts of the scalar parsers above.
+#
+# Each `_*_vec` takes the raw column and returns object arrays holding exactly
+# what the scalar parser returns row by row (a tuple of arrays for tuple
+# parsers); `_from_values` then applies the same dtype inference as Series.map.
+# Text is processed as object dtype on purpose: the arrow-backed string dtype
+# uses RE2, whose `\s`/`\d` are ASCII-only and would diverge from `re`.
+# ---------------------------------------------------------------------------
+
+
+def _from_values(values: np.ndarray, index: pd.Index) -> pd.Series:
+    # Same dtype inference as Series.map (ints + None -> float64, str -> str, ...)
+    return pd.Series(values, index=index, dtype=object).infer_objects()
+
+
+def _to_str_vec(ser: pd.Series) -> pd.Series:
+    na = ser.isna()
+    return ser.astype(str).astype(object).where(~na, "")
+
+
+def _clean_text_vec(ser: pd.Series) -> pd.Series:
+    # NBSP and thin space are whitespace for str.split as well as for `\s`,
+    # so split + join reproduces _clean_text in two passes instead of four.
+    return _to_str_vec(ser).str.split().str.join(" ")
+
+
+def _lower_vec(ser: pd.Series) -> pd.Series:
+    return _clean_text_vec(ser).str.lower()
+
+
+def _contains(s: pd.Series, pat: str) -> np.ndarray:
+    return s.str.contains(pat, regex=False).to_numpy(dtype=bool)
+
+
+def _ints(digits: pd.Series) -> np.ndarray:
+    """Digit strings (no NA, at most _MAX_INT_DIGITS long) -> int64 array."""
+    return digits.to_numpy(dtype=object).astype(np.int64)
+
+
+# Digit runs up to this length stay in int64 even after the arithmetic of the parsers
+# (years * 12 + months, the sum of two salary bounds); rows with a longer run are
+# parsed by the scalar function, which uses Python ints.
+_MAX_INT_DIGITS = 17
+_LONG_DIGITS_RE = rf"\d{{{_MAX_INT_DIGITS + 1},}}"
+
+
+def _long_numbers(t: pd.Series) -> np.ndarray:
+    return t.str.contains(_LONG_DIGITS_RE, regex=True).to_numpy(dtype=bool)
+
+
+def _redo_scalar(ser: pd.Series, rows: np.ndarray, scalar: Callable[[str], Any], out: Any) -> Any:
+    """Overwrite `rows` of the vectorized result `out` (an object array or a tuple of
+    them) with what the scalar parser returns for them."""
+    for i in np.flatnonzero(rows):
+        value = scalar(_to_str(ser.iloc[i]))
+        if isinstance(out, tuple):
+            for arr, v in zip(out, value):
+                arr[i] = v
+        else:
+            out[i] = value
+    return out
+
+
+def _parse_gender_age_vec(ser: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    t = _lower_vec(ser)
+    gender = np.select([_contains(t, "муж"), _contains(t, "жен")], ["M", "F"], default=None)
+
+    age = np.full(len(t), None, dtype=object)
+    m = t.str.extract(r"(\d+)\s*год", expand=False)
+    long = _long_numbers(t)
+    hit = m.notna().to_numpy() & ~long
+    age[hit] = _ints(m[hit]).astype(object)
+    return _redo_scalar(ser, long, _parse_gender_age, (gender.astype(object), age))
+
+
+def _parse_salary_vec(ser: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    t = _lower_vec(ser)
+    n = len(t)
+    skip = (t == "").to_numpy() | _contains(t, "не указ") | _contains(t, "договор")
+
+    # first matching key in _CURRENCY_MAP order wins, as in the scalar loop
+    currency = np.select(
+        [_contains(t, k) for k in _CURRENCY_MAP],
+        list(_CURRENCY_MAP.values()),
+        default=None,
+    )
+
+    nums = t.str.extract(r"^\D*(\d+)(?:\D+(\d+))?")
+    long = _long_numbers(t) & ~skip
+    has_num = nums[0].notna().to_numpy() & ~skip & ~long
+    has_two = nums[1].notna().to_numpy() & has_num
+
+    first = np.zeros(n, dtype=np.int64)
+    first[has_num] = _ints(nums.loc[has_num, 0])
+    second = np.zeros(n, dtype=np.int64)
+    second[has_two] = _ints(nums.loc[has_two, 1])
+
+    use_mean = has_two & ~_contains(t, "от") & ~_contains(t, "до")
+    # both bounds are below 10**17, so the sum cannot wrap around.
+    # round() on a float is round-half-even, same as np.rint
+    mean = np.rint((first + second).astype(np.float64) / 2).astype(np.int64)
+
+    value = np.full(n, None, dtype=object)
+    value[has_num] = np.where(use_mean, mean, first)[has_num].astype(object)
+
+    currency = np.where(has_num & pd.isna(currency), "RUB", currency).astype(object)
+    currency[skip] = None
+    return _redo_scalar(ser, long, _parse_salary, (value, currency))
+
+
+def _parse_city_flags_vec(ser: pd.Series) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    t = _clean_text_vec(ser)
+    # first comma-separated part that is not blank, stripped
+    city = t.str.extract(r"^(?:\s*,)*\s*([^,]*[^,\s])", expand=False)
+    city = city.astype(object).where(city.notna(), None).to_numpy()
+
+    tl = t.str.lower()
+    relocation = np.select(
+        [_contains(tl, "готов к переезду"), _contains(tl, "не готов к переезду")],
+        [True, False],
+        default=None,
+    )
+    trips = np.select(
+        [_contains(tl, "готов к командировкам"), _contains(tl, "не готов к командировкам")],
+        [True, False],
+        default=None,
+    )
+    return city, relocation, trips
+
+
+def _parse_total_experience_months_vec(ser: pd.Series) -> np.ndarray:
+    t = _lower_vec(ser)
+    m = t.str.extract(r"опыт работы\s+(\d+)\s*лет?\s*(\d+)?\s*(месяц|мес)?")
+    long = _long_numbers(t)
+    hit = m[0].notna().to_numpy() & ~long
+    has_months = m[1].notna().to_numpy() & hit
+
+    months = np.zeros(len(t), dtype=np.int64)
+    months[hit] = _ints(m.loc[hit, 0]) * 12
+    months[has_months] += _ints(m.loc[has_months, 1])
+
+    out = np.full(len(t), None, dtype=object)
+    out[hit] = months[hit].astype(object)
+    return _redo_scalar(ser, long, _parse_total_experience_months, out)
+
+
+def _education_level_vec(ser: pd.Series) -> np.ndarray:
+    t = _lower_vec(ser)
+    return np.select(
+        [
+            (t == "").to_numpy() | _contains(t, "не указ"),
+            _contains(t, "высшее"),
+            _contains(t, "среднее специальное"),
+            _contains(t, "среднее"),
+        ],
+        [None, "higher", "secondary_special", "secondary"],
+        default="other",
+    )
+
+
+def _has_car_vec(ser: pd.Series) -> np.ndarray:
+    t = _lower_vec(ser)
+    return np.select(
+        [
+            (t == "").to_numpy() | _contains(t, "не указ"),
+            _contains(t, "имеется") | _contains(t, "собственн"),
+        ],
+        [None, True],
+        default=False,
+    )
+
+
+def _expand_categorical(ser: pd.Series, fn: Callable[[str], Any]) -> np.ndarray:
+    """fn(_to_str(v)) for every value of a categorical series, calling fn once per category."""
+    cat = ser.array
+    per_code = np.empty(len(cat.categories) + 1, dtype=object)
+    per_code[:-1] = [fn(_to_str(c)) for c in cat.categories]
+    per_code[-1] = fn("")  # code -1 (NA)
+    return per_code[cat.codes]
+
+
+def _empty_result(scalar: Callable[[str], Any]) -> Any:
+    """Zero-row result shaped like `scalar`'s output: an object array, or a tuple of
+    them when the parser returns several fields."""
+    sample = scalar("")
+    if isinstance(sample, tuple):
+        return tuple(np.empty(0, dtype=object) for _ in sample)
+    return np.empty(0, dtype=object)
+
+
+def _parse_unique(
+    ser: pd.Series,
+    scalar: Callable[[str], Any],
+    vec: Optional[Callable[[pd.Series], Any]],
+    cache: ParseCache,
+) -> Any:
+    """Factorize `ser`, parse only values missing from `cache`, broadcast back by code.
+
+    Returns the same shape as `vec` (an object array, or a tuple of them).
+    """
+    codes, uniques = pd.factorize(ser, use_na_sentinel=False)
+    if len(uniques) == 0:
+        return vec(ser) if vec is not None else _empty_result(scalar)
+
+    key = scalar.__name__
+    texts = [_to_str(u) for u in uniques]
+    results: list[Any] = [None] * len(texts)
+    missing: list[int] = []
+    for i, text in enumerate(texts):
+        found, value = cache.get(key, text)
+        if found:
+            results[i] = value
+        else:
+            missing.append(i)
+
+    if missing:
+        todo = [texts[i] for i in missing]
+        if vec is not None:
+            parsed = vec(pd.Series(todo, dtype=object))
+            parsed = list(zip(*parsed)) if isinstance(parsed, tuple) else list(parsed)
+        else:
+            parsed = [scalar(t) for t in todo]
+        for i, value in zip(missing, parsed):
+            results[i] = value
+            cache.put(key, texts[i], value)
+
+    fields = _empty_result(scalar)
+    if isinstance(fields, tuple):
+        return tuple(np.array([r[k] for r in results], dtype=object)[codes] for k in range(len(fields)))
+    per_unique = np.empty(len(results), dtype=object)
+    per_unique[:] = results
+    return per_unique[codes]
+
+
+def _parse_values(
+    ser: pd.Series,
+    scalar: Callable[[str], Any],
+    vec: Callable[[pd.Series], Any],
+    vectorized: bool,
+    cache: Optional[ParseCache],
+) -> Any:
+    if cache is not None:
+        return _parse_unique(ser, scalar, vec if vectorized else None, cache)
+    return vec(ser)
+
+
+# candidate formats of `Обновление резюме` (HH exports use the first one), day first
+_DATE_FORMATS = (
+    "%d.%m.%Y %H:%M",
+    "%d.%m.%Y %H:%M:%S",
+    "%d.%m.%Y",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%d",
+    "%d/%m/%Y %H:%M",
+    "%d/%m/%Y",
+)
+
+
+def _detect_date_format(texts: pd.Series, min_share: float = 0.5) -> Optional[str]:
+    """The candidate format parsing the most of `texts` (at least `min_share`), or None."""
+    texts = texts[texts != ""]
+    if texts.empty:
+        return None
+    best, best_ok = None, 0
+    for fmt in _DATE_FORMATS:
+        ok = int(pd.to_datetime(texts, format=fmt, errors="coerce").notna().sum())
+        if ok > best_ok:
+            best, best_ok = fmt, ok
+    return best if best_ok >= min_share * len(texts) else None
+
+
+_FIELD_WIDTHS = {"%d": 2, "%m": 2, "%Y": 4, "%H": 2, "%M": 2, "%S": 2}
+
+
+def _fixed_layout(fmt: str) -> Optional[list[tuple[str, int, int]]]:
+    """[(field or literal, start, width)] for formats made of fixed-width numeric fields
+    and one-character literals; None for anything else."""
+    layout, pos, i = [], 0, 0
+    while i < len(fmt):
+        tok = fmt[i : i + 2]
+        if tok in _FIELD_WIDTHS:
+            layout.append((tok, pos, _FIELD_WIDTHS[tok]))
+            pos += _FIELD_WIDTHS[tok]
+            i += 2
+        elif fmt[i] == "%":
+            return None
+        else:
+            layout.append((fmt[i], pos, 1))
+            pos += 1
+            i += 1
+    return layout
+
+
+def _parse_fixed(texts: np.ndarray, layout: list[tuple[str, int, int]]) -> tuple[np.ndarray, np.ndarray]:
+    """Vectorized strptime for a fixed-width numeric layout: (datetime64[us] values, ok mask).
+
+    Characters are compared as code points, digits combined arithmetically; values of
+    the wrong length, with non-digits or out-of-range fields are not ok.
+    """
+    width = layout[-1][1] + layout[-1][2]
+    n = len(texts)
+    out = np.full(n, np.datetime64("NaT"), dtype="datetime64[us]")
+    arr = texts.astype(str)
+    ok = np.char.str_len(arr) == width if n else np.zeros(0, dtype=bool)
+    if not ok.any():
+        return out, ok
+    chars = arr[ok].astype(f"U{width}").view(np.uint32).reshape(-1, width)
+    good = np.ones(len(chars), dtype=bool)
+    # fields missing from the format default like strptime: 1900-01-01 00:00:00
+    defaults = {"%Y": 1900, "%m": 1, "%d": 1}
+    fields = {tok: np.full(len(chars), defaults.get(tok, 0), dtype=np.int64) for tok in _FIELD_WIDTHS}
+    for tok, start, w in layout:
+        if tok in _FIELD_WIDTHS:
+            digits = chars[:, start : start + w].astype(np.int64) - ord("0")
+            good &= ((digits >= 0) & (digits <= 9)).all(axis=1)
+            value = np.zeros(len(chars), dtype=np.int64)
+            for k in range(w):
+                value = value * 10 + digits[:, k]
+            fields[tok] = value
+        else:
+            good &= chars[:, start] == ord(tok)
+    year, month, day = fields["%Y"], fields["%m"], fields["%d"]
+    good &= (month >= 1) & (month <= 12) & (day >= 1) & (fields["%H"] < 24) & (fields["%M"] < 60) & (fields["%S"] < 60)
+    month_start = ((year - 1970) * 12 + np.clip(month, 1, 12) - 1).astype("datetime64[M]")
+    days_in_month = ((month_start + 1).astype("datetime64[D]") - month_start.astype("datetime64[D]")).astype(np.int64)
+    good &= day <= days_in_month
+    seconds = fields["%H"] * 3600 + fields["%M"] * 60 + fields["%S"]
+    values = month_start.astype("datetime64[D]") + (day - 1).astype("timedelta64[D]")
+    values = values.astype("datetime64[us]") + (seconds * 1_000_000).astype("timedelta64[us]")
+    values[~good] = np.datetime64("NaT")
+    idx = np.flatnonzero(ok)
+    out[idx] = values
+    ok[idx] = good
+    return out, ok
+
+
+@dataclass
+class DateParser:
+    """Day-first datetime parsing for a whole run.
+
+    The format is detected once, on a sample of the first chunk's distinct values, and
+    then used as an exact-format fast path (vectorized digit arithmetic for fixed-width
+    numeric formats); only values it fails on fall back to pd.to_datetime inference, one
+    by one. Each chunk parses its distinct values only, and up to `cache_size` parsed
+    values are kept across chunks and passes. Same results as
+    pd.to_datetime(ser, errors="coerce", dayfirst=True) on single-format day-first
+    columns. Two differences: on mixed columns, values in another format are parsed by
+    the fallback where that call (one inferred format for the column) gives NaT; and
+    ISO (%Y-%m-%d) columns are read as written, where dayfirst=True swaps day and month.
+    """
+
+    format: Optional[str] = None
+    cache_size: int = 200_000
+    sample_size: int = 1_000
+    detected: bool = False
+    fallbacks: int = 0
+    hits: int = 0
+    misses: int = 0
+    _known: pd.Index = field(default_factory=lambda: pd.Index([], dtype=object), repr=False)
+    _known_values: np.ndarray = field(default_factory=lambda: np.empty(0, dtype="datetime64[us]"), repr=False)
+
+    def __call__(self, ser: pd.Series) -> pd.Series:
+        codes, uniques = pd.factorize(ser)
+        # uniques hold no NA (code -1)
+        texts = np.asarray(pd.Index(uniques).astype(str), dtype=object)
+        if not self.detected:
+            self.format = self.format or _detect_date_format(pd.Series(texts[: self.sample_size], dtype=object))
+            self.detected = True
+
+        per_unique = np.empty(len(texts) + 1, dtype="datetime64[us]")
+        per_unique[-1] = np.datetime64("NaT")  # code -1 (NA)
+        pos = self._known.get_indexer(pd.Index(texts, dtype=object)) if len(self._known) else np.full(len(texts), -1)
+        found = pos >= 0
+        per_unique[:-1][found] = self._known_values[pos[found]]
+        missing = np.flatnonzero(~found)
+        self.hits += int(found.sum())
+        self.misses += len(missing)
+        if len(missing):
+            parsed = self._parse(texts[missing])
+            per_unique[missing] = parsed
+            self._remember(texts[missing], parsed)
+        return pd.Series(per_unique[codes], index=ser.index)
+
+    def _remember(self, texts: np.ndarray, values: np.ndarray) -> None:
+        if self.cache_size <= 0:
+            return
+        if len(self._known) + len(texts) > self.cache_size:
+            # bounded: start over rather than track recency per value
+            self._known = pd.Index([], dtype=object)
+            self._known_values = np.empty(0, dtype="datetime64[us]")
+            texts, values = texts[: self.cache_size], values[: self.cache_size]
+        self._known = self._known.append(pd.Index(texts, dtype=object))
+        self._known_values = np.concatenate([self._known_values, values])
+
+    def _parse(self, texts: np.ndarray) -> np.ndarray:
+        if self.format is None:
+            return pd.to_datetime(pd.Series(texts, dtype=object), errors="coerce", dayfirst=True).to_numpy(
+                dtype="datetime64[us]"
+            )
+        layout = _fixed_layout(self.format)
+        if layout is not None:
+            out, ok = _parse_fixed(texts, layout)
+        else:
+            out = pd.to_datetime(pd.Series(texts, dtype=object), format=self.format, errors="coerce").to_numpy(
+                dtype="datetime64[us]"
+            )
+            ok = ~np.isnat(out)
+        retry = np.flatnonzero(~ok & (texts != ""))
+        for i in retry:
+            ts = pd.to_datetime(texts[i], errors="coerce", dayfirst=True)
+            out[i] = np.datetime64("NaT") if pd.isna(ts) else ts.to_datetime64()
+        self.fallbacks += len(retry)
+        return out
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "format": self.format,
+            "fallbacks": self.fallbacks,
+            "cached": len(self._known),
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+        }
+
+
 @dataclass
 class NormalizeColumnsHandler(BaseHandler):
     def handle(self, ctx: PipelineContext) -> PipelineContext:
-        df = ctx.df.copy()
+        df = self.frame(ctx)
         drop_cols = [c for c in df.columns if not str(c).strip() or str(c).lower().startswith("unnamed")]
         if drop_cols:
-            df = df.drop(columns=drop_cols)
+            df.drop(columns=drop_cols, inplace=True)
         df.columns = [str(c).strip() for c in df.columns]
         ctx.df = df
         return super().handle(ctx)
@@ -164,91 +593,207 @@ class NormalizeColumnsHandler(BaseHandler):
 @dataclass
 class CleanTextColumnsHandler(BaseHandler):
     columns: Iterable[str]
+    vectorized: bool = False
+
+    @property
+    def requires(self) -> tuple[str, ...]:  # type: ignore[override]
+        return tuple(self.columns)
+
+    @property
+    def produces(self) -> tuple[str, ...]:  # type: ignore[override]
+        return tuple(self.columns)
 
     def handle(self, ctx: PipelineContext) -> PipelineContext:
-        df = ctx.df.copy()
+        df = self.frame(ctx)
         for col in self.columns:
             if col in df.columns:
-                df[col] = df[col].map(_to_str).map(_clean_text)
+                if isinstance(df[col].dtype, pd.CategoricalDtype):
+                    # compact-dtype reads: clean each category once, then expand
+                    df[col] = _from_values(_expand_categorical(df[col], _clean_text), df.index)
+                elif self.vectorized:
+                    df[col] = _from_values(_clean_text_vec(df[col]).to_numpy(), df.index)
+                else:
+                    df[col] = df[col].map(_to_str).map(_clean_text)
         ctx.df = df
         return super().handle(ctx)
 
 
+@dataclass
 class ParseGenderAgeHandler(BaseHandler):
+    requires: ClassVar[tuple[str, ...]] = ("Пол, возраст",)
+    produces: ClassVar[tuple[str, ...]] = ("gender", "age")
+
+    vectorized: bool = False
+    cache: Optional[ParseCache] = None
+
     def handle(self, ctx: PipelineContext) -> PipelineContext:
-        df = ctx.df.copy()
-        col = "Пол, возраст"
+        df = self.frame(ctx)
+        col = self.requires[0]
         if col in df.columns:
-            parsed = df[col].map(_to_str).map(_parse_gender_age)
-            df["gender"] = parsed.map(lambda x: x[0])
-            df["age"] = parsed.map(lambda x: x[1])
+            if self.vectorized or self.cache is not None:
+                gender, age = _parse_values(
+                    df[col], _parse_gender_age, _parse_gender_age_vec, self.vectorized, self.cache
+                )
+                df["gender"] = _from_values(gender, df.index)
+                df["age"] = _from_values(age, df.index)
+            else:
+                parsed = df[col].map(_to_str).map(_parse_gender_age)
+                df["gender"] = parsed.map(lambda x: x[0])
+                df["age"] = parsed.map(lambda x: x[1])
         ctx.df = df
         return super().handle(ctx)
 
 
+@dataclass
 class ParseSalaryHandler(BaseHandler):
+    requires: ClassVar[tuple[str, ...]] = ("ЗП",)
+    produces: ClassVar[tuple[str, ...]] = ("salary_value", "salary_currency", "salary_rub")
+
+    vectorized: bool = False
+    cache: Optional[ParseCache] = None
+
     def handle(self, ctx: PipelineContext) -> PipelineContext:
-        df = ctx.df.copy()
-        col = "ЗП"
+        df = self.frame(ctx)
+        col = self.requires[0]
         if col in df.columns:
-            parsed = df[col].map(_to_str).map(_parse_salary)
-            df["salary_value"] = parsed.map(lambda x: x[0])
-            df["salary_currency"] = parsed.map(lambda x: x[1])
+            if self.vectorized or self.cache is not None:
+                value, currency = _parse_values(
+                    df[col], _parse_salary, _parse_salary_vec, self.vectorized, self.cache
+                )
+                df["salary_value"] = _from_values(value, df.index)
+                df["salary_currency"] = _from_values(currency, df.index)
+            else:
+                parsed = df[col].map(_to_str).map(_parse_salary)
+                df["salary_value"] = parsed.map(lambda x: x[0])
+                df["salary_currency"] = parsed.map(lambda x: x[1])
             df["salary_rub"] = df["salary_value"].where(df["salary_currency"].fillna("RUB") == "RUB", other=pd.NA)
         ctx.df = df
         return super().handle(ctx)
 
 
+@dataclass
 class ParseCityHandler(BaseHandler):
+    requires: ClassVar[tuple[str, ...]] = ("Город",)
+    produces: ClassVar[tuple[str, ...]] = ("city", "relocation_ready", "business_trips_ready")
+
+    vectorized: bool = False
+    cache: Optional[ParseCache] = None
+
     def handle(self, ctx: PipelineContext) -> PipelineContext:
-        df = ctx.df.copy()
-        col = "Город"
+        df = self.frame(ctx)
+        col = self.requires[0]
         if col in df.columns:
-            parsed = df[col].map(_to_str).map(_parse_city_flags)
-            df["city"] = parsed.map(lambda x: x[0])
-            df["relocation_ready"] = parsed.map(lambda x: x[1])
-            df["business_trips_ready"] = parsed.map(lambda x: x[2])
+            if self.vectorized or self.cache is not None:
+                city, relocation, trips = _parse_values(
+                    df[col], _parse_city_flags, _parse_city_flags_vec, self.vectorized, self.cache
+                )
+                df["city"] = _from_values(city, df.index)
+                df["relocation_ready"] = _from_values(relocation, df.index)
+                df["business_trips_ready"] = _from_values(trips, df.index)
+            else:
+                parsed = df[col].map(_to_str).map(_parse_city_flags)
+                df["city"] = parsed.map(lambda x: x[0])
+                df["relocation_ready"] = parsed.map(lambda x: x[1])
+                df["business_trips_ready"] = parsed.map(lambda x: x[2])
         ctx.df = df
         return super().handle(ctx)
 
 
+@dataclass
 class ParseExperienceHandler(BaseHandler):
+    requires: ClassVar[tuple[str, ...]] = ("Опыт (двойное нажатие для полной версии)",)
+    produces: ClassVar[tuple[str, ...]] = ("experience_total_months",)
+
+    vectorized: bool = False
+
     def handle(self, ctx: PipelineContext) -> PipelineContext:
-        df = ctx.df.copy()
-        col = "Опыт (двойное нажатие для полной версии)"
+        df = self.frame(ctx)
+        col = self.requires[0]
         if col in df.columns:
-            df["experience_total_months"] = df[col].map(_to_str).map(_parse_total_experience_months)
+            if self.vectorized:
+                months = _parse_total_experience_months_vec(df[col])
+                df["experience_total_months"] = _from_values(months, df.index)
+            else:
+                df["experience_total_months"] = df[col].map(_to_str).map(_parse_total_experience_months)
         ctx.df = df
         return super().handle(ctx)
 
 
+@dataclass
 class ParseEducationHandler(BaseHandler):
+    requires: ClassVar[tuple[str, ...]] = ("Образование и ВУЗ",)
+    produces: ClassVar[tuple[str, ...]] = ("education_level",)
+
+    vectorized: bool = False
+    cache: Optional[ParseCache] = None
+
     def handle(self, ctx: PipelineContext) -> PipelineContext:
-        df = ctx.df.copy()
-        col = "Образование и ВУЗ"
+        df = self.frame(ctx)
+        col = self.requires[0]
         if col in df.columns:
-            df["education_level"] = df[col].map(_to_str).map(_education_level)
+            if self.vectorized or self.cache is not None:
+                level = _parse_values(
+                    df[col], _education_level, _education_level_vec, self.vectorized, self.cache
+                )
+                df["education_level"] = _from_values(level, df.index)
+            else:
+                df["education_level"] = df[col].map(_to_str).map(_education_level)
         ctx.df = df
         return super().handle(ctx)
 
 
+@dataclass
 class ParseCarHandler(BaseHandler):
+    requires: ClassVar[tuple[str, ...]] = ("Авто",)
+    produces: ClassVar[tuple[str, ...]] = ("has_car",)
+
+    vectorized: bool = False
+    cache: Optional[ParseCache] = None
+
     def handle(self, ctx: PipelineContext) -> PipelineContext:
-        df = ctx.df.copy()
-        col = "Авто"
+        df = self.frame(ctx)
+        col = self.requires[0]
         if col in df.columns:
-            df["has_car"] = df[col].map(_to_str).map(_has_car)
+            if self.vectorized or self.cache is not None:
+                has_car = _parse_values(df[col], _has_car, _has_car_vec, self.vectorized, self.cache)
+                df["has_car"] = _from_values(has_car, df.index)
+            else:
+                df["has_car"] = df[col].map(_to_str).map(_has_car)
         ctx.df = df
         return super().handle(ctx)
 
 
 @dataclass
 class SelectXYHandler(BaseHandler):
+    FEATURES: ClassVar[tuple[str, ...]] = (
+        "gender",
+        "age",
+        "city",
+        "relocation_ready",
+        "business_trips_ready",
+        "Занятость",
+        "График",
+        "experience_total_months",
+        "education_level",
+        "has_car",
+        "Ищет работу на должность:",
+        "Последенее/нынешнее место работы",
+        "Последеняя/нынешняя должность",
+        "Обновление резюме",
+    )
+
     target: str
     drop_missing_target: bool = False
+    # parses "Обновление резюме"; one instance (detected format, cache) per run
+    dates: DateParser = field(default_factory=DateParser)
+
+    @property
+    def requires(self) -> tuple[str, ...]:  # type: ignore[override]
+        return self.FEATURES + (self.target,)
 
     def handle(self, ctx: PipelineContext) -> PipelineContext:
-        df = ctx.df.copy()
+        # read-only here: X and y get their own frames below
+        df = ctx.df
 
         if self.target not in df.columns:
             raise KeyError(
@@ -258,27 +803,11 @@ class SelectXYHandler(BaseHandler):
         y = df[self.target]
         if self.drop_missing_target:
             mask = ~y.isna()
-            df = df.loc[mask].copy()
+            df = df.loc[mask].copy(deep=not ctx.copy_free)
             y = y.loc[mask]
 
-        keep = [
-            "gender",
-            "age",
-            "city",
-            "relocation_ready",
-            "business_trips_ready",
-            "Занятость",
-            "График",
-            "experience_total_months",
-            "education_level",
-            "has_car",
-            "Ищет работу на должность:",
-            "Последенее/нынешнее место работы",
-            "Последеняя/нынешняя должность",
-            "Обновление резюме",
-        ]
-        features = [c for c in keep if c in df.columns]
-        X = df[features].copy()
+        features = [c for c in self.FEATURES if c in df.columns]
+        X = df[features].copy(deep=not ctx.copy_free)
 
         # Normalize multi-valued strings
         for c in ("Занятость", "График"):
@@ -286,13 +815,72 @@ class SelectXYHandler(BaseHandler):
                 X[c] = X[c].astype("string").str.lower().str.replace(r"\s+", " ", regex=True).str.strip()
 
         if "Обновление резюме" in X.columns:
-            X["resume_updated_at"] = pd.to_datetime(
-                X["Обновление резюме"],
-                errors="coerce",
-                dayfirst=True,
-            )
+            X["resume_updated_at"] = self.dates(X["Обновление резюме"])
             X = X.drop(columns=["Обновление резюме"])
 
         ctx.X = X
         ctx.y = y.rename(self.target)
         return super().handle(ctx)
+
+
+@dataclass
+class HashTokensHandler(BaseHandler):
+    """Bag of hashed word tokens of free-text columns of ctx.X, as ctx.tokens (CSR).
+
+    Each lower-cased \\w+ token of the j-th column goes to feature
+    hash("j:token") % n_features, with its count in the row as the value. Runs after
+    SelectXYHandler so rows line up with ctx.X; a chunk costs memory in proportion to
+    its tokens, not to the vocabulary. Skipped on fit-only passes.
+    """
+
+    columns: tuple[str, ...] = (
+        "Ищет работу на должность:",
+        "Последенее/нынешнее место работы",
+        "Последеняя/нынешняя должность",
+    )
+    n_features: int = 1 << 20
+
+    def __post_init__(self) -> None:
+        if not 0 < self.n_features <= np.iinfo(np.int32).max:
+            raise ValueError(f"n_features must be in [1, 2**31), got {self.n_features}")
+
+    def handle(self, ctx: PipelineContext) -> PipelineContext:
+        if ctx.X is not None and not ctx.notes.get("fit_only"):
+            ctx.tokens = self.transform(ctx.X)
+        return super().handle(ctx)
+
+    def transform(self, X: pd.DataFrame) -> CsrChunk:
+        n = len(X)
+        rows_parts: list[np.ndarray] = []
+        feat_parts: list[np.ndarray] = []
+        for j, col in enumerate(self.columns):
+            if col not in X.columns:
+                continue
+            tokens = X[col].astype("string").str.lower().str.findall(_TOKEN_RE)
+            # one entry per token, indexed by row position
+            tokens = pd.Series(tokens.to_numpy(dtype=object), index=np.arange(n)).explode().dropna()
+            if tokens.empty:
+                continue
+            # hash each distinct token once
+            codes, uniques = pd.factorize(tokens.to_numpy(dtype=object))
+            keys = np.array([f"{j}:{t}" for t in uniques], dtype=object)
+            feats = (pd.util.hash_array(keys, categorize=False) % np.uint64(self.n_features)).astype(np.int64)
+            rows_parts.append(tokens.index.to_numpy(dtype=np.int64))
+            feat_parts.append(feats[codes])
+
+        if rows_parts:
+            # (row, feature) pairs -> counts, sorted by row then feature
+            keys, counts = np.unique(
+                np.concatenate(rows_parts) * self.n_features + np.concatenate(feat_parts), return_counts=True
+            )
+            rows, indices = np.divmod(keys, self.n_features)
+        else:
+            rows = indices = counts = np.empty(0, dtype=np.int64)
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+        return CsrChunk(
+            indptr=indptr,
+            indices=indices.astype(np.int32),
+            data=counts.astype(np.float32),
+            n_features=self.n_features,
+        )
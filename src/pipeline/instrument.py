@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import csv
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, Optional
+
+import pandas as pd
+
+if TYPE_CHECKING:
+    from .base import BaseHandler, PipelineContext
+
+
+@dataclass
+class StageRecord:
+    """One stage (a handler, the reader, the writer, ...) on one chunk."""
+
+    phase: str
+    chunk: int
+    stage: str
+    seconds: float
+    rows_in: int
+    rows_out: int
+    alloc_bytes: Optional[int] = None
+    null_rates: dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class Instrumentation:
+    """Per-chunk timings, row counts, allocations and null rates of every stage.
+
+    Handlers report through BaseHandler.handle: a handler's own work is everything
+    between the previous handler passing the context on and this one doing so, so
+    the chain needs no wrapping. `trace_alloc` turns on tracemalloc and records the
+    peak bytes allocated by each stage (slow; off by default).
+    """
+
+    trace_alloc: bool = False
+    phase: str = "run"
+    records: list[StageRecord] = field(default_factory=list)
+    _chunk: int = field(default=-1, repr=False)
+    _t0: float = field(default=0.0, repr=False)
+    _alloc0: int = field(default=0, repr=False)
+    _rows: int = field(default=0, repr=False)
+
+    def __post_init__(self) -> None:
+        if self.trace_alloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def set_phase(self, phase: str) -> None:
+        # chunk numbers restart with each phase; re-entering the same phase continues them
+        if phase != self.phase:
+            self.phase = phase
+            self._chunk = -1
+
+    def _mark(self) -> None:
+        if self.trace_alloc:
+            tracemalloc.reset_peak()
+            self._alloc0 = tracemalloc.get_traced_memory()[0]
+        self._t0 = time.perf_counter()
+
+    def _record(self, stage: str, rows_in: int, rows_out: int, null_rates: Optional[dict[str, float]] = None) -> None:
+        seconds = time.perf_counter() - self._t0
+        alloc = tracemalloc.get_traced_memory()[1] - self._alloc0 if self.trace_alloc else None
+        self.records.append(
+            StageRecord(self.phase, self._chunk, stage, seconds, rows_in, rows_out, alloc, null_rates or {})
+        )
+
+    # -- handlers ---------------------------------------------------------
+
+    def begin_chunk(self, ctx: "PipelineContext") -> None:
+        self._rows = len(ctx.df)
+        self._mark()
+
+    def handler_done(self, handler: "BaseHandler", ctx: "PipelineContext") -> None:
+        rows_out = len(ctx.X) if ctx.X is not None else len(ctx.df)
+        produced = [c for c in handler.produces if c in ctx.df.columns]
+        nulls = {c: float(ctx.df[c].isna().mean()) if len(ctx.df) else 0.0 for c in produced}
+        self._record(type(handler).__name__, self._rows, rows_out, nulls)
+        self._rows = rows_out
+        self._mark()
+
+    # -- reader / writer / encoder -----------------------------------------
+
+    def reader(self, chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """Yield `chunks`, timing each read; also numbers the chunks of the phase."""
+        it = iter(chunks)
+        try:
+            while True:
+                self._mark()
+                try:
+                    chunk = next(it)
+                except StopIteration:
+                    return
+                self._chunk += 1
+                self._record("read_csv", 0, len(chunk))
+                yield chunk
+        finally:
+            close = getattr(it, "close", None)
+            if close is not None:
+                close()
+
+    @contextmanager
+    def stage(self, name: str, rows: int) -> Iterator[None]:
+        self._mark()
+        yield
+        self._record(name, rows, rows)
+
+    # -- report -------------------------------------------------------------
+
+    def summary(self) -> list[dict[str, Any]]:
+        """Per (phase, stage) totals, in first-seen order, with each stage's share of the time."""
+        groups: dict[tuple[str, str], dict[str, Any]] = {}
+        for r in self.records:
+            g = groups.setdefault(
+                (r.phase, r.stage),
+                {"phase": r.phase, "stage": r.stage, "chunks": 0, "seconds": 0.0,
+                 "rows_in": 0, "rows_out": 0, "max_alloc_bytes": None, "_nulls": {}},
+            )
+            g["chunks"] += 1
+            g["seconds"] += r.seconds
+            g["rows_in"] += r.rows_in
+            g["rows_out"] += r.rows_out
+            if r.alloc_bytes is not None:
+                g["max_alloc_bytes"] = max(g["max_alloc_bytes"] or 0, r.alloc_bytes)
+            for col, rate in r.null_rates.items():
+                n, total = g["_nulls"].get(col, (0, 0.0))
+                g["_nulls"][col] = (n + r.rows_out, total + rate * r.rows_out)
+        total_s = sum(g["seconds"] for g in groups.values()) or 1.0
+        out = []
+        for g in groups.values():
+            nulls = g.pop("_nulls")
+            g["share"] = g["seconds"] / total_s
+            g["rows_per_s"] = (max(g["rows_in"], g["rows_out"]) / g["seconds"]) if g["seconds"] else 0.0
+            g["null_rates"] = {c: (t / n if n else 0.0) for c, (n, t) in nulls.items()}
+            out.append(g)
+        return out
+
+    def write_report(self, outdir: Path, extra: Optional[dict[str, Any]] = None) -> tuple[Path, Path]:
+        """run_report.json (summary + every record) and run_report.csv (one row per record)."""
+        json_path = outdir / "run_report.json"
+        csv_path = outdir / "run_report.csv"
+        payload = {**(extra or {}), "summary": self.summary(), "records": [asdict(r) for r in self.records]}
+        json_path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+        with open(csv_path, "w", encoding="utf-8", newline="") as fh:
+            w = csv.writer(fh)
+            w.writerow(["phase", "chunk", "stage", "seconds", "rows_in", "rows_out", "alloc_bytes", "null_rates"])
+            for r in self.records:
+                w.writerow([
+                    r.phase, r.chunk, r.stage, f"{r.seconds:.6f}", r.rows_in, r.rows_out,
+                    "" if r.alloc_bytes is None else r.alloc_bytes,
+                    json.dumps(r.null_rates, ensure_ascii=False) if r.null_rates else "",
+                ])
+        return json_path, csv_path
@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing.util import Finalize
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.encoding.encoders import FitState
+from src.io.readers import iter_csv_chunks
+from src.io.stats import RunningStats
+
+from .base import PipelineContext
+from .builder import build_pipeline
+from .pipeline import Pipeline
+
+# Per-process state, set up once by the pool initializer.
+_worker: dict[str, Any] = {}
+
+
+def _init_worker(pipeline_kwargs: dict[str, Any], extra: dict[str, Any]) -> None:
+    _worker.clear()
+    _worker["pipeline"] = build_pipeline(**pipeline_kwargs)
+    _worker.update(extra)
+    # runs when the worker process exits, i.e. before the pool's shutdown returns
+    Finalize(None, _flush_outputs, exitpriority=10)
+
+
+def _flush_outputs() -> None:
+    """msync the output memmaps once per worker; chunk writes only touch the mapping."""
+    for key in ("X", "y"):
+        arr = _worker.pop(key, None)
+        if arr is not None:
+            arr.flush()
+
+
+def _pipeline() -> Pipeline:
+    return _worker["pipeline"]
+
+
+def _fit_task(chunk: pd.DataFrame) -> tuple[int, Optional[list[str]], int, Optional[FitState]]:
+    """Parse one chunk and fit a FitState on it alone: (rows_in, columns, rows_kept, fit)."""
+    n_in = len(chunk)
+    ctx = _pipeline().process_chunk(chunk, fit_only=True)
+    if ctx.X is None or ctx.y is None:
+        return n_in, None, 0, None
+    columns = list(ctx.X.columns)
+    part = _pipeline().new_fit_state()
+    part.prune_sketches = False
+    part.init_columns(columns)
+    part.fit_chunk(ctx.X)
+    return n_in, columns, len(ctx.X), part
+
+
+def _fit_file_task(path: Path) -> tuple[int, Optional[list[str]], list[int], Optional[FitState]]:
+    """Read, parse and fit a whole file in the worker: (rows_in, columns, kept rows per chunk, fit).
+
+    Chunks are fitted in file order into one FitState, as a serial fit would."""
+    n_in = 0
+    columns: Optional[list[str]] = None
+    kept: list[int] = []
+    part: Optional[FitState] = None
+    for chunk in iter_csv_chunks(path, **_worker["read"]):
+        n_in += len(chunk)
+        ctx = _pipeline().process_chunk(chunk, fit_only=True)
+        if ctx.X is None or ctx.y is None:
+            kept.append(0)
+            continue
+        if part is None:
+            columns = list(ctx.X.columns)
+            part = _pipeline().new_fit_state()
+            part.prune_sketches = False
+            part.init_columns(columns)
+        part.fit_chunk(ctx.X)
+        kept.append(len(ctx.X))
+    return n_in, columns, kept, part
+
+
+def _write_rows(ctx: PipelineContext, offset: int) -> tuple[int, Optional[RunningStats]]:
+    """Encode ctx.X/ctx.y into the output memmaps at `offset`: (rows, chunk summary or None)."""
+    X_arr, y_arr = _worker["fit"].transform_chunk(ctx.X, ctx.y, feature_names=_worker["feature_names"])
+    if "X" not in _worker:
+        _worker["X"] = np.load(_worker["x_path"], mmap_mode="r+")
+        _worker["y"] = np.load(_worker["y_path"], mmap_mode="r+")
+    n = X_arr.shape[0]
+    _worker["X"][offset : offset + n, :] = X_arr
+    _worker["y"][offset : offset + n] = y_arr
+    stats: Optional[RunningStats] = _worker["stats"]
+    if stats is None:
+        return n, None
+    return n, stats.chunk({name: X_arr[:, j] for j, name in enumerate(stats.feature_names)}, y_arr)
+
+
+def _transform_task(chunk: pd.DataFrame, offset: int) -> tuple[int, Optional[RunningStats]]:
+    """Parse + encode one chunk and write it straight into the output memmaps at `offset`.
+
+    Returns the rows written and, when statistics are collected, the chunk's summary."""
+    ctx = _pipeline().process_chunk(chunk)
+    if ctx.X is None or ctx.y is None:
+        return 0, None
+    return _write_rows(ctx, offset)
+
+
+def _transform_file_task(path: Path, offset: int) -> tuple[list[int], list[RunningStats]]:
+    """Read, parse and encode a whole file in the worker, writing its rows from `offset` on.
+
+    Returns the rows written per chunk and the chunk summaries (when statistics are collected)."""
+    written: list[int] = []
+    summaries: list[RunningStats] = []
+    for chunk in iter_csv_chunks(path, **_worker["read"]):
+        ctx = _pipeline().process_chunk(chunk)
+        if ctx.X is None or ctx.y is None:
+            written.append(0)
+            continue
+        n, part = _write_rows(ctx, offset)
+        offset += n
+        written.append(n)
+        if part is not None:
+            summaries.append(part)
+    return written, summaries
+
+
+def _ordered(
+    pool: ProcessPoolExecutor,
+    fn: Callable[..., Any],
+    args: Iterable[tuple[Any, ...]],
+    max_inflight: int,
+) -> Iterator[Any]:
+    """Submit fn(*a) for each a, yielding results in submission order.
+
+    At most `max_inflight` chunks are pickled/queued at once, which bounds memory.
+    """
+    pending: deque[Future] = deque()
+    for a in args:
+        pending.append(pool.submit(fn, *a))
+        if len(pending) >= max_inflight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def parallel_fit(
+    chunks: Iterable[pd.DataFrame],
+    workers: int,
+    pipeline_kwargs: dict[str, Any],
+) -> tuple[FitState, list[str], list[int], int]:
+    """Pass 1 over a process pool.
+
+    Per-chunk FitStates are merged in chunk order, which yields exactly the codes a
+    serial fit would. Call fit.finalize() before encoding. Returns (fit, feature_names, kept rows per chunk, rows read).
+    """
+    fit = FitState(strategies=dict(pipeline_kwargs.get("encoding") or {}))
+    feature_names: Optional[list[str]] = None
+    kept_per_chunk: list[int] = []
+    total_in = 0
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(pipeline_kwargs, {})) as pool:
+        for n_in, columns, n_kept, part in _ordered(pool, _fit_task, ((c,) for c in chunks), 2 * workers):
+            total_in += n_in
+            kept_per_chunk.append(n_kept)
+            if part is None or columns is None:
+                continue
+            if feature_names is None:
+                feature_names = columns
+                fit.init_columns(feature_names)
+            fit.merge(part, columns)
+
+    if feature_names is None:
+        raise RuntimeError("No data produced by pipeline. Check input/filters/target parsing.")
+    return fit, feature_names, kept_per_chunk, total_in
+
+
+def parallel_fit_files(
+    paths: list[Path],
+    workers: int,
+    pipeline_kwargs: dict[str, Any],
+    read_options: dict[str, Any],
+) -> tuple[FitState, list[str], list[list[int]], int]:
+    """Pass 1 with one task per input file: workers read, parse and fit whole files.
+
+    Per-file FitStates are merged in file order, which gives the codes of a serial fit
+    over the files one after another. `read_options` are iter_csv_chunks keywords.
+    Returns (fit, feature_names, kept rows per chunk of each file, rows read).
+    """
+    fit = FitState(strategies=dict(pipeline_kwargs.get("encoding") or {}))
+    feature_names: Optional[list[str]] = None
+    kept_per_file: list[list[int]] = []
+    total_in = 0
+
+    extra = {"read": read_options}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(pipeline_kwargs, extra)) as pool:
+        for n_in, columns, kept, part in _ordered(pool, _fit_file_task, ((p,) for p in paths), workers):
+            total_in += n_in
+            kept_per_file.append(kept)
+            if part is None or columns is None:
+                continue
+            if feature_names is None:
+                feature_names = columns
+                fit.init_columns(feature_names)
+            fit.merge(part, columns)
+
+    if feature_names is None:
+        raise RuntimeError("No data produced by pipeline. Check input/filters/target parsing.")
+    return fit, feature_names, kept_per_file, total_in
+
+
+def parallel_transform(
+    chunks: Iterable[pd.DataFrame],
+    workers: int,
+    pipeline_kwargs: dict[str, Any],
+    fit: FitState,
+    feature_names: list[str],
+    kept_per_chunk: list[int],
+    x_path: Path,
+    y_path: Path,
+    stats: Optional[RunningStats] = None,
+) -> int:
+    """Pass 2 over a process pool: each worker writes its chunk at the offset from pass 1.
+
+    The output files must already exist with the final shape (see NpyWriter).
+    stats: workers summarize their chunks and the summaries are merged into it in chunk
+    order, as the serial run does.
+    """
+    offsets = np.concatenate([[0], np.cumsum(kept_per_chunk, dtype=np.int64)])
+    # workers only need the layout of the statistics, not what was accumulated so far
+    template = RunningStats(feature_names=stats.feature_names, categorical=stats.categorical) if stats else None
+    extra = {"fit": fit, "feature_names": feature_names, "x_path": x_path, "y_path": y_path, "stats": template}
+
+    def args() -> Iterator[tuple[pd.DataFrame, int]]:
+        for i, c in enumerate(chunks):
+            if i >= len(kept_per_chunk):
+                raise RuntimeError("Pass 2 read more chunks than pass 1")
+            yield c, int(offsets[i])
+
+    written = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(pipeline_kwargs, extra)) as pool:
+        for i, (n, part) in enumerate(_ordered(pool, _transform_task, args(), 2 * workers)):
+            if n != kept_per_chunk[i]:
+                raise RuntimeError(f"Chunk {i}: pass 2 produced {n} rows, pass 1 counted {kept_per_chunk[i]}")
+            if stats is not None and part is not None:
+                stats.merge(part)
+            written += n
+    return written
+
+
+def parallel_transform_files(
+    paths: list[Path],
+    workers: int,
+    pipeline_kwargs: dict[str, Any],
+    read_options: dict[str, Any],
+    fit: FitState,
+    feature_names: list[str],
+    kept_per_file: list[list[int]],
+    x_path: Path,
+    y_path: Path,
+    stats: Optional[RunningStats] = None,
+) -> int:
+    """Pass 2 with one task per input file: each file is written from its row offset
+    (the kept rows of the files before it in pass 1), chunk sizes are checked against
+    pass 1 and chunk summaries are merged into `stats` in file and chunk order."""
+    sizes = [sum(kept) for kept in kept_per_file]
+    offsets = np.concatenate([[0], np.cumsum(sizes, dtype=np.int64)])
+    template = RunningStats(feature_names=stats.feature_names, categorical=stats.categorical) if stats else None
+    extra = {
+        "read": read_options, "fit": fit, "feature_names": feature_names,
+        "x_path": x_path, "y_path": y_path, "stats": template,
+    }
+
+    written = 0
+    tasks = ((p, int(offsets[i])) for i, p in enumerate(paths))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(pipeline_kwargs, extra)) as pool:
+        for i, (per_chunk, parts) in enumerate(_ordered(pool, _transform_file_task, tasks, workers)):
+            if per_chunk != kept_per_file[i]:
+                raise RuntimeError(
+                    f"{paths[i]}: pass 2 produced {sum(per_chunk)} rows in {len(per_chunk)} chunks, "
+                    f"pass 1 counted {sizes[i]} in {len(kept_per_file[i])}"
+                )
+            if stats is not None:
+                for part in parts:
+                    stats.merge(part)
+            written += sum(per_chunk)
+    return written
@@ -1,14 +1,109 @@
 from __future__ import annotations
 
+from typing import Callable, Optional
+
 import pandas as pd
 
+from src.encoding.encoders import FitState
+from src.encoding.strategies import ColumnStrategy
+from src.io.budget import ChunkSizer, frame_nbytes
+
 from .base import PipelineContext, BaseHandler
+from .instrument import Instrumentation
 
 
 class Pipeline:
-    def __init__(self, first: BaseHandler) -> None:
+    """Runs a handler chain over chunks.
+
+    copy_free: hand the chunk itself to the handlers, which then add their columns
+    to it in place. The caller must not reuse the chunk afterwards.
+    instrumentation: when set, every handler reports its work on every chunk to it.
+    encoding: per-column ColumnStrategy for the FitStates made by new_fit_state().
+    chunk_sizer: when set, the peak footprint of every chunk (raw frame, handler copies,
+    X) is reported to it, so chunk sizes follow a memory budget.
+    rest: the handlers after the parse stage (from SelectXYHandler on). The chain from
+    `first` then ends before them, its output ctx.df can be handed to `parsed_sink`, and
+    process_chunk(parsed=True) runs only `rest` over an already parsed frame.
+    """
+
+    def __init__(
+        self,
+        first: BaseHandler,
+        copy_free: bool = False,
+        instrumentation: Optional[Instrumentation] = None,
+        encoding: Optional[dict[str, ColumnStrategy]] = None,
+        chunk_sizer: Optional[ChunkSizer] = None,
+        rest: Optional[BaseHandler] = None,
+    ) -> None:
         self._first = first
+        self._rest = rest
+        self.parsed_sink: Optional[Callable[[pd.DataFrame], None]] = None
+        self.copy_free = copy_free
+        self.instrumentation = instrumentation
+        self.encoding = dict(encoding or {})
+        self.chunk_sizer = chunk_sizer
+
+    def new_fit_state(self) -> FitState:
+        return FitState(strategies=dict(self.encoding))
+
+    def handlers(self) -> list[BaseHandler]:
+        return self.parse_handlers() + self._walk(self._rest)
+
+    def parse_handlers(self) -> list[BaseHandler]:
+        """The handlers of the parse stage (all of them when there is no `rest`)."""
+        return self._walk(self._first)
+
+    @staticmethod
+    def _walk(h: Optional[BaseHandler]) -> list[BaseHandler]:
+        out: list[BaseHandler] = []
+        while h is not None:
+            out.append(h)
+            h = getattr(h, "_next", None)
+        return out
+
+    def required_columns(self) -> list[str]:
+        """Source columns the chain reads that no earlier handler produces (for usecols)."""
+        required: list[str] = []
+        produced: set[str] = set()
+        for h in self.handlers():
+            for col in h.requires:
+                if col not in produced and col not in required:
+                    required.append(col)
+            produced.update(h.produces)
+        return required
+
+    def process_chunk(self, chunk: pd.DataFrame, fit_only: bool = False, parsed: bool = False) -> PipelineContext:
+        """Run the chain over one chunk. fit_only: the outputs only feed a fit (pass 1),
+        so handlers that merely produce extra outputs may skip their work.
+        parsed: `chunk` is a parse stage output (see `rest`); only `rest` runs."""
+        if parsed and self._rest is None:
+            raise ValueError("this pipeline has no separate parse stage")
+        if self.copy_free:
+            ctx = PipelineContext(df=chunk, copy_free=True)
+        else:
+            ctx = PipelineContext(raw=chunk, df=chunk.copy())
+        if fit_only:
+            ctx.notes["fit_only"] = True
+        if self.instrumentation is not None:
+            ctx.notes["instrumentation"] = self.instrumentation
+            self.instrumentation.begin_chunk(ctx)
+        n_in = len(chunk)
+        read_bytes = frame_nbytes(chunk) if self.chunk_sizer is not None else 0
+        if not parsed:
+            ctx = self._first.handle(ctx)
+            if self.parsed_sink is not None:
+                self.parsed_sink(ctx.df)
+        if self._rest is not None:
+            ctx = self._rest.handle(ctx)
+        if self.chunk_sizer is not None:
+            self.chunk_sizer.observe_pipeline(n_in, read_bytes, self._peak_bytes(ctx, read_bytes))
+        return ctx
 
-    def process_chunk(self, chunk: pd.DataFrame) -> PipelineContext:
-        ctx = PipelineContext(raw=chunk, df=chunk.copy())
-        return self._first.handle(ctx)
+    def _peak_bytes(self, ctx: PipelineContext, read_bytes: int) -> int:
+        """Most bytes held at once for a chunk: in copy mode the raw chunk plus two
+        generations of ctx.df (a handler copies it); in copy-free mode ctx.df alone; plus X."""
+        df_bytes = frame_nbytes(ctx.df)
+        peak = df_bytes if self.copy_free else read_bytes + 2 * df_bytes
+        if ctx.X is not None:
+            peak += frame_nbytes(ctx.X)
+        return peak
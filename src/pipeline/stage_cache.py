@@ -0,0 +1,302 @@
+from __future__ import annotations
+
+import hashlib
+import inspect
+import json
+import logging
+import shutil
+from dataclasses import fields, is_dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from .pipeline import Pipeline
+
+log = logging.getLogger("pipeline.stage_cache")
+
+_CACHE_VERSION = 2
+META_NAME = "meta.json"
+_SAMPLE_BYTES = 1 << 20
+_N_SAMPLES = 16
+
+
+def input_fingerprint(input_path: Path) -> dict[str, Any]:
+    """Size, mtime and a sha1 over the head, the tail and evenly spread blocks of the file."""
+    st = input_path.stat()
+    h = hashlib.sha1()
+    with open(input_path, "rb") as fh:
+        for i in range(_N_SAMPLES + 1):
+            fh.seek(max(0, (st.st_size - _SAMPLE_BYTES) * i // _N_SAMPLES))
+            h.update(fh.read(_SAMPLE_BYTES))
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sample_sha1": h.hexdigest()}
+
+
+def stage_version(pipeline: Pipeline, read_options: dict[str, Any]) -> str:
+    """Hash of what shapes the parse stage output: the handler classes, their settings
+    (parse caches aside), the source files they come from, and the CSV read options."""
+    h = hashlib.sha1(str(_CACHE_VERSION).encode())
+    sources: set[str] = set()
+    for handler in pipeline.parse_handlers():
+        cls = type(handler)
+        h.update(f"{cls.__module__}.{cls.__qualname__}".encode())
+        if is_dataclass(handler):
+            config = {f.name: getattr(handler, f.name) for f in fields(handler) if f.name != "cache"}
+            h.update(repr(sorted(config.items())).encode())
+        for c in cls.__mro__:
+            path = inspect.getsourcefile(c) if c.__module__.startswith("src.") else None
+            if path is not None:
+                sources.add(path)
+    for path in sorted(sources):
+        h.update(Path(path).read_bytes())
+    h.update(json.dumps(read_options, sort_keys=True, default=str).encode())
+    return h.hexdigest()[:16]
+
+
+class Uncacheable(ValueError):
+    """A column holds values the cache files cannot store without pickle."""
+
+
+def _pack_strings(values: list[str]) -> dict[str, np.ndarray]:
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return {"blob": np.frombuffer(b"".join(encoded), dtype=np.uint8), "offsets": offsets}
+
+
+def _unpack_strings(blob: np.ndarray, offsets: np.ndarray) -> list[str]:
+    raw = blob.tobytes()
+    bounds = offsets.tolist()
+    return [raw[a:b].decode("utf-8") for a, b in zip(bounds[:-1], bounds[1:])]
+
+
+# scalar types of object columns besides str: name -> (check, to text, from text)
+_SCALARS: dict[str, tuple[Callable[[Any], bool], Callable[[Any], str], Callable[[str], Any]]] = {
+    "bool": (lambda v: isinstance(v, (bool, np.bool_)), lambda v: "1" if v else "", bool),
+    "int": (lambda v: isinstance(v, (int, np.integer)), lambda v: str(int(v)), int),
+    "float": (lambda v: isinstance(v, (float, np.floating)), lambda v: repr(float(v)), float),
+    "none": (lambda v: v is None, lambda v: "", lambda text: None),
+}
+_SCALAR_NAMES = ["str", *_SCALARS]
+
+
+def _pack_values(values: np.ndarray) -> tuple[str, dict[str, np.ndarray]]:
+    """Distinct values of a column as utf-8 text ("str"), or as text plus a uint8 type
+    per value ("typed": str, bool, int of any size, float, None). Raises Uncacheable otherwise."""
+    if all(isinstance(v, str) for v in values):
+        return "str", _pack_strings(list(values))
+    kinds = np.zeros(len(values), dtype=np.uint8)
+    texts: list[str] = []
+    for i, v in enumerate(values):
+        if isinstance(v, str):
+            texts.append(v)
+            continue
+        for k, (check, to_text, _) in enumerate(_SCALARS.values(), start=1):
+            if check(v):
+                kinds[i] = k
+                texts.append(to_text(v))
+                break
+        else:
+            raise Uncacheable(f"cannot store a {type(v).__name__} value without pickle")
+    return "typed", {"kinds": kinds, **_pack_strings(texts)}
+
+
+def _unpack_values(kind: str, arrays: dict[str, np.ndarray]) -> np.ndarray:
+    texts = _unpack_strings(arrays["blob"], arrays["offsets"])
+    out = np.empty(len(texts), dtype=object)
+    if kind == "str":
+        out[:] = texts
+        return out
+    parse = [str] + [from_text for _, _, from_text in _SCALARS.values()]
+    for i, (k, text) in enumerate(zip(arrays["kinds"].tolist(), texts)):
+        out[i] = parse[k](text)
+    return out
+
+
+def _pack_column(ser: pd.Series) -> tuple[dict[str, Any], dict[str, np.ndarray]]:
+    """(meta, arrays) of one column, all plain numpy arrays (no pickle). Numeric, bool
+    and datetime columns are stored as they are; categories, text and other objects as
+    int32 codes into their distinct values, missing ones included (None and NaN stay
+    apart), see _pack_values."""
+    dtype = ser.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        values, packed = _pack_values(dtype.categories.to_numpy(dtype=object))
+        meta = {"kind": "category", "ordered": bool(dtype.ordered), "values": values}
+        return meta, {"codes": ser.cat.codes.to_numpy(dtype=np.int32), **packed}
+    if isinstance(dtype, np.dtype) and dtype.kind in "biufmM":
+        return {"kind": "array", "dtype": str(dtype)}, {"values": ser.to_numpy()}
+    if dtype != object and not isinstance(dtype, pd.StringDtype):
+        raise Uncacheable(f"cannot store dtype {dtype} without pickle")
+    codes, uniques = _factorize_keep_na(ser)
+    values, packed = _pack_values(uniques)
+    return {"kind": "codes", "dtype": str(dtype), "values": values}, {"codes": codes, **packed}
+
+
+def _is_none(values: np.ndarray) -> np.ndarray:
+    return np.frompyfunc(lambda v: v is None, 1, 1)(values).astype(bool)
+
+
+def _factorize_keep_na(ser: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """pd.factorize, except that missing values get codes of their own and None and NaN
+    (as object columns mix them) stay apart."""
+    codes, uniques = pd.factorize(ser, use_na_sentinel=True)
+    codes = codes.astype(np.int32)
+    uniques = list(np.asarray(uniques, dtype=object))
+    na_rows = np.flatnonzero(codes < 0)
+    if len(na_rows):
+        missing = ser.to_numpy(dtype=object)[na_rows]
+        none = _is_none(missing)
+        if none.any():
+            codes[na_rows[none]] = len(uniques)
+            uniques.append(None)
+        if not none.all():
+            other = missing[~none]
+            if len({type(v) for v in other}) > 1:
+                raise Uncacheable(f"mixed missing values {sorted({type(v).__name__ for v in other})}")
+            codes[na_rows[~none]] = len(uniques)
+            uniques.append(other[0])
+    out = np.empty(len(uniques), dtype=object)
+    out[:] = uniques
+    return codes, out
+
+
+def _unpack_column(meta: dict[str, Any], arrays: dict[str, np.ndarray], index: pd.Index, name: str) -> pd.Series:
+    if meta["kind"] == "array":
+        return pd.Series(arrays["values"], index=index, name=name, dtype=meta["dtype"])
+    uniques = _unpack_values(meta["values"], arrays)
+    if meta["kind"] == "category":
+        cat = pd.Categorical.from_codes(arrays["codes"], categories=uniques, ordered=meta["ordered"])
+        return pd.Series(cat, index=index, name=name)
+    values = uniques[arrays["codes"]]
+    return pd.Series(values, index=index, name=name, dtype=meta["dtype"])
+
+
+class ParsedStageCache:
+    """Parse stage outputs (ctx.df before SelectXYHandler) of one input file, on disk.
+
+    An entry is a directory under `root` named after the input, its fingerprint (size,
+    mtime, sampled sha1) and the stage version (see stage_version), holding one .npz per
+    chunk and meta.json. record() fills an entry during a full read of the CSV; once it
+    is complete, chunks() serves the parsed frames and runs skip reading and parsing.
+    Only the columns a later run can use are kept (see needed_columns).
+    """
+
+    def __init__(self, root: Path, input_path: Path, pipeline: Pipeline, read_options: dict[str, Any]) -> None:
+        self.pipeline = pipeline
+        self.fingerprint = input_fingerprint(input_path)
+        self.version = stage_version(pipeline, read_options)
+        self.dir = root / f"{input_path.name}-{self.fingerprint['sample_sha1'][:12]}-{self.version}"
+        self.meta_path = self.dir / META_NAME
+        self.meta: Optional[dict[str, Any]] = None
+        if self.meta_path.exists():
+            try:
+                self.meta = json.loads(self.meta_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError) as e:
+                log.warning("Ignoring unreadable %s: %s", self.meta_path, e)
+
+    def needed_columns(self) -> list[str]:
+        """What the rest of the chain reads, then the parsed columns it does not (other
+        targets); raw text columns that were only parsed are left out."""
+        parse = self.pipeline.parse_handlers()
+        raw = {c for h in parse for c in h.requires}
+        cols = [c for h in self.pipeline.handlers()[len(parse) :] for c in h.requires]
+        cols += [c for h in parse for c in h.produces if c not in raw]
+        return list(dict.fromkeys(cols))
+
+    @property
+    def ready(self) -> bool:
+        """A complete entry for this input and stage version that has every column needed."""
+        m = self.meta
+        if m is None or not m.get("complete") or m.get("input") != self.fingerprint:
+            return False
+        required = {c for h in self.pipeline.handlers()[len(self.pipeline.parse_handlers()) :] for c in h.requires}
+        missing = required - set(m["columns"])
+        if missing:
+            log.info("Parsed cache %s lacks %s; parsing again", self.dir, sorted(missing))
+            return False
+        return True
+
+    def chunks(self) -> Iterator[pd.DataFrame]:
+        """The cached parse stage output, chunk by chunk."""
+        assert self.meta is not None
+        n_rows = sum(c["rows"] for c in self.meta["chunks"])
+        log.info("Reading parsed chunks from %s (%s chunks, %s rows)", self.dir, len(self.meta["chunks"]), n_rows)
+        columns = self.meta["columns"]
+        for i, c in enumerate(self.meta["chunks"]):
+            col_meta = c["column_meta"]
+            with np.load(self.dir / f"chunk_{i:05d}.npz", allow_pickle=False) as data:
+                if c["start"] is None:
+                    index = pd.Index(data["index"])
+                else:
+                    index = pd.RangeIndex(c["start"], c["start"] + c["rows"])
+                series = {}
+                for j, name in enumerate(columns):
+                    arrays = {key.split("/", 1)[1]: data[key] for key in data.files if key.startswith(f"{j}/")}
+                    series[name] = _unpack_column(col_meta[j], arrays, index, name)
+            yield pd.DataFrame(series, index=index)
+
+    def record(self, chunks: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """Pass `chunks` (a full read of the CSV) through, storing the parse stage output
+        of each as the pipeline processes it. The entry is complete once `chunks` is.
+        A column that cannot be stored without pickle (see Uncacheable) drops the entry;
+        the run goes on and later runs parse the CSV again."""
+        if self.dir.exists():
+            shutil.rmtree(self.dir)
+        self.dir.mkdir(parents=True)
+        self.meta = None
+        state: dict[str, Any] = {"columns": None, "chunks": [], "dropped": False}
+        keep = self.needed_columns()
+
+        def pack(df: pd.DataFrame) -> tuple[dict[str, np.ndarray], list[dict[str, Any]], Optional[int]]:
+            arrays: dict[str, np.ndarray] = {}
+            column_meta: list[dict[str, Any]] = []
+            for j, name in enumerate(state["columns"]):
+                try:
+                    meta, packed = _pack_column(df[name])
+                except Uncacheable as e:
+                    raise Uncacheable(f"column {name!r}: {e}") from e
+                column_meta.append(meta)
+                arrays.update({f"{j}/{key}": arr for key, arr in packed.items()})
+            # the reader numbers rows on from chunk to chunk; anything else is kept as is
+            idx = df.index
+            start = idx.start if isinstance(idx, pd.RangeIndex) and idx.step == 1 else None
+            if start is None:
+                if idx.dtype.kind not in "biu":
+                    raise Uncacheable(f"cannot store a {idx.dtype} index without pickle")
+                arrays["index"] = idx.to_numpy()
+            return arrays, column_meta, start
+
+        def sink(df: pd.DataFrame) -> None:
+            if state["dropped"]:
+                return
+            if state["columns"] is None:
+                state["columns"] = [c for c in keep if c in df.columns]
+            try:
+                arrays, column_meta, start = pack(df)
+            except Uncacheable as e:
+                log.warning("Not caching the parse stage of this input: %s", e)
+                state["dropped"] = True
+                shutil.rmtree(self.dir, ignore_errors=True)
+                return
+            path = self.dir / f"chunk_{len(state['chunks']):05d}.npz"
+            np.savez(path, **arrays)
+            state["chunks"].append({"rows": len(df), "start": start, "column_meta": column_meta})
+
+        self.pipeline.parsed_sink = sink
+        try:
+            yield from chunks
+        finally:
+            self.pipeline.parsed_sink = None
+        if state["dropped"]:
+            return
+        self.meta = {
+            "version": _CACHE_VERSION,
+            "input": self.fingerprint,
+            "stage_version": self.version,
+            "columns": state["columns"] or [],
+            "chunks": state["chunks"],
+            "complete": True,
+        }
+        self.meta_path.write_text(json.dumps(self.meta, ensure_ascii=False), encoding="utf-8")
+        log.info("Parsed cache written: %s (%s chunks)", self.dir, len(state["chunks"]))
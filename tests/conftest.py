@@ -0,0 +1,30 @@
+"""Shared fixtures: a small synthetic input and an in-process app.main() runner."""
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+import app
+from benchmarks.synth import write_csv
+
+
+@pytest.fixture
+def hh_csv(tmp_path: Path) -> Path:
+    """A small synthetic HH export (300 records)."""
+    path = tmp_path / "hh.csv"
+    write_csv(path, rows=300, seed=1)
+    return path
+
+
+@pytest.fixture
+def run_app(monkeypatch: pytest.MonkeyPatch) -> Callable[..., int]:
+    """Run app.main() in-process with the given command-line arguments."""
+
+    def run(*argv: object) -> int:
+        monkeypatch.setattr(sys, "argv", ["app.py", "--loglevel", "WARNING", *map(str, argv)])
+        return app.main()
+
+    return run
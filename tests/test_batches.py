@@ -0,0 +1,98 @@
+"""iter_batches: the rows and codes of x_data.npy/y_data.npy in batches of the asked size;
+shuffled streams are seeded and hold every row exactly once."""
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.io.batching import rebatch
+from src.pipeline.batches import _shuffled, iter_batches
+
+
+@pytest.fixture
+def outputs(hh_csv: Path, tmp_path: Path, run_app) -> tuple[Path, np.ndarray, np.ndarray]:
+    out = tmp_path / "out"
+    run_app("-i", hh_csv, "-o", out)
+    return out, np.load(out / "x_data.npy"), np.load(out / "y_data.npy")
+
+
+def _rows(X: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Rows of X with y appended, sorted: the multiset of rows regardless of order."""
+    rows = np.column_stack([X, y])
+    return rows[np.lexsort(rows.T[::-1])]
+
+
+def _concat(batches) -> tuple[np.ndarray, np.ndarray]:
+    batches = list(batches)
+    return np.concatenate([X for X, _ in batches]), np.concatenate([y for _, y in batches])
+
+
+@pytest.mark.parametrize("fit_from", ["stream", "npz", "prefetch"])
+def test_in_order_batches_match_npy_outputs(hh_csv: Path, outputs, fit_from: str) -> None:
+    out, X_ref, y_ref = outputs
+    kwargs = dict(batch_size=64, chunksize=70)
+    if fit_from == "npz":
+        kwargs["fit_state"] = out / "fit_state.npz"
+    if fit_from == "prefetch":
+        kwargs["prefetch"] = 2
+    batches = list(iter_batches(hh_csv, **kwargs))
+    assert [len(X) for X, _ in batches[:-1]] == [64] * (len(batches) - 1)
+    assert 0 < len(batches[-1][0]) <= 64
+    X, y = _concat(batches)
+    assert X.dtype == np.float32 and y.dtype == np.float32
+    np.testing.assert_array_equal(X, X_ref)
+    np.testing.assert_array_equal(y, y_ref)
+
+
+def test_drop_last(hh_csv: Path, outputs) -> None:
+    _, X_ref, _ = outputs
+    batches = list(iter_batches(hh_csv, batch_size=64, chunksize=70, drop_last=True))
+    assert [len(X) for X, _ in batches] == [64] * (len(X_ref) // 64)
+
+
+@pytest.mark.parametrize("buffer", [1, 100, 10_000])
+def test_shuffle_is_seeded_and_keeps_every_row_once(hh_csv: Path, outputs, buffer: int) -> None:
+    _, X_ref, y_ref = outputs
+    run = lambda seed: list(iter_batches(hh_csv, batch_size=32, chunksize=70, shuffle_buffer=buffer, seed=seed))
+    first, again, other = run(0), run(0), run(1)
+    for (X1, y1), (X2, y2) in zip(first, again, strict=True):
+        np.testing.assert_array_equal(X1, X2)
+        np.testing.assert_array_equal(y1, y2)
+    X, y = _concat(first)
+    assert not np.array_equal(X, X_ref)
+    assert not np.array_equal(X, _concat(other)[0])
+    np.testing.assert_array_equal(_rows(X, y), _rows(X_ref, y_ref))
+    assert [len(b[0]) for b in first[:-1]] == [32] * (len(first) - 1)
+
+
+@pytest.mark.parametrize("drop_last", [False, True])
+def test_shuffled_buffer_draws_every_row_once(drop_last: bool) -> None:
+    rng = np.random.default_rng(3)
+    sizes = rng.integers(0, 40, size=30)
+    ids = np.arange(sizes.sum(), dtype=np.float32)
+    chunks = [(c[:, None], c) for c in np.split(ids, np.cumsum(sizes)[:-1])]
+    batches = list(_shuffled(iter(chunks), 16, 50, np.random.default_rng(0), drop_last))
+    got = np.concatenate([y for _, y in batches])
+    assert all(len(y) == 16 for _, y in batches[:-1])
+    for X, y in batches:
+        np.testing.assert_array_equal(X[:, 0], y)  # X and y rows stay paired
+    if drop_last:
+        assert len(got) == len(ids) - len(ids) % 16 and len(np.unique(got)) == len(got)
+    else:
+        np.testing.assert_array_equal(np.sort(got), ids)
+
+
+def test_rebatch_carries_rows_across_chunks() -> None:
+    ids = np.arange(100)
+    chunks = [(c[:, None], c) for c in np.split(ids, [3, 3, 40, 41, 90])]
+    batches = list(rebatch(chunks, 16))
+    assert [len(y) for _, y in batches] == [16] * 6 + [4]
+    np.testing.assert_array_equal(np.concatenate([y for _, y in batches]), ids)
+    assert [len(y) for _, y in rebatch(chunks, 16, drop_last=True)] == [16] * 6
+
+
+def test_bad_batch_size(hh_csv: Path) -> None:
+    with pytest.raises(ValueError):
+        next(iter_batches(hh_csv, batch_size=0))
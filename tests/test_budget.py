@@ -0,0 +1,97 @@
+"""--memory-budget: the ChunkSizer probes first, plans from bytes per row, overhead and
+read-ahead, grows at most twofold, shrinks at once, and replays its sizes on pass two."""
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.io.budget import ChunkSizer, frame_nbytes, parse_size
+
+
+def _chunk(rows: int, width: int = 10) -> pd.DataFrame:
+    return pd.DataFrame(np.zeros((rows, width)))
+
+
+def _bpr(rows: int = 1_000) -> float:
+    return frame_nbytes(_chunk(rows)) / rows
+
+
+def test_parse_size() -> None:
+    assert parse_size("4G") == 4 * 2**30
+    assert parse_size("1.5m") == int(1.5 * 2**20)
+    assert parse_size("800MiB") == 800 * 2**20
+    assert parse_size("123") == 123
+    with pytest.raises(ValueError):
+        parse_size("lots")
+
+
+def test_first_chunk_is_a_probe_and_its_plan_is_not_capped() -> None:
+    sizer = ChunkSizer(budget=10**9, rows=50_000, min_rows=100, probe_rows=500, overhead=3.0)
+    assert sizer.next_rows() == 500
+    assert ChunkSizer(budget=10**9, rows=50, min_rows=10, probe_rows=500).next_rows() == 50
+    assert ChunkSizer(budget=10**9, rows=5_000, min_rows=800, probe_rows=500).next_rows() == 800
+
+    sizer.observe(_chunk(500))
+    expected = int(10**9 / (_bpr(500) * 3.0))
+    assert expected > 2 * 50_000  # beyond the doubling limit, taken as is
+    assert sizer.next_rows() == min(expected, sizer.max_rows)
+
+
+def test_later_plans_grow_at_most_twofold_and_shrink_at_once() -> None:
+    budget = int(_bpr() * 3.0 * 2_000)  # ~2000 rows of 10 float64 columns at x3
+    sizer = ChunkSizer(budget=budget, rows=50_000, min_rows=10, probe_rows=1_000)
+    sizer.observe(_chunk(1_000))
+    first = sizer.next_rows()
+    assert abs(first - 2_000) <= 2
+
+    sizer.budget *= 10
+    sizer.observe(_chunk(first))
+    assert sizer.next_rows() == 2 * first
+
+    sizer.observe_pipeline(rows_in=first, read_bytes=100, peak_bytes=3_000)  # x30 in the pipeline
+    assert sizer.overhead == 30.0
+    assert sizer.next_rows() == int(sizer.budget / (sizer._bytes_per_row * 30.0))
+    # the worst ratio seen is kept
+    sizer.observe_pipeline(rows_in=first, read_bytes=100, peak_bytes=200)
+    assert sizer.overhead == 30.0
+
+
+def test_read_ahead_counts_as_held_chunks() -> None:
+    plain = ChunkSizer(budget=10**7, rows=50_000, min_rows=10)
+    ahead = ChunkSizer(budget=10**7, rows=50_000, min_rows=10, read_ahead=2)
+    for sizer in (plain, ahead):
+        sizer.observe(_chunk(1_000))
+    assert abs(ahead.next_rows() - plain.next_rows() * 3 / 5) <= 1
+
+
+def test_replay_repeats_sizes_read() -> None:
+    sizer = ChunkSizer(budget=int(_bpr() * 3.0 * 2_000), rows=50_000, min_rows=10)
+    for _ in range(4):
+        sizer.observe(_chunk(sizer.next_rows()))
+    sizer.observe(_chunk(7))  # a short last chunk
+    again = sizer.replay()
+    seen = []
+    for _ in range(len(sizer.sizes)):
+        seen.append(again.next_rows())
+        again.observe(_chunk(seen[-1]))
+        again.observe_pipeline(rows_in=seen[-1], read_bytes=1, peak_bytes=10**6)  # ignored
+    assert seen == sizer.sizes
+    assert again.overhead == sizer.overhead
+
+
+def test_bad_bounds() -> None:
+    with pytest.raises(ValueError):
+        ChunkSizer(budget=1, min_rows=0)
+    with pytest.raises(ValueError):
+        ChunkSizer(budget=1, min_rows=10, max_rows=5)
+
+
+@pytest.mark.parametrize("extra", [(), ("--prefetch", 2)])
+def test_budgeted_run_matches_fixed_chunks(hh_csv: Path, tmp_path: Path, run_app, extra: tuple) -> None:
+    run_app("-i", hh_csv, "-o", tmp_path / "fixed")
+    run_app("-i", hh_csv, "-o", tmp_path / "budget", "--memory-budget", "256K", "--min-chunksize", 10, *extra)
+    for name in ("x_data.npy", "y_data.npy"):
+        np.testing.assert_array_equal(np.load(tmp_path / "budget" / name), np.load(tmp_path / "fixed" / name))
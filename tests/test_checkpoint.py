@@ -0,0 +1,91 @@
+"""--checkpoint-every/--resume: a run interrupted after a checkpoint resumes into the
+output of an uninterrupted run, and a checkpoint is refused once its input or options change."""
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import app
+from src.io.checkpoint import Checkpoint, PrefixDigest
+
+OUTPUTS = ("x_data.npy", "y_data.npy")
+
+
+def _crash_on_save(monkeypatch: pytest.MonkeyPatch, n: int) -> None:
+    """Make the n-th Checkpoint.save() of the run fail, as a crash right after a flush."""
+    save = Checkpoint.save
+    calls = []
+
+    def failing(self: Checkpoint, path: Path) -> None:
+        calls.append(path)
+        if len(calls) == n:
+            raise KeyboardInterrupt
+        save(self, path)
+
+    monkeypatch.setattr(Checkpoint, "save", failing)
+
+
+def test_resumed_run_matches_uninterrupted(hh_csv: Path, tmp_path: Path, run_app, monkeypatch, caplog) -> None:
+    run_app("-i", hh_csv, "-o", tmp_path / "full", "-c", 40)
+    out = tmp_path / "ckpt"
+    with monkeypatch.context() as m:
+        _crash_on_save(m, 4)  # initial checkpoint, two commits, then the crash
+        with pytest.raises(KeyboardInterrupt):
+            run_app("-i", hh_csv, "-o", out, "-c", 40, "--checkpoint-every", 1)
+    ckpt = Checkpoint.load(out / "checkpoint.json")
+    assert not ckpt.complete and 0 < ckpt.rows_written < ckpt.n_rows
+    # rows past the checkpoint may be anything after a crash: the resumed run rewrites them
+    x = np.load(out / "x_data.npy", mmap_mode="r+")
+    x[ckpt.rows_written :] = -1
+    x.flush()
+    del x
+
+    with caplog.at_level(logging.INFO, logger="app"):
+        run_app("-i", hh_csv, "-o", out, "-c", 40, "--checkpoint-every", 1, "--resume")
+    assert f"Resuming pass 2 at entry {ckpt.entry}/" in caplog.text
+    assert Checkpoint.load(out / "checkpoint.json").complete
+    for name in OUTPUTS:
+        np.testing.assert_array_equal(np.load(out / name), np.load(tmp_path / "full" / name))
+    # a complete run is not redone
+    stamp = (out / "x_data.npy").stat().st_mtime_ns
+    run_app("-i", hh_csv, "-o", out, "-c", 40, "--checkpoint-every", 1, "--resume")
+    assert (out / "x_data.npy").stat().st_mtime_ns == stamp
+
+
+def test_changed_options_start_from_scratch(hh_csv: Path, tmp_path: Path, run_app, monkeypatch) -> None:
+    out = tmp_path / "ckpt"
+    with monkeypatch.context() as m:
+        _crash_on_save(m, 3)
+        with pytest.raises(KeyboardInterrupt):
+            run_app("-i", hh_csv, "-o", out, "-c", 40, "--checkpoint-every", 1)
+    run_app("-i", hh_csv, "-o", out, "-c", 40, "--checkpoint-every", 1, "--resume", "--drop-missing-target")
+    run_app("-i", hh_csv, "-o", tmp_path / "full", "-c", 40, "--drop-missing-target")
+    for name in OUTPUTS:
+        np.testing.assert_array_equal(np.load(out / name), np.load(tmp_path / "full" / name))
+
+
+def test_checkpoint_problem(hh_csv: Path, tmp_path: Path, run_app) -> None:
+    out = tmp_path / "ckpt"
+    run_app("-i", hh_csv, "-o", out, "-c", 40, "--checkpoint-every", 2)
+    ckpt = Checkpoint.load(out / "checkpoint.json")
+    assert ckpt.problem(hh_csv, ckpt.options, PrefixDigest(hh_csv)) is None
+    assert "options changed: chunksize" in ckpt.problem(hh_csv, {**ckpt.options, "chunksize": 7}, PrefixDigest(hh_csv))
+
+    data = hh_csv.read_bytes()
+    hh_csv.write_bytes(data + b"\n")
+    assert "is not the" in ckpt.problem(hh_csv, ckpt.options, PrefixDigest(hh_csv))
+    pos = ckpt.offset // 2
+    hh_csv.write_bytes(data[:pos] + b"#" + data[pos + 1 :])
+    assert "changed" in ckpt.problem(hh_csv, ckpt.options, PrefixDigest(hh_csv))
+
+
+def test_resume_requires_checkpoint_every(hh_csv: Path, tmp_path: Path, run_app, capsys) -> None:
+    with pytest.raises(SystemExit):
+        run_app("-i", hh_csv, "-o", tmp_path / "out", "--resume")
+    assert "--resume requires --checkpoint-every" in capsys.readouterr().err
+    with pytest.raises(SystemExit):
+        run_app("-i", hh_csv, "-o", tmp_path / "out", "--checkpoint-every", 1, "--single-pass")
+    assert app._REQUIRES and all(opt in app._IN_USE for opt, _ in app._REQUIRES)
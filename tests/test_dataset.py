@@ -0,0 +1,88 @@
+"""NpyDataset: views read the rows of x_data.npy/y_data.npy they point at, splits are
+disjoint and complete, batches cover a view once, and datasets pickle by path."""
+from __future__ import annotations
+
+import pickle
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.io.dataset import NpyDataset
+from src.io.prefetch import PrefetchStats
+
+
+@pytest.fixture
+def data_dir(tmp_path: Path) -> Path:
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(1_000, 4)).astype(np.float32)
+    X[:, 0] = np.arange(1_000)  # row id
+    np.save(tmp_path / "x_data.npy", X)
+    np.save(tmp_path / "y_data.npy", X[:, 0] * 2)
+    (tmp_path / "feature_names.txt").write_text("id\na\nb\nc", encoding="utf-8")
+    return tmp_path
+
+
+def test_random_access_matches_arrays(data_dir: Path) -> None:
+    ds = NpyDataset(data_dir)
+    X, y = np.load(data_dir / "x_data.npy"), np.load(data_dir / "y_data.npy")
+    assert len(ds) == 1_000 and ds.n_features == 4 and ds.feature_names == ["id", "a", "b", "c"]
+    rows = np.array([999, 0, 5, 5, 512])
+    Xg, yg = ds.get(rows)
+    np.testing.assert_array_equal(Xg, X[rows])
+    np.testing.assert_array_equal(yg, y[rows])
+
+    view = ds.subset(np.arange(100, 200)).subset(np.array([0, 99, 50]))
+    np.testing.assert_array_equal(view.positions(), [100, 199, 150])
+    np.testing.assert_array_equal(view.get(np.arange(3))[0], X[[100, 199, 150]])
+    with pytest.raises(IndexError):
+        ds.subset(np.arange(100)).subset(np.array([100]))
+
+
+@pytest.mark.parametrize("fraction", [0.0, 0.1, 0.5, 1.0])
+def test_split_is_disjoint_complete_and_seeded(data_dir: Path, fraction: float) -> None:
+    ds = NpyDataset(data_dir).subset(np.arange(0, 1_000, 2))
+    train, val = ds.split(val_fraction=fraction, seed=7)
+    assert len(val) == round(len(ds) * fraction)
+    assert not set(train.positions()) & set(val.positions())
+    np.testing.assert_array_equal(np.sort(np.concatenate([train.positions(), val.positions()])), ds.positions())
+    for part in (train, val):
+        assert (np.diff(part.positions()) > 0).all()  # file order kept
+    np.testing.assert_array_equal(ds.split(val_fraction=fraction, seed=7)[1].positions(), val.positions())
+    with pytest.raises(ValueError):
+        ds.split(val_fraction=1.5)
+
+
+def test_pickle_reopens_maps(data_dir: Path) -> None:
+    view = NpyDataset(data_dir).subset(np.array([3, 1, 4]))
+    state = pickle.dumps(view)
+    assert len(state) < 2_000  # rows by path, not the data
+    copy = pickle.loads(state)
+    np.testing.assert_array_equal(copy.positions(), [3, 1, 4])
+    np.testing.assert_array_equal(copy.get(np.arange(3))[0], view.get(np.arange(3))[0])
+    assert copy.X is not view.X and copy.feature_names == view.feature_names
+
+
+@pytest.mark.parametrize("shuffle", [False, True])
+@pytest.mark.parametrize("view", [False, True])
+def test_batches_cover_the_view_once(data_dir: Path, shuffle: bool, view: bool) -> None:
+    ds = NpyDataset(data_dir)
+    if view:
+        ds = ds.split(val_fraction=0.3, seed=1)[0]
+    stats = PrefetchStats()
+    batches = list(ds.batches(64, shuffle=shuffle, seed=3, block_rows=100, prefetch=2, prefetch_stats=stats))
+    assert [len(X) for X, _ in batches[:-1]] == [64] * (len(batches) - 1)
+    ids = np.concatenate([X[:, 0] for X, _ in batches])
+    for X, y in batches:
+        np.testing.assert_array_equal(y, X[:, 0] * 2)
+    assert shuffle != np.array_equal(ids, ds.positions())
+    np.testing.assert_array_equal(np.sort(ids), ds.positions())
+    # same seed, same order (with or without the prefetch thread)
+    again = np.concatenate([X[:, 0] for X, _ in ds.batches(64, shuffle=shuffle, seed=3, block_rows=100)])
+    np.testing.assert_array_equal(again, ids)
+
+
+def test_misaligned_outputs_are_rejected(data_dir: Path) -> None:
+    np.save(data_dir / "y_data.npy", np.zeros(999, dtype=np.float32))
+    with pytest.raises(ValueError):
+        NpyDataset(data_dir)
@@ -0,0 +1,84 @@
+"""DateParser for `Обновление резюме`: same values as one pd.to_datetime(dayfirst=True)
+call on single-format columns, per-value fallback on mixed ones, and a cross-chunk
+cache sized on its own."""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.pipeline.builder import build_pipeline
+from src.pipeline.cache import ParseCache
+from src.pipeline.handlers import DateParser, SelectXYHandler
+
+
+def _baseline(ser: pd.Series) -> pd.Series:
+    return pd.to_datetime(ser, errors="coerce", dayfirst=True)
+
+
+def _dates(fmt: str, n: int = 500, seed: int = 0) -> list[object]:
+    rng = np.random.default_rng(seed)
+    stamps = pd.Timestamp("2015-01-01") + pd.to_timedelta(rng.integers(0, 10 * 365 * 24 * 60, n), unit="min")
+    values: list[object] = [t.strftime(fmt) for t in stamps]
+    # invalid in the format: impossible days, hours and minutes, other text, missing
+    bad = ["30.02.2020 10:00", "31.04.2021 10:00", "01.01.2020 24:00", "01.01.2020 10:60"]
+    return values + bad + ["garbage", "", None, np.nan] + values[:50]
+
+
+@pytest.mark.parametrize("fmt", ["%d.%m.%Y %H:%M", "%d.%m.%Y %H:%M:%S", "%d.%m.%Y"])
+def test_single_format_matches_one_to_datetime_call(fmt: str) -> None:
+    ser = pd.Series(_dates(fmt), dtype=object)
+    got = DateParser()(ser)
+    assert got.tolist() == _baseline(ser).tolist()
+
+
+def test_matches_baseline_across_chunks_and_cache_resets() -> None:
+    ser = pd.Series(_dates("%d.%m.%Y %H:%M", n=2_000), dtype=object)
+    parser = DateParser(cache_size=300)
+    got = pd.concat([parser(ser.iloc[i : i + 250]) for i in range(0, len(ser), 250)])
+    assert got.tolist() == _baseline(ser).tolist()
+    assert len(parser._known) <= 300
+
+
+def test_mixed_formats_fall_back_per_value() -> None:
+    # a value outside the detected format is parsed on its own (month-first when no day-first
+    # reading exists); one pd.to_datetime call over the column infers one format and gives NaT
+    ser = pd.Series(_dates("%d.%m.%Y %H:%M", n=20) + ["25/12/2019", "01.13.2020 10:00"], dtype=object)
+    parser = DateParser()
+    got, base = parser(ser), _baseline(ser)
+    assert parser.format == "%d.%m.%Y %H:%M"
+    assert got.iloc[:-2].tolist() == base.iloc[:-2].tolist()
+    assert got.iloc[-2] == pd.Timestamp("2019-12-25") and pd.isna(base.iloc[-2])
+    assert got.iloc[-1] == pd.Timestamp("2020-01-13 10:00") and pd.isna(base.iloc[-1])
+
+
+def test_iso_dates_keep_year_month_day() -> None:
+    # dayfirst=True makes one pd.to_datetime call swap day and month of ISO values (NaT when
+    # the day is over 12); the detected %Y-%m-%d format reads them as written
+    ser = pd.Series(["2020-03-04 10:00:00", "2020-03-14 10:00:00"], dtype=object)
+    got = DateParser()(ser)
+    assert got.tolist() == [pd.Timestamp("2020-03-04 10:00"), pd.Timestamp("2020-03-14 10:00")]
+    assert _baseline(ser).iloc[0] == pd.Timestamp("2020-04-03 10:00") and pd.isna(_baseline(ser).iloc[1])
+
+
+def test_cache_hits_across_chunks() -> None:
+    ser = pd.Series(["01.02.2020 10:00", "02.02.2020 10:00"] * 3, dtype=object)
+    parser = DateParser()
+    parser(ser)
+    parser(ser)
+    assert parser.misses == 2 and parser.hits == 2
+    off = DateParser(cache_size=0)
+    off(ser)
+    off(ser)
+    assert off.misses == 4 and off.stats()["cached"] == 0
+
+
+def _date_parser(**kwargs) -> DateParser:
+    pipeline = build_pipeline(**kwargs)
+    return next(h.dates for h in pipeline.handlers() if isinstance(h, SelectXYHandler))
+
+
+def test_date_cache_size_is_independent_of_the_parse_cache() -> None:
+    assert _date_parser(parse_cache=None).cache_size == 200_000
+    assert _date_parser(parse_cache=ParseCache(maxsize=10)).cache_size == 200_000
+    assert _date_parser(parse_cache=None, date_cache_size=0).cache_size == 0
@@ -0,0 +1,115 @@
+"""FitState: vectorized lookups give the per-value codes, fit_state.npz round-trips,
+and merging per-chunk states in order gives the codes of a serial fit."""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.encoding.encoders import FitState, _norm_cat
+from src.encoding.strategies import ColumnStrategy
+
+COLUMNS = ["city", "title", "age", "updated"]
+
+
+def _chunks() -> list[pd.DataFrame]:
+    titles = ["Программист", " программист ", None, "", "Engineer", "a\tb", "😀 emoji", "Программист"]
+    cities = ["Москва", "Казань", np.nan, "Москва", "  ", "Пермь", "Казань", "Омск"]
+    frame = pd.DataFrame(
+        {
+            "city": cities,
+            "title": titles,
+            "age": [30, 41, np.nan, 25, 33, 19, 60, 45],
+            "updated": pd.to_datetime(["2020-01-01"] * 7 + [None]),
+        }
+    )
+    return [frame.iloc[i : i + 3].reset_index(drop=True) for i in range(0, len(frame), 3)]
+
+
+def _serial(strategies: dict[str, ColumnStrategy] | None = None) -> FitState:
+    fit = FitState(strategies=dict(strategies or {}))
+    fit.init_columns(COLUMNS)
+    for chunk in _chunks():
+        fit.fit_chunk(chunk)
+    fit.finalize()
+    return fit
+
+
+def test_codes_match_per_value_lookup() -> None:
+    fit = _serial()
+    assert fit.cat_cols == {"city", "title"}
+    for chunk in _chunks():
+        X, _ = fit.transform_chunk(chunk, chunk["age"], COLUMNS)
+        for j, col in enumerate(["city", "title"]):
+            expected = [fit.maps[col].get(_norm_cat(v), 0) for v in chunk[col]]
+            assert X[:, j].tolist() == expected
+    # unseen values go to "__NA__" (0)
+    unseen = pd.DataFrame({"city": ["Тверь", None], "title": ["x", "Engineer"], "age": [1, 2], "updated": pd.NaT})
+    X, _ = fit.transform_chunk(unseen, unseen["age"], COLUMNS)
+    assert X[:, 0].tolist() == [0, 0]
+    assert X[:, 1].tolist() == [0, fit.maps["title"]["Engineer"]]
+
+
+@pytest.mark.parametrize(
+    "strategies",
+    [{}, {"title": ColumnStrategy(kind="topk", k=2)}, {"title": ColumnStrategy(kind="hash", buckets=16)}],
+    ids=["exact", "topk", "hash"],
+)
+def test_save_load_roundtrip(strategies: dict, tmp_path: Path) -> None:
+    fit = _serial(strategies)
+    path = tmp_path / "fit_state.npz"
+    fit.save(path)
+    loaded = FitState.load(path)
+    assert loaded.maps == fit.maps
+    assert [list(m) for m in loaded.maps.values()] == [list(m) for m in fit.maps.values()]
+    assert loaded.cat_cols == fit.cat_cols
+    assert loaded.feature_names == fit.feature_names
+    assert loaded.strategies == fit.strategies
+    for chunk in _chunks():
+        a = fit.transform_chunk(chunk, chunk["age"], COLUMNS)
+        b = loaded.transform_chunk(chunk, chunk["age"], COLUMNS)
+        np.testing.assert_array_equal(a[0], b[0])
+    with np.load(path, allow_pickle=False) as data:
+        assert "meta" in data.files
+
+
+def test_load_rejects_other_versions(tmp_path: Path) -> None:
+    path = tmp_path / "fit_state.npz"
+    meta = {"version": 999, "feature_names": [], "cat_cols": [], "map_cols": []}
+    np.savez(path, meta=np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8))
+    with pytest.raises(ValueError, match="unsupported FitState version"):
+        FitState.load(path)
+
+
+@pytest.mark.parametrize(
+    "strategies", [{}, {"title": ColumnStrategy(kind="topk", k=3)}], ids=["exact", "topk"]
+)
+def test_merge_in_chunk_order_matches_serial_fit(strategies: dict) -> None:
+    merged = FitState(strategies=dict(strategies))
+    merged.init_columns(COLUMNS)
+    for chunk in _chunks():
+        part = FitState(strategies=dict(strategies), prune_sketches=False)
+        part.init_columns(COLUMNS)
+        part.fit_chunk(chunk)
+        merged.merge(part, COLUMNS)
+    merged.finalize()
+    serial = _serial(strategies)
+    assert merged.cat_cols == serial.cat_cols
+    assert {c: list(m.items()) for c, m in merged.maps.items()} == {
+        c: list(m.items()) for c, m in serial.maps.items()
+    }
+
+
+def test_sort_codes_luts_remap_encoded_codes() -> None:
+    fit = _serial()
+    chunk = pd.concat(_chunks(), ignore_index=True)
+    before, _ = fit.transform_chunk(chunk, chunk["age"], COLUMNS)
+    luts = fit.sort_codes()
+    after, _ = fit.transform_chunk(chunk, chunk["age"], COLUMNS)
+    for j, col in enumerate(["city", "title"]):
+        assert luts[col][before[:, j].astype(np.int64)].tolist() == after[:, j].astype(np.int64).tolist()
+        values = list(fit.maps[col])
+        assert values[0] == "__NA__" and values[1:] == sorted(values[1:])
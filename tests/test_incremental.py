@@ -0,0 +1,90 @@
+"""--incremental: growable .npy files keep a valid header as they are extended in place,
+the state spots rewritten inputs, and two increments give the rows of one single pass."""
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.io.incremental import IncrementalState
+from src.io.index import build_csv_index
+from src.io.writers import GrowableNpy
+
+
+def test_growable_npy_append_and_reopen(tmp_path: Path) -> None:
+    path = tmp_path / "x.npy"
+    rows = np.arange(12, dtype=np.float32).reshape(4, 3)
+    out = GrowableNpy(path, np.float32, (3,))
+    out.append(rows[:1])
+    out.append(rows[1:3])
+    out.close()
+    np.testing.assert_array_equal(np.load(path), rows[:3])
+    header_size = out.header_size
+
+    out = GrowableNpy(path, np.float32, (3,), append=True)
+    assert out.n_rows == 3 and out.header_size == header_size
+    out.append(rows[3:])
+    out.close()
+    np.testing.assert_array_equal(np.load(path), rows)
+
+
+def test_growable_npy_header_has_room_for_large_shapes(tmp_path: Path) -> None:
+    path = tmp_path / "y.npy"
+    out = GrowableNpy(path, np.float32, ())
+    out.close()
+    out = GrowableNpy(path, np.float32, (), append=True)
+    out.n_rows = 10**15  # header text only; no data behind it is read
+    out.close()
+    with open(path, "rb") as fh:
+        np.lib.format.read_magic(fh)
+        shape, _, _ = np.lib.format.read_array_header_1_0(fh)
+        assert shape == (10**15,) and fh.tell() == out.header_size
+
+
+def test_growable_npy_drops_bytes_of_an_interrupted_append(tmp_path: Path) -> None:
+    path = tmp_path / "x.npy"
+    out = GrowableNpy(path, np.float32, (2,))
+    out.append(np.ones((2, 2), dtype=np.float32))
+    out.close()
+    with open(path, "ab") as fh:
+        fh.write(b"\x00" * 5)  # half a row written after the header was last fixed up
+    out = GrowableNpy(path, np.float32, (2,), append=True)
+    out.append(np.zeros((1, 2), dtype=np.float32))
+    out.close()
+    np.testing.assert_array_equal(np.load(path), [[1, 1], [1, 1], [0, 0]])
+
+
+def test_growable_npy_rejects_other_layouts(tmp_path: Path) -> None:
+    path = tmp_path / "x.npy"
+    np.save(path, np.zeros((2, 3), dtype=np.float64))
+    with pytest.raises(ValueError):
+        GrowableNpy(path, np.float32, (3,), append=True)
+
+
+def test_state_detects_rewritten_input(hh_csv: Path, tmp_path: Path) -> None:
+    idx = build_csv_index(hh_csv, rows_per_entry=100)
+    state = IncrementalState.capture(hh_csv, idx.header_end, idx.offsets[1], 100, 100)
+    assert state.matches(hh_csv)
+    data = hh_csv.read_bytes()
+    hh_csv.write_bytes(data + data[idx.header_end : idx.offsets[1]])  # appended to
+    assert state.matches(hh_csv)
+    pos = idx.offsets[1] - 10
+    hh_csv.write_bytes(data[:pos] + b"X" + data[pos + 1 :])  # rewritten before the offset
+    assert not state.matches(hh_csv)
+    hh_csv.write_bytes(data[: idx.offsets[1] - 1])  # truncated
+    assert not state.matches(hh_csv)
+
+
+def test_two_increments_match_one_single_pass(hh_csv: Path, tmp_path: Path, run_app) -> None:
+    data = hh_csv.read_bytes()
+    split = build_csv_index(hh_csv, rows_per_entry=120).offsets[1]
+    growing = tmp_path / "growing.csv"
+    growing.write_bytes(data[:split] + data[split : split + 40])  # plus a half-written record
+    run_app("-i", growing, "-o", tmp_path / "inc", "--incremental")
+    assert IncrementalState.load(tmp_path / "inc" / "incremental.json").rows_read == 120
+    growing.write_bytes(data)
+    run_app("-i", growing, "-o", tmp_path / "inc", "--incremental")
+    run_app("-i", hh_csv, "-o", tmp_path / "single", "--single-pass")
+    for name in ("x_data.npy", "y_data.npy"):
+        np.testing.assert_array_equal(np.load(tmp_path / "inc" / name), np.load(tmp_path / "single" / name))
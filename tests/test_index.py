@@ -0,0 +1,84 @@
+"""Byte-range index of the input CSV: record boundaries follow quote parity across
+blocks, and every entry reads back the same rows as a full read."""
+from __future__ import annotations
+
+import io
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.io.index import RangeReader, _record_ends, build_csv_index, find_header_end, last_record_end
+
+# quoted newlines, "" escapes and a quoted field ending a line
+CSV = (
+    'id,text\n'
+    '1,"one\nline two"\n'
+    '2,"say ""hi""\n"\n'
+    '3,plain\n'
+    '4,"a,b"\n'
+    '5,""""\n'
+    '6,"x\n\ny"\n'
+    '7,last\n'
+).encode("utf-8")
+
+
+def _write(tmp_path: Path, data: bytes) -> Path:
+    path = tmp_path / "in.csv"
+    path.write_bytes(data)
+    return path
+
+
+def _record_starts(data: bytes) -> list[int]:
+    # reference: walk the bytes tracking quote state
+    starts, quoted = [], False
+    for i, b in enumerate(data):
+        if b == ord('"'):
+            quoted = not quoted
+        elif b == ord("\n") and not quoted:
+            starts.append(i + 1)
+    return starts
+
+
+@pytest.mark.parametrize("block_size", [1, 2, 3, 7, 64, 1 << 20])
+def test_record_ends_follow_quote_parity_across_blocks(block_size: int) -> None:
+    ends = np.concatenate(list(_record_ends(io.BytesIO(CSV), block_size=block_size)))
+    assert ends.tolist() == _record_starts(CSV)
+
+
+@pytest.mark.parametrize("rows_per_entry", [1, 2, 3, 7, 100])
+@pytest.mark.parametrize("trailing_newline", [True, False])
+def test_entries_read_back_the_full_file(rows_per_entry: int, trailing_newline: bool, tmp_path: Path) -> None:
+    data = CSV if trailing_newline else CSV[:-1]
+    path = _write(tmp_path, data)
+    idx = build_csv_index(path, rows_per_entry=rows_per_entry)
+    full = pd.read_csv(path)
+    assert idx.n_records == len(full) == 7
+    assert idx.header_end == find_header_end(path) == data.index(b"\n") + 1
+    assert idx.offsets[-1] == len(data)
+    assert idx.n_entries == -(-idx.n_records // rows_per_entry)
+    parts = []
+    for entry in range(idx.n_entries):
+        start, stop = idx.byte_range(entry, entry + 1)
+        with io.BufferedReader(RangeReader(path, idx.header_end, start, stop)) as fh:
+            part = pd.read_csv(fh)
+        assert len(part) == min(rows_per_entry, idx.n_records - entry * rows_per_entry)
+        parts.append(part)
+    pd.testing.assert_frame_equal(pd.concat(parts, ignore_index=True), full)
+
+
+def test_header_only_and_empty(tmp_path: Path) -> None:
+    for data in (b"id,text\n", b"id,text", b""):
+        path = _write(tmp_path, data)
+        idx = build_csv_index(path, rows_per_entry=2)
+        assert idx.n_records == 0
+        assert idx.header_end == len(data)
+        assert idx.offsets == [len(data)]
+
+
+def test_last_record_end_leaves_a_partial_line(tmp_path: Path) -> None:
+    path = _write(tmp_path, CSV + b'8,"still open\n')
+    header_end = find_header_end(path)
+    assert last_record_end(path, header_end) == len(CSV)
+    assert last_record_end(path, len(CSV)) == len(CSV)
@@ -0,0 +1,30 @@
+"""Cross-chunk parse cache: chunks without rows keep the shape of the parsers' output."""
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+
+from src.pipeline.builder import build_pipeline
+from src.pipeline.cache import ParseCache
+from src.pipeline.handlers import _parse_gender_age, _parse_salary, _parse_unique
+
+
+def _empty_chunk(columns: list[str]) -> pd.DataFrame:
+    return pd.DataFrame({col: pd.Series([], dtype=object) for col in columns})
+
+
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_empty_chunk(vectorized: bool) -> None:
+    pipeline = build_pipeline(parse_cache=ParseCache(), vectorized=vectorized)
+    ctx = pipeline.process_chunk(_empty_chunk(pipeline.required_columns()))
+    assert ctx.X is not None and ctx.y is not None
+    assert len(ctx.X) == 0 and len(ctx.y) == 0
+    expected = build_pipeline().process_chunk(_empty_chunk(pipeline.required_columns()))
+    assert list(ctx.X.columns) == list(expected.X.columns)
+
+
+@pytest.mark.parametrize("scalar,arity", [(_parse_gender_age, 2), (_parse_salary, 2)])
+def test_parse_unique_empty_keeps_arity(scalar, arity: int) -> None:
+    out = _parse_unique(pd.Series([], dtype=object), scalar, None, ParseCache())
+    assert isinstance(out, tuple) and len(out) == arity
+    assert all(len(arr) == 0 for arr in out)
@@ -0,0 +1,97 @@
+"""Sniffed encodings and delimiters, their sidecar, and the cp1251 fallback of utf-8
+reads, counted per reader."""
+from __future__ import annotations
+
+import itertools
+import logging
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from src.io.readers import iter_csv_chunks
+from src.io.sniff import Cp1251Fallback, decode_errors, dialect_path_for, load_or_sniff, sniff_csv
+
+ROWS = [["Город", "ЗП", "Должность"]] + [["Москва", f"{i}0000 руб.", f"Инженер {i}"] for i in range(200)]
+
+
+def _write(path: Path, delimiter: str = ",", encoding: str = "utf-8", rows: list[list[str]] = ROWS) -> Path:
+    path.write_bytes("".join(delimiter.join(row) + "\n" for row in rows).encode(encoding))
+    return path
+
+
+@pytest.mark.parametrize("delimiter", [",", ";", "\t", "|"])
+@pytest.mark.parametrize("encoding", ["utf-8", "utf-8-sig", "cp1251"])
+def test_sniff_encoding_and_delimiter(tmp_path: Path, delimiter: str, encoding: str) -> None:
+    path = _write(tmp_path / "hh.csv", delimiter, encoding)
+    dialect = sniff_csv(path, head_bytes=512, range_bytes=128, n_ranges=4)
+    assert (dialect.encoding, dialect.delimiter) == (encoding, delimiter)
+    assert dialect.sampled_bytes <= 512 + 4 * 128
+
+
+def test_a_few_cp1251_lines_keep_utf8(tmp_path: Path) -> None:
+    path = tmp_path / "hh.csv"
+    _write(path)
+    with open(path, "ab") as fh:
+        fh.write("Казань,10 руб.,Оператор\n".encode("cp1251"))
+    assert sniff_csv(path).encoding == "utf-8"
+
+
+def test_sidecar_reused_while_file_unchanged(tmp_path: Path) -> None:
+    path = _write(tmp_path / "hh.csv", ";")
+    first = load_or_sniff(path)
+    sidecar = dialect_path_for(path)
+    assert sidecar.exists()
+    # a forged sidecar for the same size and mtime wins: the file is not sniffed again
+    sidecar.write_text(sidecar.read_text(encoding="utf-8").replace('";"', '"|"'), encoding="utf-8")
+    assert load_or_sniff(path).delimiter == "|"
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert load_or_sniff(path).delimiter == first.delimiter == ";"
+    sidecar.write_text("{not json", encoding="utf-8")
+    assert load_or_sniff(path).delimiter == ";"
+
+
+def test_decode_errors() -> None:
+    fallback = Cp1251Fallback()
+    assert decode_errors("cp1251", fallback) == "replace"
+    assert decode_errors("utf-8", fallback) == fallback.errors
+    assert decode_errors("UTF8") != fallback.errors
+
+
+def test_fallback_counts_per_instance() -> None:
+    bad = "Казань".encode("cp1251")
+    data = b"ok " + bad + b" ok"
+    one, two = Cp1251Fallback(), Cp1251Fallback()
+    assert data.decode("utf-8", errors=one.errors) == "ok Казань ok"
+    assert (one.decoded_bytes, two.decoded_bytes) == (len(bad), 0)
+
+    fallbacks = [Cp1251Fallback() for _ in range(4)]
+
+    def decode(fallback: Cp1251Fallback, times: int) -> None:
+        for _ in range(times):
+            data.decode("utf-8", errors=fallback.errors)
+
+    threads = [threading.Thread(target=decode, args=(f, 200 * (i + 1))) for i, f in enumerate(fallbacks)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert [f.decoded_bytes for f in fallbacks] == [len(bad) * 200 * (i + 1) for i in range(4)]
+
+
+def test_reader_decodes_stray_cp1251_rows_and_logs_them_per_chunk(tmp_path: Path, caplog) -> None:
+    mixed = _write(tmp_path / "mixed.csv")
+    with open(mixed, "ab") as fh:
+        fh.write("Казань,10 руб.,Оператор\n".encode("cp1251"))
+    clean = _write(tmp_path / "clean.csv")
+    with caplog.at_level(logging.WARNING, logger="io.readers"):
+        # the two readers interleave: each chunk's count is its own reader's
+        pairs = list(itertools.zip_longest(iter_csv_chunks(clean, 50), iter_csv_chunks(mixed, 50)))
+    df = pd.concat([m for _, m in pairs], ignore_index=True)
+    assert df["Город"].iloc[-1] == "Казань" and df["Должность"].iloc[-1] == "Оператор"
+    warnings = [r.getMessage() for r in caplog.records if "decoded as cp1251" in r.getMessage()]
+    assert len(warnings) == 1
+    assert f"Chunk 4 of {mixed}: {len('Казань') + len('руб') + len('Оператор')} bytes are not utf-8" in warnings[0]
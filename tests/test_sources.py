@@ -0,0 +1,109 @@
+"""Several and compressed inputs: --input expansion, decompression on a helper thread,
+and runs over parts of a file giving the output of the whole file."""
+from __future__ import annotations
+
+import bz2
+import gzip
+import lzma
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.io.index import build_csv_index
+from src.io.readers import iter_csv_chunks
+from src.io.sources import DecompressingReader, expand_inputs, open_decompressed
+
+COMPRESS = {".gz": gzip.compress, ".bz2": bz2.compress, ".xz": lzma.compress}
+
+
+def test_expand_inputs(tmp_path: Path) -> None:
+    for name in ("b.csv", "a.csv", "c.csv.gz", "a.csv.sniff.json", "a.csv.idx.json", "notes.txt"):
+        (tmp_path / name).write_bytes(b"x\n")
+    got = expand_inputs([str(tmp_path / "c.csv.gz"), str(tmp_path / "*.csv*"), str(tmp_path / "b.csv")])
+    assert [p.name for p in got] == ["c.csv.gz", "a.csv", "b.csv"]
+    with pytest.raises(FileNotFoundError):
+        expand_inputs([str(tmp_path / "missing.csv")])
+    with pytest.raises(FileNotFoundError):
+        expand_inputs([str(tmp_path / "*.parquet")])
+
+
+@pytest.mark.parametrize("suffix", list(COMPRESS))
+def test_decompressing_reader_gives_the_plain_bytes(tmp_path: Path, suffix: str) -> None:
+    data = np.random.default_rng(0).integers(0, 50, 300_000, dtype=np.uint8).tobytes()
+    path = tmp_path / f"data{suffix}"
+    path.write_bytes(COMPRESS[suffix](data))
+    with open_decompressed(path) as fh:
+        assert fh.read() == data
+    raw = DecompressingReader(path, depth=1, block_bytes=1_000)
+    got = bytearray()
+    while block := raw.read(777):
+        got += block
+    raw.close()
+    assert bytes(got) == data
+    # closed half way: the helper thread stops
+    raw = DecompressingReader(path, depth=1, block_bytes=1_000)
+    raw.read(10)
+    raw.close()
+    assert not raw._thread.is_alive()
+
+
+def test_decompression_errors_reach_the_reader(tmp_path: Path) -> None:
+    path = tmp_path / "broken.gz"
+    packed = gzip.compress(np.random.default_rng(0).integers(0, 255, 100_000, dtype=np.uint8).tobytes())
+    path.write_bytes(packed[: len(packed) // 2])  # cut short
+    with pytest.raises(OSError):
+        with open_decompressed(path) as fh:
+            fh.read()
+    with pytest.raises(ValueError):
+        DecompressingReader(tmp_path / "plain.csv")
+
+
+@pytest.mark.parametrize("suffix", list(COMPRESS))
+def test_compressed_csv_reads_like_plain(hh_csv: Path, tmp_path: Path, suffix: str) -> None:
+    packed = tmp_path / f"hh.csv{suffix}"
+    packed.write_bytes(COMPRESS[suffix](hh_csv.read_bytes()))
+    pd.testing.assert_frame_equal(
+        pd.concat(iter_csv_chunks(packed, 70)), pd.concat(iter_csv_chunks(hh_csv, 70))
+    )
+    with pytest.raises(ValueError):
+        next(iter_csv_chunks(packed, 70, byte_range=(0, 10)))
+
+
+def _split(hh_csv: Path, tmp_path: Path) -> list[Path]:
+    """hh_csv as three files with a header each: plain, .gz and .xz."""
+    data = hh_csv.read_bytes()
+    idx = build_csv_index(hh_csv, rows_per_entry=100)
+    header = data[: idx.header_end]
+    parts = []
+    for i, suffix in enumerate(["", ".gz", ".xz"]):
+        body = header + data[idx.offsets[i] : idx.offsets[i + 1]]
+        path = tmp_path / f"part_{i}.csv{suffix}"
+        path.write_bytes(COMPRESS[suffix](body) if suffix else body)
+        parts.append(path)
+    return parts
+
+
+@pytest.mark.parametrize("extra", [(), ("--single-pass",), ("--workers", 2), ("--prefetch", 2)])
+def test_parts_give_the_output_of_the_whole_file(hh_csv: Path, tmp_path: Path, run_app, extra: tuple) -> None:
+    parts = _split(hh_csv, tmp_path)
+    run_app("-i", hh_csv, "-o", tmp_path / "whole", "-c", 70)
+    run_app("-i", *parts, "-o", tmp_path / "parts", "-c", 70, *extra)
+    for name in ("x_data.npy", "y_data.npy"):
+        np.testing.assert_array_equal(np.load(tmp_path / "parts" / name), np.load(tmp_path / "whole" / name))
+
+
+@pytest.mark.parametrize(
+    "argv, message",
+    [
+        (("--incremental",), "--incremental cannot be combined with several inputs, compressed inputs"),
+        (("--checkpoint-every", 1), "cannot be combined with several inputs, compressed inputs"),
+    ],
+)
+def test_options_that_need_one_plain_file(
+    hh_csv: Path, tmp_path: Path, run_app, capsys, argv: tuple, message: str
+) -> None:
+    with pytest.raises(SystemExit):
+        run_app("-i", *_split(hh_csv, tmp_path), "-o", tmp_path / "out", *argv)
+    assert message in capsys.readouterr().err
@@ -0,0 +1,103 @@
+"""Parse stage cache files: exact round trip of the column kinds the parse stage
+produces, without pickle; entries are reused while the input and the parse stage are
+unchanged, and give the output of a run that parses the CSV."""
+from __future__ import annotations
+
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.io.readers import iter_csv_chunks
+from src.pipeline.builder import build_pipeline
+from src.pipeline.stage_cache import ParsedStageCache, Uncacheable, _pack_column, _unpack_column
+
+
+def _roundtrip(ser: pd.Series, tmp_path: Path) -> pd.Series:
+    meta, arrays = _pack_column(ser)
+    path = tmp_path / "chunk.npz"
+    np.savez(path, **arrays)
+    with np.load(path, allow_pickle=False) as data:
+        loaded = {key: data[key] for key in data.files}
+    return _unpack_column(meta, loaded, ser.index, ser.name)
+
+
+COLUMNS = {
+    "float": pd.Series([1.5, np.nan, 3.0]),
+    "int": pd.Series([1, 2, 3], dtype=np.int64),
+    "str": pd.Series(["Москва", None, "Казань"], dtype="str"),
+    "object_str": pd.Series(["a", None, "b"], dtype=object),
+    "bool_or_none": pd.Series([True, None, False], dtype=object),
+    "mixed": pd.Series(["x", 10**20, 2.5, True, None, float("nan")], dtype=object),
+    "category": pd.Series(pd.Categorical(["b", None, "a", "b"])),
+    "datetime": pd.Series(pd.to_datetime(["2020-01-01", None])),
+}
+
+
+@pytest.mark.parametrize("name", list(COLUMNS))
+def test_roundtrip(name: str, tmp_path: Path) -> None:
+    ser = COLUMNS[name].rename(name)
+    ser.index = pd.RangeIndex(7, 7 + len(ser))
+    got = _roundtrip(ser, tmp_path)
+    pd.testing.assert_series_equal(got, ser)
+    assert [type(v) for v in got] == [type(v) for v in ser]
+
+
+def test_other_objects_are_not_cached() -> None:
+    with pytest.raises(Uncacheable):
+        _pack_column(pd.Series([("a", 1), None], dtype=object))
+
+
+def _cache(root: Path, input_path: Path, **kwargs) -> ParsedStageCache:
+    return ParsedStageCache(root, input_path, build_pipeline(**kwargs), {"encoding": None, "delimiter": None})
+
+
+def _record(cache: ParsedStageCache, input_path: Path, stop: int | None = None) -> None:
+    chunks = cache.record(iter_csv_chunks(input_path, 100))
+    for i, chunk in enumerate(chunks):
+        cache.pipeline.process_chunk(chunk)
+        if stop is not None and i + 1 == stop:
+            chunks.close()
+            return
+
+
+def test_cache_hit_and_invalidation(hh_csv: Path, tmp_path: Path) -> None:
+    root = tmp_path / "cache"
+    cache = _cache(root, hh_csv)
+    assert not cache.ready
+    _record(cache, hh_csv, stop=2)  # an interrupted read leaves no usable entry
+    assert not _cache(root, hh_csv).ready
+    _record(cache, hh_csv)
+    again = _cache(root, hh_csv)
+    assert again.ready and again.dir == cache.dir
+    assert sum(len(c) for c in again.chunks()) == 300
+
+    # another parse stage setup gets an entry of its own
+    assert _cache(root, hh_csv, vectorized=True).dir != cache.dir
+    # a touched input is parsed again, and so is one rewritten behind the same size and mtime
+    data, st = hh_csv.read_bytes(), hh_csv.stat()
+    os.utime(hh_csv, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert not _cache(root, hh_csv).ready
+    os.utime(hh_csv, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert _cache(root, hh_csv).ready
+    pos = len(data) // 2
+    hh_csv.write_bytes(data[:pos] + (b"1" if data[pos : pos + 1] != b"1" else b"2") + data[pos + 1 :])
+    os.utime(hh_csv, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert not _cache(root, hh_csv).ready
+
+
+def test_cached_runs_match_uncached(hh_csv: Path, tmp_path: Path, run_app, caplog) -> None:
+    run_app("-i", hh_csv, "-o", tmp_path / "plain")
+    root = tmp_path / "cache"
+    with caplog.at_level(logging.INFO, logger="app"):
+        run_app("-i", hh_csv, "-o", tmp_path / "miss", "--parsed-cache", root)
+        run_app("-i", hh_csv, "-o", tmp_path / "hit", "--parsed-cache", root, "--single-pass")
+    assert [r.getMessage().rsplit("(", 1)[1] for r in caplog.records if "Parsed cache:" in r.getMessage()] == [
+        "miss)", "hit)",
+    ]
+    for out in ("miss", "hit"):
+        for name in ("x_data.npy", "y_data.npy"):
+            np.testing.assert_array_equal(np.load(tmp_path / out / name), np.load(tmp_path / "plain" / name))
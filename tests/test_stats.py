@@ -0,0 +1,122 @@
+"""stats.json: per-chunk summaries merge into the statistics of one pass, quantile
+sketches stay within their rank error, and large code histograms are cut to top codes."""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.io.stats import ColumnStats, QuantileSketch, RunningStats
+
+
+def _chunks(n: int, seed: int = 0) -> list[tuple[dict[str, np.ndarray], np.ndarray]]:
+    rng = np.random.default_rng(seed)
+    out = []
+    for size in rng.integers(1, 500, size=n):
+        num = rng.lognormal(10, 1, size).astype(np.float32)
+        num[rng.random(size) < 0.1] = np.nan
+        city = rng.zipf(1.5, size).clip(max=3_000).astype(np.float32)
+        out.append(({"salary": num, "city": city}, rng.normal(size=size).astype(np.float32)))
+    return out
+
+
+def _new(max_codes: int = 1_000) -> RunningStats:
+    return RunningStats(feature_names=["salary", "city"], categorical=["city"], max_codes=max_codes)
+
+
+def test_sketch_merges_are_deterministic_and_within_rank_error() -> None:
+    rng = np.random.default_rng(1)
+    parts = [rng.normal(size=int(n)) for n in rng.integers(1, 3_000, size=40)]
+
+    def sketch_of(part: np.ndarray) -> QuantileSketch:
+        one = QuantileSketch(k=64)
+        one.update(part)
+        return one
+
+    merged, again, fed = QuantileSketch(k=64), QuantileSketch(k=64), QuantileSketch(k=64)
+    for part in parts:
+        merged.merge(sketch_of(part))
+        again.merge(QuantileSketch.from_dict(json.loads(json.dumps(sketch_of(part).to_dict()))))
+        fed.update(part)
+    assert merged.n == fed.n == sum(map(len, parts))
+    assert merged.to_dict() == again.to_dict()
+
+    values = np.sort(np.concatenate(parts))
+    qs = (0.01, 0.25, 0.5, 0.75, 0.99)
+    for sketch in (merged, fed):
+        assert sum(len(lv) << i for i, lv in enumerate(sketch.levels)) == sketch.n
+        for q, v in zip(qs, sketch.quantiles(qs)):
+            assert abs(np.searchsorted(values, v) / len(values) - q) < 0.05
+
+
+def test_merged_chunk_summaries_match_one_pass() -> None:
+    chunks = _chunks(30)
+    fed, merged = _new(), _new()
+    for cols, y in chunks:
+        fed.update(cols, y)
+        merged.merge(fed.chunk(cols, y))
+    assert fed.to_dict() == merged.to_dict()
+
+    salary = np.concatenate([c["salary"] for c, _ in chunks]).astype(np.float64)
+    st = fed.columns["salary"]
+    finite = salary[~np.isnan(salary)]
+    assert (st.count, st.nans) == (len(finite), int(np.isnan(salary).sum()))
+    assert st.mean == pytest.approx(finite.mean(), rel=1e-9)
+    assert st.std == pytest.approx(finite.std(), rel=1e-9)
+    assert (st.min, st.max) == (finite.min(), finite.max())
+    city = np.concatenate([c["city"] for c, _ in chunks]).astype(np.int64)
+    np.testing.assert_array_equal(fed.columns["city"].codes, np.bincount(city))
+
+
+def test_large_histograms_are_cut_to_top_codes(tmp_path: Path) -> None:
+    stats = _new(max_codes=50)
+    for cols, y in _chunks(30):
+        stats.update(cols, y)
+    codes = stats.columns["city"].codes
+    assert np.count_nonzero(codes) > 50
+    stats.save(tmp_path / "stats.json")
+    top = json.loads((tmp_path / "stats.json").read_text(encoding="utf-8"))["columns"]["city"]["top_codes"]
+    assert len(top["codes"]) == 50 and top["total"] == codes.sum()
+    assert top["counts"] == codes[top["codes"]].tolist()  # exact for the codes kept
+    left = np.delete(codes, top["codes"])
+    assert top["error"] == left.max() and min(top["counts"]) >= top["error"]
+
+    small = _new()
+    for cols, y in _chunks(3):
+        small.update(cols, y)
+    small.save(tmp_path / "small.json")
+    assert RunningStats.load(tmp_path / "small.json").to_dict() == small.to_dict()
+
+
+def test_capped_histogram_keeps_merging_after_a_reload(tmp_path: Path) -> None:
+    chunks = _chunks(40, seed=2)
+    stats = _new(max_codes=50)
+    for cols, y in chunks[:20]:
+        stats.update(cols, y)
+    stats.save(tmp_path / "stats.json")
+    stats = RunningStats.load(tmp_path / "stats.json")
+    for cols, y in chunks[20:]:
+        stats.update(cols, y)
+    assert stats.n_rows == sum(len(y) for _, y in chunks)
+    top = stats.columns["city"].top
+    true = np.bincount(np.concatenate([c["city"] for c, _ in chunks]).astype(np.int64))
+    assert len(top.counts) <= 50 and top.total == true.sum()
+    for code, n in enumerate(true):
+        assert n - top.error <= top.counts.get(code, 0) <= n
+    with pytest.raises(ValueError):
+        stats.remap_codes({"city": np.arange(len(true))})
+
+
+def test_remap_moves_counts_and_moments() -> None:
+    codes = np.array([0, 1, 1, 2, 2, 2, 3], dtype=np.float32)
+    lut = np.array([0, 3, 1, 2])
+    stats = RunningStats(feature_names=["c"], categorical=["c"])
+    stats.update({"c": codes}, np.zeros(len(codes), dtype=np.float32))
+    stats.remap_codes({"c": lut})
+    direct = ColumnStats.of_values(lut[codes.astype(np.int64)], categorical=True)
+    st = stats.columns["c"]
+    np.testing.assert_array_equal(st.codes, direct.codes)
+    assert (st.mean, st.min, st.max) == pytest.approx((direct.mean, direct.min, direct.max))
+    assert st.m2 == pytest.approx(direct.m2)
@@ -0,0 +1,109 @@
+"""Bounded encodings of high-cardinality columns: Misra-Gries guarantees and merge
+order, stable hashed codes, and the codes FitState gives top-K and hashed columns."""
+from __future__ import annotations
+
+import subprocess
+import sys
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.encoding.encoders import FitState
+from src.encoding.strategies import OTHER, OTHER_CODE, ColumnStrategy, HeavyHitters, hash_codes
+
+
+def _stream(n: int = 20_000, seed: int = 0) -> list[str]:
+    rng = np.random.default_rng(seed)
+    return [f"v{i}" for i in rng.zipf(1.3, size=n) % 5_000]
+
+
+def _batches(values: list[str], size: int):
+    for i in range(0, len(values), size):
+        counts = Counter(values[i : i + size])
+        yield np.array(list(counts), dtype=object), np.array(list(counts.values()), dtype=np.int64)
+
+
+@pytest.mark.parametrize("capacity", [5, 50, 500])
+def test_heavy_hitters_guarantees(capacity: int) -> None:
+    values = _stream()
+    true = Counter(values)
+    hh = HeavyHitters(capacity=capacity)
+    for batch in _batches(values, 1_000):
+        hh.update(*batch)
+        assert len(hh.counts) <= capacity
+    n = len(values)
+    assert hh.total == n
+    assert hh.error <= n / (capacity + 1)
+    for v, count in true.items():
+        if count > n / (capacity + 1):
+            assert v in hh.counts
+        estimate = hh.counts.get(v, 0)
+        assert count - hh.error <= estimate <= count
+
+
+def test_merging_chunk_summaries_in_order_matches_feeding_chunks() -> None:
+    values = _stream(seed=1)
+    fed = HeavyHitters(capacity=40)
+    merged = HeavyHitters(capacity=40)
+    for batch in _batches(values, 700):
+        fed.update(*batch)
+        part = HeavyHitters(capacity=40)
+        part.update(*batch, prune=False)
+        merged.merge(part)
+    assert merged.counts == fed.counts
+    assert (merged.error, merged.total) == (fed.error, fed.total)
+
+
+def test_top_orders_by_count_then_value() -> None:
+    hh = HeavyHitters(capacity=10, counts={"b": 3, "a": 3, "c": 5, "d": 1})
+    assert hh.top(3) == ["c", "a", "b"]
+    assert hh.top(10, min_count=3) == ["c", "a", "b"]
+
+
+def test_hash_codes_range_and_missing() -> None:
+    norm = np.array(["__NA__", "Москва", "Казань", "Москва", ""], dtype=object)
+    codes = hash_codes(norm, 7)
+    assert codes[0] == 0
+    assert codes[1] == codes[3]
+    assert ((codes[1:] >= 1) & (codes[1:] <= 7)).all()
+
+
+def test_hash_codes_are_stable_across_processes() -> None:
+    norm = np.array([f"value {i}" for i in range(50)], dtype=object)
+    code = (
+        "import numpy as np; from src.encoding.strategies import hash_codes; "
+        "print(hash_codes(np.array([f'value {i}' for i in range(50)], dtype=object), 1000).tolist())"
+    )
+    root = Path(__file__).resolve().parents[1]
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=root)
+    assert out.stdout.strip() == str(hash_codes(norm, 1000).tolist())
+
+
+@pytest.mark.parametrize(
+    "params", [dict(kind="nope"), dict(k=0), dict(min_count=0), dict(buckets=0), dict(sketch_size=-1)]
+)
+def test_strategy_validation(params: dict) -> None:
+    with pytest.raises(ValueError):
+        ColumnStrategy(**params)
+
+
+def test_fit_state_topk_and_hash_codes() -> None:
+    X = pd.DataFrame({"title": ["a"] * 5 + ["b"] * 3 + ["c"] * 2 + ["d", None], "emp": list("xyzxyzxyzxy") + [None]})
+    fit = FitState(strategies={"title": ColumnStrategy(kind="topk", k=2), "emp": ColumnStrategy(kind="hash", buckets=4)})
+    fit.init_columns(["title", "emp"])
+    fit.fit_chunk(X)
+    fit.finalize()
+    assert fit.maps["title"] == {"__NA__": 0, OTHER: OTHER_CODE, "a": 2, "b": 3}
+    assert "emp" not in fit.maps
+    out, _ = fit.transform_chunk(
+        pd.DataFrame({"title": ["a", "b", "c", "zzz", None], "emp": ["x", "x", "q", "y", None]}),
+        pd.Series([0.0] * 5),
+        ["title", "emp"],
+    )
+    assert out[:, 0].tolist() == [2, 3, OTHER_CODE, OTHER_CODE, 0]
+    emp = out[:, 1]
+    assert emp[0] == emp[1] and emp[4] == 0 and ((emp[:4] >= 1) & (emp[:4] <= 4)).all()
+    assert fit.n_codes("emp") == 5 and fit.n_codes("title") == 4
@@ -0,0 +1,102 @@
+"""Hashed token features: the vectorized CSR matches a row-by-row bag of words, and the
+CSR writer appends (and resumes) chunks into one valid matrix."""
+from __future__ import annotations
+
+import json
+import re
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.io.writers import CsrWriter
+from src.pipeline.base import PipelineContext
+from src.pipeline.handlers import HashTokensHandler
+
+COLUMNS = ("title", "employer")
+
+
+def _dense(indptr: np.ndarray, indices: np.ndarray, data: np.ndarray, n_features: int) -> np.ndarray:
+    out = np.zeros((len(indptr) - 1, n_features), dtype=np.float32)
+    for i in range(len(indptr) - 1):
+        np.add.at(out[i], indices[indptr[i] : indptr[i + 1]], data[indptr[i] : indptr[i + 1]])
+    return out
+
+
+def _reference(X: pd.DataFrame, n_features: int) -> np.ndarray:
+    out = np.zeros((len(X), n_features), dtype=np.float32)
+    for i in range(len(X)):
+        for j, col in enumerate(COLUMNS):
+            v = X[col].iloc[i]
+            if v is None or v is pd.NA or (isinstance(v, float) and np.isnan(v)):
+                continue
+            for token, n in Counter(re.findall(r"\w+", str(v).lower())).items():
+                key = np.array([f"{j}:{token}"], dtype=object)
+                out[i, int(pd.util.hash_array(key, categorize=False)[0] % np.uint64(n_features))] += n
+    return out
+
+
+X = pd.DataFrame(
+    {
+        "title": ["Программист Python", "python/PYTHON developer", None, "", "C++ & Go", "Ведущий  инженер-программист"],
+        "employer": ["Яндекс", "ООО «Ромашка»", "Яндекс", None, "", "программист"],
+    }
+)
+
+
+@pytest.mark.parametrize("n_features", [4, 1 << 16])
+def test_tokens_match_row_by_row_bag_of_words(n_features: int) -> None:
+    csr = HashTokensHandler(columns=COLUMNS, n_features=n_features).transform(X)
+    assert csr.n_rows == len(X) and csr.indptr[0] == 0 and csr.indptr[-1] == len(csr.indices)
+    for i in range(csr.n_rows):
+        row = csr.indices[csr.indptr[i] : csr.indptr[i + 1]]
+        assert (np.diff(row) > 0).all()  # sorted, one entry per feature
+    np.testing.assert_array_equal(_dense(csr.indptr, csr.indices, csr.data, n_features), _reference(X, n_features))
+
+
+def test_tokens_skipped_on_fit_only_passes() -> None:
+    ctx = PipelineContext(df=X, X=X)
+    ctx.notes["fit_only"] = True
+    assert HashTokensHandler(columns=COLUMNS, n_features=8).handle(ctx).tokens is None
+
+
+def test_csr_writer_appends_and_resumes(tmp_path: Path) -> None:
+    handler = HashTokensHandler(columns=COLUMNS, n_features=32)
+    parts = [handler.transform(X.iloc[a:b].reset_index(drop=True)) for a, b in ((0, 2), (2, 2), (2, 5), (5, 6))]
+    writer = CsrWriter(outdir=tmp_path, n_features=32, columns=list(COLUMNS))
+    for part in parts[:2]:
+        writer.append(part.indptr, part.indices, part.data)
+    writer.close()
+    writer = CsrWriter(outdir=tmp_path, n_features=32, columns=list(COLUMNS), resume=True)
+    assert writer.n_rows == 2
+    for part in parts[2:]:
+        writer.append(part.indptr, part.indices, part.data)
+    writer.close()
+
+    meta = json.loads(writer.meta_path.read_text(encoding="utf-8"))
+    full = handler.transform(X)
+    assert meta["n_rows"] == len(X) and meta["nnz"] == len(full.indices)
+    np.testing.assert_array_equal(np.load(writer.indptr_path), full.indptr)
+    np.testing.assert_array_equal(np.load(writer.indices_path), full.indices)
+    np.testing.assert_array_equal(np.load(writer.data_path), full.data)
+
+
+def test_csr_writer_rejects_bad_chunks(tmp_path: Path) -> None:
+    writer = CsrWriter(outdir=tmp_path, n_features=8)
+    with pytest.raises(ValueError):
+        writer.append(np.array([0, 2]), np.array([1], dtype=np.int32), np.array([1.0], dtype=np.float32))
+    with pytest.raises(ValueError):
+        writer.append(np.array([0, 1]), np.array([8], dtype=np.int32), np.array([1.0], dtype=np.float32))
+    writer.close()
+    with pytest.raises(ValueError):
+        CsrWriter(outdir=tmp_path, n_features=16, resume=True)
+
+
+def test_token_rows_line_up_with_x(hh_csv: Path, tmp_path: Path, run_app) -> None:
+    out = tmp_path / "out"
+    run_app("-i", hh_csv, "-o", out, "--token-features", 64, "--drop-missing-target")
+    meta = json.loads((out / "tokens.json").read_text(encoding="utf-8"))
+    assert meta["n_rows"] == len(np.load(out / "x_data.npy")) > 0
+    assert np.load(out / "tokens_indptr.npy")[-1] == meta["nnz"]
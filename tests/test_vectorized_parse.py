@@ -0,0 +1,244 @@
+"""The `_*_vec` parsers must give what the scalar `_parse_*` functions give row by row,
+including the dtypes `_from_values` infers (the same as Series.map). Every handler must
+also get through a chunk without rows, vectorized or not, with and without the parse cache."""
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.io.readers import iter_csv_chunks
+from src.pipeline.base import PipelineContext
+from src.pipeline.builder import build_pipeline, compact_dtypes
+from src.pipeline.cache import ParseCache
+from src.pipeline.handlers import (
+    _clean_text,
+    _clean_text_vec,
+    _education_level,
+    _education_level_vec,
+    _from_values,
+    _has_car,
+    _has_car_vec,
+    _parse_city_flags,
+    _parse_city_flags_vec,
+    _parse_gender_age,
+    _parse_gender_age_vec,
+    _parse_salary,
+    _parse_salary_vec,
+    _parse_total_experience_months,
+    _parse_total_experience_months_vec,
+    _parse_unique,
+    _to_str,
+)
+
+LONG = "99999999999999999999"  # longer than int64
+
+COMMON = [None, np.nan, "", "   ", " ", "не указано", "Не Указано"]
+
+GENDER_AGE = COMMON + [
+    "Мужчина ,  42 года , родился 6 октября 1976",
+    "ЖЕНЩИНА, 30 ЛЕТ",
+    "женщина , 23 года",
+    "Мужчина",
+    "42 года",
+    f"Мужчина , {LONG} год",
+    "Мужчина , 123456789012345678 год",
+    "Мужчина , 12345678901234567 год",
+]
+
+SALARY = COMMON + [
+    "27000 руб.",
+    "27 000 руб.",
+    "RUB 27000",
+    "руб. 27000",
+    "1500 USD",
+    "usd 1500",
+    "$ 2000",
+    "2000 $",
+    "3000 EUR",
+    "€3000",
+    "от 50000 руб.",
+    "ОТ 50000 ДО 70000 РУБ.",
+    "до 100000 руб",
+    "50000-70000 руб.",
+    "50001 - 70000",
+    "45",
+    "по договоренности",
+    "з/п не указана",
+    "руб.",
+    f"от {LONG} руб.",
+    f"{LONG} руб.",
+    f"{LONG} - {LONG} usd",
+    f"{LONG}{LONG} - 5",
+    "99999999999999999 - 99999999999999999 руб.",
+    "999999999999999999 - 999999999999999999 руб.",
+]
+
+CITY = COMMON + [
+    "Москва , не готов к переезду , готов к командировкам",
+    "Санкт-Петербург , м. Невский проспект , готов к переезду , не готов к командировкам",
+    " , , Казань",
+    "Новосибирск",
+    "ГОТОВ К ПЕРЕЕЗДУ",
+    ",",
+]
+
+EXPERIENCE = COMMON + [
+    "Опыт работы 6 лет 1 месяц Август 2015 — по настоящее время",
+    "Опыт работы 10 лет",
+    "ОПЫТ РАБОТЫ 3 года 11 месяцев",
+    "опыт работы 1 год 2 мес",
+    "Опыт работы 5 лет 3",
+    "Без опыта",
+    f"Опыт работы {LONG} лет 5 месяцев",
+    f"Опыт работы 2 года {LONG} месяцев",
+    "Опыт работы 99999999999999999 лет 99999999999999999 месяцев",
+    "Опыт работы 999999999999999999 лет",
+]
+
+EDUCATION = COMMON + [
+    "Высшее образование 2010 МГУ",
+    "Среднее специальное образование",
+    "СРЕДНЕЕ образование",
+    "Неоконченное высшее",
+    "Учёная степень",
+]
+
+CAR = COMMON + [
+    "Имеется собственный автомобиль",
+    "имеется",
+    "Собственный",
+    "Не имеется",
+    "Нет",
+]
+
+CASES = [
+    ("gender_age", _parse_gender_age, _parse_gender_age_vec, GENDER_AGE),
+    ("salary", _parse_salary, _parse_salary_vec, SALARY),
+    ("city_flags", _parse_city_flags, _parse_city_flags_vec, CITY),
+    ("experience", _parse_total_experience_months, _parse_total_experience_months_vec, EXPERIENCE),
+    ("education", _education_level, _education_level_vec, EDUCATION),
+    ("car", _has_car, _has_car_vec, CAR),
+]
+
+
+def _series(values: list, dtype: object) -> pd.Series:
+    return pd.Series(values, index=pd.RangeIndex(100, 100 + len(values)), dtype=dtype)
+
+
+def _expected(ser: pd.Series, scalar) -> list[pd.Series]:
+    parsed = ser.map(_to_str).map(scalar)
+    first = parsed.iloc[0] if len(parsed) else None
+    if isinstance(first, tuple):
+        return [parsed.map(lambda x, k=k: x[k]) for k in range(len(first))]
+    return [parsed]
+
+
+def _got(out, index: pd.Index) -> list[pd.Series]:
+    arrays = out if isinstance(out, tuple) else (out,)
+    return [_from_values(arr, index) for arr in arrays]
+
+
+def _check(got: list[pd.Series], expected: list[pd.Series]) -> None:
+    assert len(got) == len(expected)
+    for g, e in zip(got, expected):
+        pd.testing.assert_series_equal(g, e, check_names=False)
+        # the values themselves, not only equal-comparing ones (True vs 1, 5 vs 5.0)
+        assert [type(v) for v in g] == [type(v) for v in e]
+
+
+@pytest.mark.parametrize("dtype", [object, "string"])
+@pytest.mark.parametrize("name,scalar,vec,values", CASES, ids=[c[0] for c in CASES])
+def test_vec_matches_scalar(name, scalar, vec, values, dtype) -> None:
+    ser = _series(values, dtype)
+    _check(_got(vec(ser), ser.index), _expected(ser, scalar))
+
+
+@pytest.mark.parametrize("name,scalar,vec,values", CASES, ids=[c[0] for c in CASES])
+def test_vec_matches_scalar_one_value_at_a_time(name, scalar, vec, values) -> None:
+    # dtype inference of a column where every row is the same kind of value
+    for v in values:
+        ser = _series([v, v], object)
+        _check(_got(vec(ser), ser.index), _expected(ser, scalar))
+
+
+@pytest.mark.parametrize("name,scalar,vec,values", CASES, ids=[c[0] for c in CASES])
+def test_parse_unique_matches_scalar(name, scalar, vec, values) -> None:
+    ser = _series(values * 2, object)
+    cache = ParseCache()
+    for use_vec in (vec, None):
+        _check(_got(_parse_unique(ser, scalar, use_vec, cache), ser.index), _expected(ser, scalar))
+
+
+def test_long_digit_runs_keep_python_ints() -> None:
+    value, currency = _parse_salary_vec(pd.Series([f"от {LONG} руб.", "от 5 руб."]))
+    assert value[0] == int(LONG) and currency[0] == "RUB"
+    assert value[1] == 5
+    (months,) = [_parse_total_experience_months_vec(pd.Series([f"Опыт работы {LONG} лет 5 месяцев"]))]
+    assert months[0] == int(LONG) * 12 + 5
+
+
+@pytest.mark.parametrize("dtype", [object, "string"])
+def test_clean_text_vec_matches_scalar(dtype) -> None:
+    values = COMMON + ["  a  b  c  ", "A\tB\nC", "без изменений"]
+    ser = _series(values, dtype)
+    expected = ser.map(_to_str).map(_clean_text)
+    pd.testing.assert_series_equal(
+        _from_values(_clean_text_vec(ser).to_numpy(dtype=object), ser.index), expected, check_dtype=False
+    )
+    assert list(_clean_text_vec(ser)) == list(expected)
+
+
+# header of an HH export: the unnamed index column first
+HEADER = (
+    ',"Пол, возраст",ЗП,Ищет работу на должность:,Город,Занятость,График,'
+    "Опыт (двойное нажатие для полной версии),Последенее/нынешнее место работы,"
+    "Последеняя/нынешняя должность,Образование и ВУЗ,Обновление резюме,Авто\n"
+)
+
+PIPELINE_MODES = [
+    pytest.param(vectorized, cached, id=f"{'vec' if vectorized else 'scalar'}-{'cache' if cached else 'nocache'}")
+    for vectorized in (False, True)
+    for cached in (False, True)
+]
+
+
+def _pipeline(vectorized: bool, cached: bool):
+    return build_pipeline(
+        vectorized=vectorized, parse_cache=ParseCache() if cached else None, token_features=16
+    )
+
+
+@pytest.mark.parametrize("vectorized,cached", PIPELINE_MODES)
+def test_every_handler_on_empty_input(vectorized: bool, cached: bool) -> None:
+    pipeline = _pipeline(vectorized, cached)
+    df = pd.DataFrame({col: pd.Series([], dtype=object) for col in pipeline.required_columns()})
+    # one handler at a time, each on the output of the one before
+    handlers = pipeline.handlers()
+    for h in handlers:
+        h._next = None
+    ctx = PipelineContext(df=df)
+    for h in handlers:
+        ctx = h.handle(ctx)
+        assert len(ctx.df) == 0, type(h).__name__
+        assert set(h.produces) <= set(ctx.df.columns), type(h).__name__
+    assert ctx.X is not None and len(ctx.X) == 0
+    assert ctx.y is not None and len(ctx.y) == 0
+    assert ctx.tokens is not None and ctx.tokens.n_rows == 0
+
+
+@pytest.mark.parametrize("compact", [False, True], ids=["plain", "compact"])
+@pytest.mark.parametrize("vectorized,cached", PIPELINE_MODES)
+def test_header_only_csv(vectorized: bool, cached: bool, compact: bool, tmp_path: Path) -> None:
+    path = tmp_path / "hh.csv"
+    path.write_text(HEADER, encoding="utf-8")
+    pipeline = _pipeline(vectorized, cached)
+    usecols = pipeline.required_columns()
+    chunks = list(iter_csv_chunks(path, usecols=usecols, dtype=compact_dtypes(usecols) if compact else None))
+    assert chunks and all(len(chunk) == 0 for chunk in chunks)
+    for chunk in chunks:
+        ctx = pipeline.process_chunk(chunk)
+        assert ctx.X is not None and len(ctx.X) == 0
+        assert list(ctx.X.columns) == list(_pipeline(False, False).process_chunk(chunks[0]).X.columns)